@@ -1,24 +1,28 @@
-from blacksheep import Response, FromFiles, json
+from blacksheep import Request, Response, json
 from blacksheep.server.controllers import APIController, put
 from services.storage_service import StorageService
+from utils.env import settings
+from utils.uploads import read_multipart
 
 class Files(APIController):
     def __init__(self, storage_service: StorageService):
         self.storage_service = storage_service
 
     @put("/video/{item_name}")
-    async def update_video(self, bucket_name: str, item_name: str, files: FromFiles):
+    async def update_video(self, item_name: str, request: Request):
         """
-        Uploads a video to a specific bucket and item name.
+        Uploads a video under the given item name.
         Input: video object (as form data or blob)
         Return: status codes
         """
 
-        if not files.value:
-            return json({"error": "No file provided"}, status=400)
+        with await read_multipart(request, max_file_bytes=settings.UPLOAD_MAX_VIDEO_MB * 1024 * 1024) as form:
+            if not form.files:
+                return json({"error": "No file provided"}, status=400)
 
-        video_file = files.value[0]
-        
-        await self.storage_service.upload_file(bucket_name, item_name, video_file.data)
+            video_file = form.files[0]
+
+            # streamed from the spooled temp file, never fully in memory
+            await self.storage_service.upload_file(item_name, video_file.chunks())
         
         return Response(200)
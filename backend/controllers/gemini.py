@@ -1,106 +1,110 @@
+import logging
 from blacksheep import json, Request
 from blacksheep.server.controllers import APIController, post
-import json as pyjson
 
 from services.vertex_service import VertexService
 from services.fal_service import FalService
-from services.supabase_service import SupabaseService
+from services.image_service import ImageService
+from services.auth_service import CurrentUser
+from services.job_service import JobService
+from services.scene_context_service import SceneContextError, SceneContextService
+from utils.env import settings
+from utils.uploads import UploadTooLarge, read_multipart
+
+logger = logging.getLogger(__name__)
 
 class Gemini(APIController):
     
-    def __init__(self, vertex_service: VertexService, fal_service: FalService, supabase_service: SupabaseService):
+    def __init__(
+        self,
+        vertex_service: VertexService,
+        fal_service: FalService,
+        scene_context_service: SceneContextService,
+        job_service: JobService,
+        image_service: ImageService,
+    ):
         self.vertex_service = vertex_service
         self.fal_service = fal_service
-        self.supabase_service = supabase_service
+        self.scene_context_service = scene_context_service
+        self.job_service = job_service
+        self.image_service = image_service
 
     @post("/extract-context")
-    async def extract_context(self, request: Request):
+    async def extract_context(self, request: Request, current_user: CurrentUser):
+        """
+        Scene context (entities, environment, style) of a generated clip.
+        Input: JSON body with "job_id" (preferred) or "video_url" of a stored video;
+        a multipart video upload is still accepted.
+        Results are cached by video hash, and finished jobs are usually already extracted.
+        """
+        user_id = await current_user.get_id()
+        if not user_id:
+            return json({"error": "Unauthorized"}, status=401)
+
         try:
+            if request.declares_json():
+                body = await request.json()
+                if not isinstance(body, dict):
+                    return json({"error": "job_id or video_url is required"}, status=400)
+                video_url = body.get("video_url")
+                video_sha256 = None
+                if body.get("job_id"):
+                    job = await self.job_service.get_user_video_job_status(str(body["job_id"]), user_id)
+                    if not job:
+                        return json({"error": "Job not found"}, status=404)
+                    if job.status != "done" or not job.video_url:
+                        return json({"error": "Job has no video yet"}, status=409)
+                    video_url = job.video_url
+                    video_sha256 = (job.metadata or {}).get("video_sha256")
+                if not isinstance(video_url, str) or not video_url:
+                    return json({"error": "job_id or video_url is required"}, status=400)
+                try:
+                    return json(await self.scene_context_service.extract_from_url(video_url, video_sha256))
+                except ValueError as e:
+                    return json({"error": str(e)}, status=400)
+
             # Parse multipart form data manually
-            files = await request.files()
-            
-            if not files:
-                return json({"error": "No video file provided"}, status=400)
+            with await read_multipart(request, max_file_bytes=settings.UPLOAD_MAX_VIDEO_MB * 1024 * 1024) as form:
+                if not form.files:
+                    return json({"error": "No video file provided"}, status=400)
+                video = await form.files[0].read()
             
-            video_data = files[0]
-            
-            
-            prompt = (
-                "Extract structured scene information from this video.\n"
-                "Respond with ONLY valid JSON. No explanations, no markdown, no backticks.\n"
-                "Follow this exact structure, keys required:\n"
-                "{\n"
-                '  "entities": [\n'
-                '    { "id": "id-1", "description": "...", "appearance": "..." }\n'
-                "  ],\n"
-                '  "environment": "...",\n'
-                '  "style": "..."\n'
-                "}\n"
-                "If information is missing, use empty strings.\n"
-            )
-            #use vertex service to analyze video
-            res = self.vertex_service.analyze_video_content(
-                prompt=prompt,
-                video_data=video_data
-            )
-
-            raw = res.text or res.candidates[0].content.parts[0].text
-
-            # Strip markdown if present
-            cleaned = raw.strip()
-            if cleaned.startswith("```"):
-                lines = cleaned.split('\n')
-                cleaned = '\n'.join(lines[1:])
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            cleaned = cleaned.strip()
-
-            try:
-                parsed = pyjson.loads(cleaned)
-                return json(parsed)
-            except Exception:
-                return json({"error": "Failed to parse JSON", "raw": raw}, status=500)
-
+            return json(await self.scene_context_service.extract(video))
 
+        except UploadTooLarge:
+            raise
+        except SceneContextError as e:
+            return json({"error": str(e), "raw": e.raw}, status=500)
         except Exception as e:
-            print(f"ERROR in extract_context: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("extract_context failed")
             return json({"error": str(e)}, status=500)
 
     @post("/image")
-    async def generate_image(self, request: Request):
+    async def generate_image(self, request: Request, current_user: CurrentUser):
         try:
-            print("[Fal Image] Starting image improvement request...")
             # get user token
-            user_id = request.scope.get("user_id") or self.supabase_service.get_user_id_from_request(request)
+            user_id = await current_user.get_id()
             if not user_id:
-                print("[Fal Image] Unauthorized - no user_id")
                 return json({"error": "Unauthorized"}, status=401)
 
-            print(f"[Fal Image] User ID: {user_id}")
-            files = await request.files()
-            
-            if not files:
-                print("[Fal Image] No image file provided")
-                return json({"error": "No image file provided"}, status=400)
-            
-            image_data = files[0]
-            print(f"[Fal Image] Received image, size: {len(image_data.data)} bytes")
+            with await read_multipart(request, max_file_bytes=settings.UPLOAD_MAX_IMAGE_MB * 1024 * 1024) as form:
+                if not form.files:
+                    return json({"error": "No image file provided"}, status=400)
+                image_data = await self.image_service.normalize(await form.files[0].read())
+            logger.debug("Image improvement request from %s, normalized size: %d bytes", user_id, len(image_data))
 
             prompt = "Improve the attached image and fill in any missing details (There may be annotations and stuff but don't remove them or follow them, treat them like they dont exist unless they explicitly say to do so). Do not deviate from the original art style too much, simply understand the artist's idea and enhance it a bit."
 
-            print("[Fal Image] Calling fal service to generate image...")
             res = await self.fal_service.generate_image_content(
                 prompt=prompt,
-                image=image_data.data
+                image=image_data
             )
-            print(f"[Fal Image] Got response from fal, result length: {len(res) if res else 0}")
+            logger.debug("Improved image size: %d bytes", len(res) if res else 0)
 
             return json({"image_bytes": res})
             
+        except UploadTooLarge:
+            raise
         except Exception as e:
-            print(f"ERROR in generate_image: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("generate_image failed")
             return json({"error": str(e)}, status=500)
\ No newline at end of file
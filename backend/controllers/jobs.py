@@ -1,47 +1,159 @@
-from blacksheep import json, Response, Request, FromForm
+import hashlib
+import json as jsonlib
+import logging
+
+from blacksheep import json, Response, Request
 from blacksheep.server.controllers import APIController, post, get
-from services.supabase_service import SupabaseService
-from models.job import JobStatus, VideoJobRequest, VideoGenerationInput
+from blacksheep.server.sse import ServerSentEvent, ServerSentEventsResponse
+from services.auth_service import CurrentUser
+from models.job import BatchJobRequest, BatchStatus, JobStatus, VideoJobRequest
+from services.batch_job_service import BatchJobService
+from services.credit_service import CreditError, InsufficientCredits
+from services.job_admission import AdmissionRejected
 from services.job_service import JobService
+from services.upload_store import UploadStore
 from services.video_merge_service import VideoMergeService
+from utils.env import settings
+from utils.uploads import read_multipart
+
+logger = logging.getLogger(__name__)
+
+# HTTP status for each job state, shared by the polling route and the event stream
+STATUS_CODES = {"waiting": 202, "done": 200, "error": 500}
+SSE_KEEPALIVE_SECONDS = 15
+MAX_BATCH_STATUS_IDS = 100
+
+
+def _too_many_jobs(e: AdmissionRejected) -> Response:
+    response = json({"error": str(e), "reason": e.reason, "retry_after": e.retry_after}, status=429)
+    response.add_header(b"Retry-After", str(e.retry_after).encode())
+    return response
+
 
 class Jobs(APIController):
-    def __init__(self, job_service: JobService, supabase_service: SupabaseService, video_merge_service: VideoMergeService):
+    def __init__(
+        self,
+        job_service: JobService,
+        batch_job_service: BatchJobService,
+        video_merge_service: VideoMergeService,
+        upload_store: UploadStore,
+    ):
         self.job_service = job_service
-        self.supabase_service = supabase_service
+        self.batch_job_service = batch_job_service
         self.video_merge_service = video_merge_service
+        self.upload_store = upload_store
 
     @post("/video")
-    async def add_video_job(self, request: Request, input: FromForm[VideoGenerationInput]):
+    async def add_video_job(self, request: Request, current_user: CurrentUser):
         """
         Starts a video generation job.
-        Input: starting image (file), context, any other user-prompt
+        Input: multipart form with starting image (file), optional ending image (second file),
+        global_context and custom_prompt fields
         Return: jobId
         """
-        user_id = request.scope.get("user_id") or self.supabase_service.get_user_id_from_request(request)
+        user_id = await current_user.get_id()
         if not user_id:
             return json({"error": "Unauthorized"}, status=401)
 
-        # FromForm parses the body, so request.files should be populated if multipart
-        # request.files is a method that returns the list of files
-        files = await request.files()
-        
-        if not files:
-            return json({"error": "No image file provided"}, status=400)
+        # streamed to spooled temp files, then parked in the upload store: the job only carries keys
+        with await read_multipart(request, max_file_bytes=settings.UPLOAD_MAX_IMAGE_MB * 1024 * 1024, max_files=2) as form:
+            if not form.files:
+                return json({"error": "No image file provided"}, status=400)
 
-        image_file = files[0]
-        ending_image_file = files[1] if len(files) > 1 else None
-        
-        data = VideoJobRequest(
-            starting_image=image_file.data,
-            ending_image=ending_image_file.data if ending_image_file else None,
-            global_context=input.value.global_context,
-            custom_prompt=input.value.custom_prompt
-        )
-
-        job_id = await self.job_service.create_video_job(data)
+            data = VideoJobRequest(
+                starting_image_key=await self.upload_store.put(form.files[0]),
+                ending_image_key=await self.upload_store.put(form.files[1]) if len(form.files) > 1 else None,
+                global_context=form.fields.get("global_context", ""),
+                custom_prompt=form.fields.get("custom_prompt", "")
+            )
+
+        try:
+            job_id = await self.job_service.create_video_job(data, user_id)
+        except AdmissionRejected as e:
+            return _too_many_jobs(e)
+        except InsufficientCredits as e:
+            return json({"error": str(e), "reason": "insufficient_credits"}, status=402)
+        except CreditError as e:
+            # nothing was charged (create_video_job refunds what it reserved)
+            logger.error("Credit reservation failed for %s: %s", user_id, e)
+            return json(
+                {"error": "Credits can't be checked right now. Please try again shortly.", "reason": "credits_unavailable"},
+                status=503,
+            )
         return json({"job_id": job_id})
 
+    @post("/video/batch")
+    async def add_video_batch_job(self, request: Request, current_user: CurrentUser):
+        """
+        Starts one video job per frame of a storyboard branch, as one batch.
+        Input: multipart form with the frame images (files), global_context (shared by
+        every clip), frames (JSON array, one {"custom_prompt", "image", "ending_image"}
+        per clip, in order; "image" and "ending_image" are indexes into the files,
+        "image" defaults to the clip's position and "ending_image" is optional) and
+        merge ("true" to merge the clips into one video when all are done)
+        Return: batch_id and the job_id of every clip, in order
+        """
+        user_id = await current_user.get_id()
+        if not user_id:
+            return json({"error": "Unauthorized"}, status=401)
+
+        # a clip can have its own ending frame, so up to two files per clip
+        max_files = 2 * settings.BATCH_MAX_FRAMES
+        with await read_multipart(request, max_file_bytes=settings.UPLOAD_MAX_IMAGE_MB * 1024 * 1024, max_files=max_files) as form:
+            if not form.files:
+                return json({"error": "No image file provided"}, status=400)
+            try:
+                frames = jsonlib.loads(form.fields.get("frames", ""))
+            except ValueError:
+                return json({"error": "frames must be a JSON array"}, status=400)
+            if not isinstance(frames, list) or not frames or not all(isinstance(frame, dict) for frame in frames):
+                return json({"error": "frames must be a non-empty JSON array of objects"}, status=400)
+            if len(frames) > settings.BATCH_MAX_FRAMES:
+                return json({"error": f"At most {settings.BATCH_MAX_FRAMES} frames per batch"}, status=400)
+            for position, frame in enumerate(frames):
+                frame.setdefault("image", position)
+                for name in ("image", "ending_image"):
+                    index = frame.get(name)
+                    if index is not None and (type(index) is not int or not 0 <= index < len(form.files)):
+                        return json({"error": f"frames[{position}].{name} is not a file index"}, status=400)
+
+            # each file is stored once, however many clips use it
+            used = {frame[name] for frame in frames for name in ("image", "ending_image") if frame.get(name) is not None}
+            keys = {index: await self.upload_store.put(form.files[index]) for index in sorted(used)}
+            global_context = form.fields.get("global_context", "")
+            data = BatchJobRequest(
+                frames=[
+                    VideoJobRequest(
+                        starting_image_key=keys[frame["image"]],
+                        ending_image_key=keys.get(frame.get("ending_image")),
+                        global_context=global_context,
+                        custom_prompt=str(frame.get("custom_prompt", "")),
+                    )
+                    for frame in frames
+                ],
+                merge=form.fields.get("merge", "").lower() == "true",
+            )
+
+        try:
+            batch_id, job_ids = await self.batch_job_service.create_batch_job(data, user_id)
+        except AdmissionRejected as e:
+            return _too_many_jobs(e)
+        return json({"batch_id": batch_id, "job_ids": job_ids})
+
+    @get("/video/batch/{batch_id}")
+    async def get_video_batch_job_status(self, batch_id: str):
+        """
+        Aggregated status of a batch: its own state ("waiting" until every clip is done
+        or failed and the merge, if asked for, is stored), counts per clip state and each
+        clip's GET /video/{job_id} body plus its job_id ("pending" until it is admitted)
+        """
+        batchStatus: BatchStatus = await self.batch_job_service.get_batch_status(batch_id)
+
+        if not batchStatus:
+            return json({"error": "Batch not found"}, status=404)
+
+        return json(batchStatus.to_dict(), status=STATUS_CODES[batchStatus.status])
+
     @get("/video/{job_id}")
     async def get_video_job_status(self, job_id: str):
         """
@@ -52,47 +164,118 @@ class Jobs(APIController):
         if not jobStatus:
             return json({"error": "Job not found"}, status=404)
 
-        if jobStatus.status == "error":
-            return json({
-                "status": "error",
-                "error_message": jobStatus.error
-            }, status=500)
-        
-        if jobStatus.status == "waiting":
-            return json({
-                "status": "waiting",
-                "job_start_time": jobStatus.job_start_time.isoformat()
-            }, status=202)
-        
-        return json({
-            "status": jobStatus.status,
-            "job_start_time": jobStatus.job_start_time.isoformat(),
-            "job_end_time": jobStatus.job_end_time.isoformat() if jobStatus.job_end_time else None,
-            "video_url": jobStatus.video_url,
-            "metadata": jobStatus.metadata
-        }, status=200)
+        return json(jobStatus.to_dict(), status=STATUS_CODES[jobStatus.status])
+
+    @get("/video/{job_id}/stages")
+    async def get_video_job_stages(self, job_id: str):
+        """
+        Pipeline timeline of a job: one entry per finished stage with "started" and
+        "finished" offsets (seconds since the pipeline started). Updated live while
+        the job runs.
+        """
+        jobStatus: JobStatus = await self.job_service.get_video_job_status(job_id)
+
+        if not jobStatus:
+            return json({"error": "Job not found"}, status=404)
+
+        return json({"status": jobStatus.status, "stages": jobStatus.stages or []})
+
+    @post("/video/status:batch")
+    async def get_video_job_statuses(self, request: Request):
+        """
+        Status of many jobs in one request (one Redis MGET).
+        Input: JSON body {"job_ids": [...], "since": {job_id: version}} ("since" is optional)
+        Return: {"jobs": {job_id: status}, "unchanged": [...], "not_found": [...]}
+        Each status is the body of GET /video/{job_id} plus "version" and "http_status".
+        Jobs whose version matches "since" are only listed in "unchanged". The response
+        carries an ETag over all versions; send it back as If-None-Match to get a 304.
+        """
+        try:
+            body = await request.json()
+        except Exception:
+            body = None
+        job_ids = body.get("job_ids") if isinstance(body, dict) else None
+        since = body.get("since") if isinstance(body, dict) else None
+        if not isinstance(since, dict):
+            since = {}
+        if not isinstance(job_ids, list) or not all(isinstance(job_id, str) for job_id in job_ids):
+            return json({"error": "job_ids array is required"}, status=400)
+        if len(job_ids) > MAX_BATCH_STATUS_IDS:
+            return json({"error": f"At most {MAX_BATCH_STATUS_IDS} job_ids per request"}, status=400)
+
+        job_ids = list(dict.fromkeys(job_ids))
+        statuses = await self.job_service.get_video_job_statuses(job_ids)
+        etag = 'W/"' + hashlib.sha1(
+            ",".join(f"{job_id}:{status.version if status else 0}" for job_id, status in statuses.items()).encode()
+        ).hexdigest() + '"'
+        if request.get_first_header(b"If-None-Match") == etag.encode():
+            return Response(304, [(b"ETag", etag.encode())])
+
+        result = {"jobs": {}, "unchanged": [], "not_found": []}
+        for job_id, status in statuses.items():
+            if status is None:
+                result["not_found"].append(job_id)
+            elif since.get(job_id) == status.version:
+                result["unchanged"].append(job_id)
+            else:
+                result["jobs"][job_id] = {
+                    **status.to_dict(),
+                    "version": status.version,
+                    "http_status": STATUS_CODES[status.status],
+                }
+        response = json(result)
+        response.add_header(b"ETag", etag.encode())
+        return response
+
+    @get("/video/{job_id}/events")
+    async def watch_video_job_status(self, job_id: str):
+        """
+        Server-Sent Events stream of job status. Sends the current status, then
+        every change until the job is done or failed. Each event carries the same
+        body as GET /video/{job_id} plus the HTTP status that route would return.
+        The polling route stays available as a fallback.
+        """
+        async def events():
+            # watch before reading the current state so no transition is missed
+            updates = self.job_service.events.watch(job_id, timeout=SSE_KEEPALIVE_SECONDS)
+            try:
+                current = await self.job_service.get_video_job_status(job_id)
+                if not current:
+                    yield ServerSentEvent({"error": "Job not found", "http_status": 404}, event="not_found")
+                    return
+                status = current.to_dict()
+                yield ServerSentEvent({**status, "http_status": STATUS_CODES[current.status]})
+                while status["status"] == "waiting":
+                    update = await anext(updates)
+                    if update is None:
+                        # no news for a while: re-read the record in case a publish was lost
+                        current = await self.job_service.get_video_job_status(job_id)
+                        if not current:
+                            yield ServerSentEvent({"error": "Job not found", "http_status": 404}, event="not_found")
+                            return
+                        if current.status == "waiting":
+                            yield ServerSentEvent({"status": "waiting"}, event="keepalive")
+                            continue
+                        update = current.to_dict()
+                    status = update
+                    yield ServerSentEvent({**status, "http_status": STATUS_CODES[status["status"]]})
+            finally:
+                await updates.aclose()
+
+        return ServerSentEventsResponse(events)
 
     # DEV MOCK ENDPOINTS
     @post("/video/mock")
-    async def add_video_job_mock(self, request: Request, input: FromForm[VideoGenerationInput]):
+    async def add_video_job_mock(self, request: Request, current_user: CurrentUser):
 
-        user_id = request.scope.get("user_id") or self.supabase_service.get_user_id_from_request(request)
+        user_id = await current_user.get_id()
         if not user_id:
             return json({"error": "Unauthorized"}, status=401)
         
         # validate input
-        files = await request.files()
-        
-        if not files:
-            return json({"error": "No image file provided"}, status=400)
-
-        image_file = files[0]
-        
-        data = VideoJobRequest(
-            starting_image=image_file.data,
-            global_context=input.value.global_context,
-            custom_prompt=input.value.custom_prompt
-        )
+        with await read_multipart(request, max_file_bytes=settings.UPLOAD_MAX_IMAGE_MB * 1024 * 1024, max_files=2) as form:
+            if not form.files:
+                return json({"error": "No image file provided"}, status=400)
 
         # just return random stuff
         return json({"job_id": "mock-job-id"})
@@ -115,13 +298,13 @@ class Jobs(APIController):
             return Response(500)
     
     @post("/video/merge")
-    async def merge_videos(self, request: Request):
+    async def merge_videos(self, request: Request, current_user: CurrentUser):
         """
         Merges multiple videos from URLs into a single video.
         Input: JSON body with "video_urls" array (ordered from root to end frame)
         Return: merged video URL
         """     
-        user_id = request.scope.get("user_id") or self.supabase_service.get_user_id_from_request(request)
+        user_id = await current_user.get_id()
         if not user_id:
             return json({"error": "Unauthorized"}, status=401)
         
@@ -138,8 +321,9 @@ class Jobs(APIController):
             merged_video_url = await self.video_merge_service.merge_videos(video_urls, user_id)
             
             return json({"video_url": merged_video_url})
+        except ValueError as e:
+            return json({"error": str(e)}, status=400)
         except Exception as e:
-            import traceback
-            traceback.print_exc()
+            logger.exception("Video merge failed")
             return json({"error": str(e)}, status=500)
         
\ No newline at end of file
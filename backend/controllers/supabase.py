@@ -1,17 +1,21 @@
-from blacksheep import json, Request
+import logging
+from blacksheep import json
 from blacksheep.server.controllers import APIController, get
 
+from services.auth_service import CurrentUser
 from services.supabase_service import SupabaseService
 
+logger = logging.getLogger(__name__)
+
 class Supabase(APIController):
     
     def __init__(self, supabase_service: SupabaseService):
         self.supabase_service = supabase_service
 
     @get("/user")
-    async def get_user_row(self, request: Request):
+    async def get_user_row(self, current_user: CurrentUser):
         try:
-            user_id = request.scope.get("user_id") or self.supabase_service.get_user_id_from_request(request)
+            user_id = await current_user.get_id()
             if not user_id:
                 return json({"error": "Unauthorized"}, status=401)
             
@@ -23,13 +27,13 @@ class Supabase(APIController):
             return json(res.data)
         
         except Exception as e:
-            print("supabase error:", e) # log it cuz why not
+            logger.exception("Failed to load user row")
             return json({"error": str(e)}, status=500)
         
     @get("/transactions")
-    async def get_transaction_log(self, request: Request):
+    async def get_transaction_log(self, current_user: CurrentUser):
         try:
-            user_id = request.scope.get("user_id") or self.supabase_service.get_user_id_from_request(request)
+            user_id = await current_user.get_id()
             if not user_id:
                 return json({"error": "Unauthorized"}, status=401)
             
@@ -41,7 +45,7 @@ class Supabase(APIController):
             return json(res.data)
         
         except Exception as e:
-            print("supabase error:", e) # log it cuz why not
+            logger.exception("Failed to load transaction log")
             return json({"error": str(e)}, status=500)
         
     
\ No newline at end of file
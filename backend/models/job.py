@@ -2,19 +2,19 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional, Literal, TypedDict
 
-@dataclass
-class VideoGenerationInput:
-    custom_prompt: str
-    global_context: str
-    duration_seconds: int = 6
-
 @dataclass
 class VideoJobRequest:
-    starting_image: bytes
+    starting_image_key: str  # UploadStore key (uploads/{sha256}), the bytes are read by the stage that needs them
     global_context: str
     custom_prompt: str
     duration_seconds: int = 6
-    ending_image: Optional[bytes] = None
+    ending_image_key: Optional[str] = None
+    annotation_description: Optional[str] = None  # already analyzed (batch jobs), skips the Gemini call
+
+@dataclass
+class BatchJobRequest:
+    frames: list[VideoJobRequest]  # one clip per frame, in storyboard order
+    merge: bool = False  # merge the clips into one video once all of them are done
 
 @dataclass
 class JobStatus:
@@ -24,10 +24,81 @@ class JobStatus:
     video_url: Optional[str] = None
     error: Optional[str] = None
     metadata: Optional[dict] = None
+    version: int = 0  # bumped on every stored transition, for conditional reads
+    stages: Optional[list[dict]] = None  # pipeline timeline, served by /video/{job_id}/stages
+
+    def to_dict(self) -> dict:
+        """JSON body sent to the frontend (status route and event stream)"""
+        if self.status == "error":
+            return {"status": "error", "error_message": self.error}
+        if self.status == "waiting":
+            return {"status": "waiting", "job_start_time": self.job_start_time.isoformat()}
+        return {
+            "status": self.status,
+            "job_start_time": self.job_start_time.isoformat(),
+            "job_end_time": self.job_end_time.isoformat() if self.job_end_time else None,
+            "video_url": self.video_url,
+            "metadata": self.metadata
+        }
 
-class VideoJob(TypedDict):
-    """Type hint for video job stored in Redis"""
+@dataclass
+class BatchStatus:
+    job_start_time: datetime
+    status: Literal["done", "waiting", "error"]
+    jobs: list[tuple[str, Optional[JobStatus]]]  # (job_id, status) per clip, None until the clip is admitted
+    job_end_time: Optional[datetime] = None
+    video_url: Optional[str] = None  # merged video, when asked for
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        """JSON body of GET /video/batch/{batch_id}: the batch's own state plus every clip's"""
+        counts = {"pending": 0, "waiting": 0, "done": 0, "error": 0}
+        jobs = []
+        for job_id, status in self.jobs:
+            body = status.to_dict() if status else {"status": "pending"}
+            counts[body["status"]] += 1
+            jobs.append({"job_id": job_id, **body})
+        result = {
+            "status": self.status,
+            "job_start_time": self.job_start_time.isoformat(),
+            "job_end_time": self.job_end_time.isoformat() if self.job_end_time else None,
+            "video_url": self.video_url,
+            "counts": counts,
+            "jobs": jobs,
+        }
+        if self.status == "error":
+            result["error_message"] = self.error
+        return result
+
+class VideoJob(TypedDict, total=False):
+    """Type hint for the job:{id} record stored in Redis (one record per job, msgpack encoded)"""
     job_id: str
-    operation_name: str
+    status: Literal["waiting", "done", "error"]
+    version: int
     job_start_time: str  # ISO format datetime string
+    job_end_time: str
+    video_url: str
+    error: str
     metadata: dict
+    stages: list  # [{"stage", "started", "finished", "failed"?, "cancelled"?}], seconds from pipeline start
+    user_id: str
+    request_id: str  # X-Request-ID of the request that created the job
+    admitted_at: float  # epoch seconds
+    processing_started_at: float  # epoch seconds, first delivery to a worker
+    batch_id: str  # set on the clips of a batch job
+    credits: int  # reserved when the job was created, settled when it finishes
+
+class BatchJob(TypedDict, total=False):
+    """Type hint for the batch:{id} record of a batch job (its clips are ordinary job:{id} records)"""
+    batch_id: str
+    status: Literal["waiting", "done", "error"]
+    version: int
+    job_start_time: str
+    job_end_time: str
+    video_url: str  # merged video
+    error: str
+    user_id: str
+    request_id: str
+    children: list[str]  # job ids, one per frame, assigned up front
+    frames: dict  # starting_image_key -> {"key": normalized frame key, "description": Gemini analysis}
+    not_started: dict  # job_id -> why a clip never got a job (not enough credits)
@@ -0,0 +1,72 @@
+"""
+Compares request authentication paths:
+  - GoTrue round-trip per request (previous behaviour)
+  - local HS256 verification (cache miss)
+  - cached verification (cache hit)
+
+Usage (from backend/):
+    python scripts/bench/auth_bench.py
+    python scripts/bench/auth_bench.py --gotrue-token <access token>   # also time the real GoTrue call
+
+Without --gotrue-token the GoTrue path is simulated with --rtt-ms of latency.
+"""
+import argparse
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import jwt
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from services.auth_service import AuthService  # noqa: E402
+
+SECRET = "bench-secret-bench-secret-bench-secret"
+
+
+def make_token(user_id: str) -> str:
+    return jwt.encode(
+        {"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 3600},
+        SECRET,
+        algorithm="HS256",
+    )
+
+
+def timed(label: str, fn, n: int) -> None:
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {n:>7} calls  {elapsed / n * 1e6:>10.1f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=20_000)
+    parser.add_argument("--rtt-ms", type=float, default=80.0)
+    parser.add_argument("--gotrue-token", default="")
+    args = parser.parse_args()
+
+    tokens = [make_token(str(uuid.uuid4())) for _ in range(args.n)]
+
+    def simulated_gotrue(token: str):
+        time.sleep(args.rtt_ms / 1000)
+        return jwt.decode(token, options={"verify_signature": False})["sub"]
+
+    n_remote = max(1, min(args.n, 50))
+    if args.gotrue_token:
+        from services.supabase_service import SupabaseService
+
+        supabase_service = SupabaseService()
+        timed("gotrue (real)", lambda i: supabase_service._get_user_id_from_gotrue(args.gotrue_token), n_remote)
+    else:
+        timed(f"gotrue (simulated {args.rtt_ms:g}ms)", lambda i: simulated_gotrue(tokens[i]), n_remote)
+
+    auth = AuthService(gotrue_lookup=simulated_gotrue, jwt_secret=SECRET)
+    timed("local verify (miss)", lambda i: auth.get_user_id(tokens[i]), args.n)
+    timed("cache hit", lambda i: auth.get_user_id(tokens[i]), args.n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Outbound downloads: a fresh httpx.AsyncClient per call (old FalService behaviour)
+vs the shared pooled client from utils/http_client.
+
+Reports wall time per download and how many TCP connections each mode opened
+(from the http_client_* counters). By default it downloads from a local uvicorn
+server; pass --url to hit a real CDN object, where TLS handshakes make the gap
+much larger.
+
+Usage (from backend/):
+    python scripts/bench/http_reuse_bench.py --requests 200 --concurrent 8
+    python scripts/bench/http_reuse_bench.py --url https://v3.fal.media/files/.../image.png
+"""
+import argparse
+import asyncio
+import socket
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_app(size: int):
+    body = b"x" * size
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", str(size).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+async def run(name: str, fetch, url: str, requests: int, concurrent: int) -> None:
+    from utils.metrics import HTTP_CLIENT_CONNECTIONS, HTTP_CLIENT_REQUESTS
+
+    host = httpx.URL(url).host
+    opened_before = HTTP_CLIENT_CONNECTIONS.value(host=host)
+    sent_before = HTTP_CLIENT_REQUESTS.value(host=host)
+    semaphore = asyncio.Semaphore(concurrent)
+
+    async def one():
+        async with semaphore:
+            await fetch(url)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    opened = HTTP_CLIENT_CONNECTIONS.value(host=host) - opened_before
+    sent = HTTP_CLIENT_REQUESTS.value(host=host) - sent_before
+    print(f"{name:<10} {elapsed / requests * 1000:8.2f} ms/download  {opened:5.0f} connections for {sent:.0f} requests")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="", help="download this instead of the local test server")
+    parser.add_argument("--size-kb", type=int, default=512)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrent", type=int, default=8)
+    args = parser.parse_args()
+
+    from utils.http_client import _track_connections, create_http_client
+
+    server = None
+    url = args.url
+    if not url:
+        import uvicorn
+
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(make_app(args.size_kb * 1024), port=port, log_level="warning"))
+        asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        url = f"http://127.0.0.1:{port}/image.png"
+
+    async def per_call(target: str):
+        async with httpx.AsyncClient(event_hooks={"request": [_track_connections]}) as client:
+            (await client.get(target)).raise_for_status()
+
+    shared = create_http_client()
+
+    async def pooled(target: str):
+        (await shared.get(target)).raise_for_status()
+
+    try:
+        await run("per-call", per_call, url, args.requests, args.concurrent)
+        await run("shared", pooled, url, args.requests, args.concurrent)
+    finally:
+        await shared.aclose()
+        if server:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Input frame size and latency before/after normalization (utils/images.py).
+
+By default it draws a canvas-like export (flat background, strokes, annotation
+text, transparent margins) at 2560x1440; pass --image to use a real export.
+Reports bytes per output format and normalize time, in process and through the
+ImageService process pool. With --gemini it also times analyze_image_content
+on the original and the normalized frame (needs Vertex credentials).
+
+Usage (from backend/):
+    python scripts/bench/image_normalize_bench.py
+    python scripts/bench/image_normalize_bench.py --image export.png --gemini
+"""
+import argparse
+import asyncio
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+
+def canvas_export(width: int, height: int) -> bytes:
+    rng = random.Random(0)
+    image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((width // 20, height // 20, width * 19 // 20, height * 19 // 20), fill=(246, 243, 236, 255))
+    for _ in range(25):
+        points = [(rng.randrange(width), rng.randrange(height)) for _ in range(6)]
+        colour = tuple(rng.randrange(256) for _ in range(3)) + (255,)
+        draw.line(points, fill=colour, width=rng.randrange(3, 18), joint="curve")
+    for i in range(12):
+        draw.text((width // 10, height // 10 + i * 40), f"annotation {i}: character walks left", fill=(200, 30, 30, 255))
+    out = io.BytesIO()
+    image.save(out, "PNG")
+    return out.getvalue()
+
+
+def timed(fn, *args, repeat: int = 5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(*args)
+    return result, (time.perf_counter() - start) / repeat
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image", help="PNG/JPEG export to use instead of the generated one")
+    parser.add_argument("--width", type=int, default=2560)
+    parser.add_argument("--height", type=int, default=1440)
+    parser.add_argument("--gemini", action="store_true", help="also time Gemini on original vs normalized")
+    args = parser.parse_args()
+
+    from utils.env import settings
+    from utils.images import normalize_image
+
+    original = Path(args.image).read_bytes() if args.image else canvas_export(args.width, args.height)
+    with Image.open(io.BytesIO(original)) as image:
+        print(f"original   {len(original) / 1024:9.1f} KB  {image.size[0]}x{image.size[1]} {image.format}")
+
+    for fmt in ("webp", "jpeg", "png"):
+        (data, mime), seconds = timed(normalize_image, original, settings.IMAGE_MAX_SIDE, fmt, settings.IMAGE_QUALITY)
+        print(f"{fmt:<10} {len(data) / 1024:9.1f} KB  {mime:<11} {seconds * 1000:7.1f} ms/image (in process)")
+
+    from services.image_service import ImageService
+
+    service = ImageService()
+    try:
+        await service.normalize(original)  # start the worker process
+        start = time.perf_counter()
+        normalized = await asyncio.gather(*(service.normalize(original) for _ in range(8)))
+        print(f"pool       {(time.perf_counter() - start) / 8 * 1000:7.1f} ms/image for 8 concurrent ({settings.IMAGE_WORKERS} workers)")
+
+        if args.gemini:
+            from services.vertex_service import VertexService
+
+            vertex = VertexService()
+            prompt = "Describe any animation annotations you see."
+            for name, data in (("original", original), ("normalized", normalized[0])):
+                start = time.perf_counter()
+                await vertex.analyze_image_content(prompt=prompt, image_data=data)
+                print(f"gemini     {name:<10} {(time.perf_counter() - start) * 1000:7.0f} ms")
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
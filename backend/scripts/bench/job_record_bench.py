@@ -0,0 +1,120 @@
+"""
+Job status storage: three pickle+lzma keys (old) vs one msgpack record (new).
+
+  codec: serialize/deserialize time and encoded size for a pending and a done job
+         (plus msgpack+zstd when the zstandard package is installed)
+  read:  status-read latency against a real Redis with --redis-url. The old scheme
+         needs up to three GETs for a finished job; the new one is always one GET.
+
+Usage (from backend/):
+    python scripts/bench/job_record_bench.py --redis-url redis://localhost:6379/0
+"""
+import argparse
+import lzma
+import pickle
+import statistics
+import sys
+import time
+import timeit
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import msgpack
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+PENDING = {
+    "job_id": str(uuid.uuid4()),
+    "status": "waiting",
+    "job_start_time": datetime.now().isoformat(),
+}
+DONE = {
+    **PENDING,
+    "status": "done",
+    "job_end_time": datetime.now().isoformat(),
+    "video_url": f"https://pub.example.r2.dev/videos/{PENDING['job_id']}.mp4",
+    "metadata": {"annotation_description": "An arrow points from the ball towards the goal; the ball should roll left. " * 4},
+}
+
+
+def codecs() -> dict:
+    table = {
+        "pickle+lzma": (lambda d: lzma.compress(pickle.dumps(d)), lambda b: pickle.loads(lzma.decompress(b))),
+        "msgpack": (lambda d: msgpack.packb(d, use_bin_type=True), lambda b: msgpack.unpackb(b, raw=False)),
+    }
+    try:
+        import zstandard
+
+        compressor, decompressor = zstandard.ZstdCompressor(level=3), zstandard.ZstdDecompressor()
+        table["msgpack+zstd"] = (
+            lambda d: compressor.compress(msgpack.packb(d, use_bin_type=True)),
+            lambda b: msgpack.unpackb(decompressor.decompress(b), raw=False),
+        )
+    except ImportError:
+        pass
+    return table
+
+
+def bench_codecs(number: int) -> None:
+    print(f"{'codec':<14} {'record':<8} {'bytes':>6} {'dumps (us)':>11} {'loads (us)':>11}")
+    for name, (dumps, loads) in codecs().items():
+        for label, record in (("pending", PENDING), ("done", DONE)):
+            blob = dumps(record)
+            assert loads(blob) == record
+            dump_us = timeit.timeit(lambda: dumps(record), number=number) / number * 1e6
+            load_us = timeit.timeit(lambda: loads(blob), number=number) / number * 1e6
+            print(f"{name:<14} {label:<8} {len(blob):>6} {dump_us:>11.1f} {load_us:>11.1f}")
+
+
+def percentile(samples: list[float], q: float) -> float:
+    return statistics.quantiles(samples, n=100)[int(q) - 1]
+
+
+def bench_reads(redis_url: str, reads: int) -> None:
+    import redis
+
+    client = redis.Redis.from_url(redis_url)
+    old_dumps = lambda d: lzma.compress(pickle.dumps(d))
+    job_id = f"bench-{uuid.uuid4()}"
+    try:
+        # old layout for a finished job: pending + final keys, lookups went pending -> error -> done
+        client.setex(f"job:{job_id}:pending", 600, old_dumps(PENDING))
+        client.setex(f"job:{job_id}", 600, old_dumps(DONE))
+        client.setex(f"{job_id}:new", 600, msgpack.packb(DONE, use_bin_type=True))
+
+        def old_read():
+            data = client.get(f"job:{job_id}:pending")
+            if client.get(f"job:{job_id}:error") is None:
+                data = client.get(f"job:{job_id}")
+            return pickle.loads(lzma.decompress(data))
+
+        def new_read():
+            return msgpack.unpackb(client.get(f"{job_id}:new"), raw=False)
+
+        for name, read in (("three keys", old_read), ("one record", new_read)):
+            samples = []
+            for _ in range(reads):
+                start = time.perf_counter()
+                read()
+                samples.append((time.perf_counter() - start) * 1000)
+            print(f"{name:<11} p50 {percentile(samples, 50):6.3f} ms  p99 {percentile(samples, 99):6.3f} ms")
+    finally:
+        client.delete(f"job:{job_id}:pending", f"job:{job_id}", f"{job_id}:new")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20000, help="codec iterations")
+    parser.add_argument("--redis-url", default="", help="also time status reads against this Redis")
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+
+    bench_codecs(args.number)
+    if args.redis_url:
+        print()
+        bench_reads(args.redis_url, args.reads)
+
+
+if __name__ == "__main__":
+    main()
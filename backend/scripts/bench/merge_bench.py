@@ -0,0 +1,104 @@
+"""
+Full re-merge vs incremental prefix merge over storyboard chains of 2..N clips.
+
+Generates a synthetic 720p clip with ffmpeg, then for every chain length n:
+  - full:        merge clips 1..n from scratch (what every call did before)
+  - incremental: merge clips 1..n when 1..n-1 is already merged (the common case)
+Merged outputs are written to a local directory instead of R2 and the cache runs
+in its in-process mode, so only ffmpeg + I/O time is measured. Requires ffmpeg.
+
+Usage (from backend/):
+    python scripts/bench/merge_bench.py --max-clips 30
+"""
+import argparse
+import asyncio
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+
+class LocalStorage:
+    """Writes objects to a directory and hands back file paths ffmpeg can read."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def get_url(self, path: str) -> str:
+        return str(self.root / path)
+
+    async def upload(self, data, path: str, content_type: str = "", on_first_part=None) -> str:
+        target = self.root / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(target, "wb") as f:
+            async for chunk in data:
+                f.write(chunk)
+        return str(target)
+
+    async def delete(self, path: str) -> None:
+        (self.root / path).unlink(missing_ok=True)
+
+
+def make_clips(root: Path, count: int, seconds: int) -> list[str]:
+    source = root / "clip.mp4"
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc=duration={seconds}:size=1280x720:rate=24",
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", str(source),
+        ],
+        check=True,
+    )
+    clips = []
+    for i in range(count):
+        clip = root / f"clip_{i}.mp4"
+        shutil.copy(source, clip)
+        clips.append(str(clip))
+    return clips
+
+
+def new_service(storage: LocalStorage):
+    from services.video_merge_service import VideoMergeService
+
+    service = VideoMergeService(storage)
+    service.cache.redis = None  # in-process cache only
+    return service
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-clips", type=int, default=30)
+    parser.add_argument("--clip-seconds", type=int, default=6)
+    args = parser.parse_args()
+
+    if not shutil.which("ffmpeg"):
+        raise SystemExit("ffmpeg is required")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        clips = make_clips(root, args.max_clips, args.clip_seconds)
+        storage = LocalStorage(root / "out")
+        incremental = new_service(storage)
+
+        print(f"{'clips':>5} {'full (s)':>10} {'incremental (s)':>16}")
+        for n in range(2, args.max_clips + 1):
+            chain = clips[:n]
+
+            full = new_service(storage)
+            start = time.perf_counter()
+            await full.merge_videos(chain, "bench")
+            full_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            await incremental.merge_videos(chain, "bench")
+            incremental_time = time.perf_counter() - start
+
+            print(f"{n:>5} {full_time:>10.3f} {incremental_time:>16.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Load test: status-poll latency while Gemini calls are in flight.
+
+Polls GET /api/jobs/video/{job_id} at a steady rate and reports p50/p99, first
+with no other load, then while --gemini concurrent POST /api/gemini/extract-context
+calls run against the same server. With a non-blocking VertexService both phases
+should report about the same p99.
+
+Usage (server running, from backend/):
+    python scripts/bench/poll_latency_bench.py --url http://localhost:8000 --video clip.mp4 --gemini 8
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def poll(client: httpx.AsyncClient, url: str, duration: float, rate: float) -> list[float]:
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await client.get(url)
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(max(0.0, 1 / rate - latencies[-1]))
+    return latencies
+
+
+async def gemini_load(client: httpx.AsyncClient, url: str, video: bytes, token: str, stop: asyncio.Event) -> int:
+    calls = 0
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    while not stop.is_set():
+        await client.post(url, files={"files": ("video.mp4", video, "video/mp4")}, headers=headers, timeout=180)
+        calls += 1
+    return calls
+
+
+def report(label: str, latencies: list[float]) -> None:
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{label:<22} n={len(ordered):<5} p50={statistics.median(ordered) * 1000:7.1f}ms "
+        f"p99={p99 * 1000:7.1f}ms max={ordered[-1] * 1000:7.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--video", required=True, help="small mp4 sent to extract-context")
+    parser.add_argument("--gemini", type=int, default=8, help="concurrent Gemini calls")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--rate", type=float, default=20, help="status polls per second")
+    parser.add_argument("--token", default="")
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    status_url = f"{base}/api/jobs/video/bench-missing-job"
+    with open(args.video, "rb") as f:
+        video = f.read()
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        report("idle", await poll(client, status_url, args.duration, args.rate))
+
+        stop = asyncio.Event()
+        load = [
+            asyncio.create_task(gemini_load(client, f"{base}/api/gemini/extract-context", video, args.token, stop))
+            for _ in range(args.gemini)
+        ]
+        await asyncio.sleep(2)  # let the Gemini calls get in flight
+        report(f"{args.gemini} gemini in flight", await poll(client, status_url, args.duration, args.rate))
+        stop.set()
+        calls = sum(await asyncio.gather(*load))
+        print(f"gemini calls completed: {calls}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Load test: N concurrent watchers of pending jobs, polling vs Server-Sent Events.
+
+  poll: every watcher GETs /api/jobs/video/{job_id} every --interval seconds (the old frontend)
+  sse:  every watcher holds one GET /api/jobs/video/{job_id}/events stream open
+
+Reports HTTP requests/sec sent to the server and, with --server-pid, the server's
+CPU usage over the run (read from /proc, Linux only). Jobs must exist and stay
+pending for the whole run.
+
+Usage (server running, from backend/):
+    python scripts/bench/status_watchers_bench.py --job-ids ids.txt --watchers 1000 --server-pid 1234
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime + stime, in clock ticks
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def poller(client: httpx.AsyncClient, url: str, interval: float, deadline: float, counter: list[int]) -> None:
+    while time.perf_counter() < deadline:
+        await client.get(url)
+        counter[0] += 1
+        await asyncio.sleep(interval)
+
+
+async def streamer(client: httpx.AsyncClient, url: str, deadline: float, counter: list[int]) -> None:
+    counter[0] += 1
+    try:
+        async with client.stream("GET", url, timeout=None) as response:
+            async for _line in response.aiter_lines():
+                if time.perf_counter() >= deadline:
+                    break
+    except httpx.HTTPError:
+        pass
+
+
+async def run(mode: str, base: str, job_ids: list[str], watchers: int, interval: float, duration: float, pid: int):
+    counter = [0]
+    limits = httpx.Limits(max_connections=watchers + 10, max_keepalive_connections=watchers + 10)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        cpu_start = cpu_seconds(pid) if pid else 0.0
+        start = time.perf_counter()
+        deadline = start + duration
+        tasks = []
+        for i in range(watchers):
+            job_id = job_ids[i % len(job_ids)]
+            if mode == "poll":
+                tasks.append(poller(client, f"{base}/api/jobs/video/{job_id}", interval, deadline, counter))
+            else:
+                tasks.append(streamer(client, f"{base}/api/jobs/video/{job_id}/events", deadline, counter))
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=duration + 30)
+        elapsed = time.perf_counter() - start
+        cpu = f"  server cpu {100 * (cpu_seconds(pid) - cpu_start) / elapsed:6.1f}%" if pid else ""
+    print(f"{mode:<5} {watchers} watchers  {counter[0] / elapsed:8.1f} req/s{cpu}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--job-ids", required=True, help="file with one pending job id per line")
+    parser.add_argument("--watchers", type=int, default=500)
+    parser.add_argument("--interval", type=float, default=5, help="poll interval used by the old frontend")
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--server-pid", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.job_ids) as f:
+        job_ids = [line.strip() for line in f if line.strip()]
+    base = args.url.rstrip("/")
+    for mode in ("poll", "sse"):
+        await run(mode, base, job_ids, args.watchers, args.interval, args.duration, args.server_pid)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""
+Memory/throughput comparison for moving a generated video from the fal CDN into R2:
+  - buffered: response.content, then one upload of the whole body (previous behaviour)
+  - streaming: aiter_bytes feeding StorageService's multipart upload
+
+The CDN is an in-process httpx transport serving --size-mb of data and R2 is replaced
+by a sink that discards parts after --r2-ms of simulated latency, so the numbers
+isolate our own memory use. Peak memory is measured with tracemalloc per transfer.
+
+Usage (from backend/):
+    python scripts/bench/transfer_bench.py --size-mb 40 --concurrent 8
+"""
+import argparse
+import asyncio
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+
+class SinkS3:
+    """Accepts uploads and throws the bytes away."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def put_object(self, **kwargs):
+        time.sleep(self.latency)
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "bench"}
+
+    def upload_part(self, **kwargs):
+        time.sleep(self.latency)
+        return {"ETag": "etag"}
+
+    def complete_multipart_upload(self, **kwargs):
+        pass
+
+    def abort_multipart_upload(self, **kwargs):
+        pass
+
+
+def cdn_transport(size: int) -> httpx.MockTransport:
+    chunk = b"\0" * (64 * 1024)
+
+    class Body(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            sent = 0
+            while sent < size:
+                piece = chunk[: min(len(chunk), size - sent)]
+                sent += len(piece)
+                yield piece
+
+    return httpx.MockTransport(
+        lambda request: httpx.Response(200, headers={"content-length": str(size)}, stream=Body())
+    )
+
+
+async def run(label: str, fn, concurrent: int, size: int) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(fn(i) for i in range(concurrent)))
+    elapsed = time.perf_counter() - start
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    total_mb = size * concurrent / 1e6
+    print(f"{label:<10} {concurrent} x {size / 1e6:.0f} MB  peak {peak / 1e6:8.1f} MB  {total_mb / elapsed:8.1f} MB/s")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=40)
+    parser.add_argument("--concurrent", type=int, default=8)
+    parser.add_argument("--r2-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    from services.fal_service import FalService
+    from services.storage_service import StorageService
+
+    size = args.size_mb * 1024 * 1024
+    storage = StorageService()
+    storage.client = SinkS3(args.r2_ms / 1000)
+    storage.bucket_name = "bench"
+    storage.public_url = "https://bench"
+    transport = cdn_transport(size)
+
+    async def buffered(i: int):
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get("https://cdn/video.mp4")
+            data = response.content
+        await storage.upload(data, f"bench/{i}.mp4", "video/mp4")
+
+    async def streaming(i: int):
+        import hashlib
+
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream("GET", "https://cdn/video.mp4") as response:
+                body = FalService._verified_stream(response, hashlib.sha256())
+                await storage.upload(body, f"bench/{i}.mp4", "video/mp4")
+
+    await run("buffered", buffered, args.concurrent, size)
+    await run("streaming", streaming, args.concurrent, size)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -50,4 +50,134 @@ END;
 $$ LANGUAGE plpgsql security definer;
 CREATE TRIGGER on_auth_user_created
   AFTER INSERT ON auth.users
-  FOR EACH ROW EXECUTE PROCEDURE public.handle_new_user();
\ No newline at end of file
+  FOR EACH ROW EXECUTE PROCEDURE public.handle_new_user();
+
+-- Credits held by a job while it runs: committed when it succeeds, refunded when it fails
+CREATE TABLE IF NOT EXISTS public.credit_reservations (
+  reservation_id text PRIMARY KEY,  -- the job id
+  user_id uuid NOT NULL REFERENCES public.profiles (user_id),
+  transaction_type transaction_type NOT NULL,
+  credits numeric NOT NULL,
+  status text NOT NULL DEFAULT 'reserved' CHECK (status IN ('reserved', 'committed', 'refunded')),
+  created_at timestamptz NOT NULL DEFAULT now(),
+  settled_at timestamptz
+);
+
+-- RLS on with no policies: only service_role (which bypasses RLS) can touch
+-- reservations, clients with the anon or a user key can't read or forge them
+ALTER TABLE public.credit_reservations ENABLE ROW LEVEL SECURITY;
+
+-- Deducts credits and appends the ledger row in one transaction (one RPC).
+-- With p_reservation_id the credits are also held as a reservation until
+-- settle_user_credits; reserving the same id twice deducts once.
+-- Returns the new balance.
+CREATE OR REPLACE FUNCTION public.reserve_user_credits(
+  p_user_id uuid,
+  p_transaction_type transaction_type,
+  p_credits numeric,
+  p_reservation_id text DEFAULT NULL
+)
+RETURNS numeric
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_balance numeric;
+BEGIN
+  -- only ever a charge: credits are added by refunds and purchases, not here
+  IF p_credits IS NULL OR p_credits <= 0 THEN
+    RAISE EXCEPTION 'invalid_credits: % is not a positive amount', p_credits;
+  END IF;
+
+  -- lock user row to avoid race conditions
+  SELECT credits
+    INTO v_balance
+    FROM public.profiles
+   WHERE profiles.user_id = p_user_id
+   FOR UPDATE;
+
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'user_not_found: user % does not exist', p_user_id;
+  END IF;
+
+  IF p_reservation_id IS NOT NULL THEN
+    INSERT INTO public.credit_reservations (reservation_id, user_id, transaction_type, credits)
+    VALUES (p_reservation_id, p_user_id, p_transaction_type, p_credits)
+    ON CONFLICT (reservation_id) DO NOTHING;
+    IF NOT FOUND THEN
+      -- retried call: already deducted
+      RETURN COALESCE(v_balance, 0);
+    END IF;
+  END IF;
+
+  v_balance := COALESCE(v_balance, 0) - p_credits;
+
+  IF v_balance < 0 THEN
+    RAISE EXCEPTION 'insufficient_credits: cannot apply change % to user %, not enough credits',
+      p_credits, p_user_id;
+  END IF;
+
+  UPDATE public.profiles
+    SET credits = v_balance
+   WHERE user_id = p_user_id;
+
+  INSERT INTO public.transaction_log (transaction_type, user_id, credit_usage)
+  VALUES (p_transaction_type, p_user_id, p_credits);
+
+  RETURN v_balance;
+END;
+$$;
+
+-- Settles a reservation: commits it, or refunds it (credits back plus a
+-- 'credit_refund' ledger row). Settling an already settled or unknown
+-- reservation changes nothing. Returns the reservation's status afterwards.
+CREATE OR REPLACE FUNCTION public.settle_user_credits(
+  p_reservation_id text,
+  p_refund boolean
+)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_reservation public.credit_reservations%ROWTYPE;
+  v_status text;
+BEGIN
+  SELECT *
+    INTO v_reservation
+    FROM public.credit_reservations
+   WHERE reservation_id = p_reservation_id
+   FOR UPDATE;
+
+  IF NOT FOUND THEN
+    RETURN NULL;
+  END IF;
+
+  IF v_reservation.status <> 'reserved' THEN
+    RETURN v_reservation.status;
+  END IF;
+
+  IF p_refund THEN
+    UPDATE public.profiles
+      SET credits = COALESCE(credits, 0) + v_reservation.credits
+     WHERE user_id = v_reservation.user_id;
+
+    INSERT INTO public.transaction_log (transaction_type, user_id, credit_usage)
+    VALUES ('credit_refund', v_reservation.user_id, -v_reservation.credits);
+  END IF;
+
+  v_status := CASE WHEN p_refund THEN 'refunded' ELSE 'committed' END;
+
+  UPDATE public.credit_reservations
+    SET status = v_status,
+        settled_at = now()
+   WHERE reservation_id = p_reservation_id;
+
+  RETURN v_status;
+END;
+$$;
+
+-- Functions are executable by PUBLIC by default, and PostgREST exposes them to
+-- anon / authenticated callers: keep the credit functions server-side only
+REVOKE EXECUTE ON FUNCTION public.reserve_user_credits(uuid, transaction_type, numeric, text) FROM public, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.settle_user_credits(text, boolean) FROM public, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.reserve_user_credits(uuid, transaction_type, numeric, text) TO service_role;
+GRANT EXECUTE ON FUNCTION public.settle_user_credits(text, boolean) TO service_role;
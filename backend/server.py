@@ -1,30 +1,62 @@
 import logging
-from blacksheep import Application, Request, Request
+import time
+import uuid
+from typing import Optional
+from blacksheep import Application, Content, Request, Response, json
+from blacksheep.server.di import register_http_context
+from services.auth_service import AuthService, CurrentUser
+from services.batch_job_service import BatchJobService
+from services.credit_service import CreditService
 from services.storage_service import StorageService
 from services.vertex_service import VertexService
 from services.fal_service import FalService
+from services.image_service import ImageService
 from services.job_service import JobService
+from services.scene_context_service import SceneContextService
+from services.upload_store import UploadStore
 from services.supabase_service import SupabaseService
 from services.video_merge_service import VideoMergeService
-from rodi import Container
+from rodi import ActivationScope, Container
+from utils.env import settings
+from utils.http_client import create_http_client
+from utils.logging_config import request_id_var, setup_logging
+from utils.metrics import HTTP_REQUEST_SECONDS, JOB_EVENT_WATCHERS, JOB_QUEUE_DEPTH, JOBS_ADMITTED, render, route_label
+from utils.uploads import UploadTooLarge
+import httpx
 
 # Import controllers for auto-discovery
 from controllers import jobs, files, supabase, gemini
 
+setup_logging()
+logger = logging.getLogger(__name__)
+
 services = Container()
 
+# created on app start (see open_http_client), so a stopped and restarted app never reuses a closed client
+http_client: Optional[httpx.AsyncClient] = None
 storage_service = StorageService()
 vertex_service = VertexService()
 fal_service = FalService(storage_service)
-job_service = JobService(fal_service, vertex_service)
+scene_context_service = SceneContextService(vertex_service, storage_service)
+upload_store = UploadStore(storage_service)
+image_service = ImageService()
+credit_service = CreditService()
+job_service = JobService(fal_service, vertex_service, scene_context_service, upload_store, image_service, credit_service)
 supabase_service = SupabaseService()
 video_merge_service = VideoMergeService(storage_service)
+batch_job_service = BatchJobService(job_service, vertex_service, image_service, upload_store, video_merge_service)
 
 services.add_instance(storage_service, StorageService)
 services.add_instance(vertex_service, VertexService)
 services.add_instance(fal_service, FalService)
+services.add_instance(scene_context_service, SceneContextService)
+services.add_instance(upload_store, UploadStore)
+services.add_instance(image_service, ImageService)
+services.add_instance(credit_service, CreditService)
 services.add_instance(job_service, JobService)
+services.add_instance(batch_job_service, BatchJobService)
 services.add_instance(supabase_service, SupabaseService)
+services.add_instance(supabase_service.auth, AuthService)
 services.add_instance(video_merge_service, VideoMergeService)
 
 app = Application(services=services)
@@ -36,22 +68,104 @@ app.use_cors(
     allow_headers="*",
 )
 
-async def attach_user(request: Request):
+async def request_id(request: Request, handler):
+    # correlation id for every log line of this request (and of the jobs it creates)
+    value = (request.get_first_header(b"X-Request-ID") or b"").decode("latin-1")[:64] or uuid.uuid4().hex
+    request_id_var.set(value)
+    response = await handler(request)
+    if response:
+        response.add_header(b"X-Request-ID", value.encode("latin-1"))
+    return response
+
+async def request_metrics(request: Request, handler):
+    start = time.perf_counter()
+    match = app.router.get_match(request)
+    # shared with the auth latency histogram (CurrentUser)
+    request.scope["route"] = route = route_label(match.pattern if match else None)
     try:
-        uid = supabase_service.get_user_id_from_request(request)
-        if uid:
-            request.scope["user_id"] = uid
-    except Exception:
-        # Do not block request processing on auth parsing errors
-        pass
+        response = await handler(request)
+    except Exception as exc:
+        # exception handlers (UploadTooLarge -> 413, ...) run after the middlewares;
+        # apply them here so the recorded status is the one actually sent
+        response = await app.handle_request_handler_exception(request, exc)
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=route,
+        status=str(response.status if response else 204),
+    )
+    return response
+
+async def upload_too_large(application: Application, request: Request, exc: UploadTooLarge):
+    return json({"error": str(exc)}, status=413)
+
+app.exceptions_handlers[UploadTooLarge] = upload_too_large
+
+app.middlewares.append(request_id)
+app.middlewares.append(request_metrics)
+
+# Auth is resolved per handler through the CurrentUser dependency, so public
+# routes (health checks, status polls) never touch it
+register_http_context(app)
+
+def current_user_factory(context: ActivationScope) -> CurrentUser:
+    return CurrentUser(context.scoped_services[Request], supabase_service.auth)
+
+services.add_scoped_by_factory(current_user_factory, CurrentUser)
 
-app.middlewares.append(attach_user)
+async def start_job_worker(application: Application):
+    if settings.JOB_WORKER_EMBEDDED:
+        job_service.start_worker()
+        batch_job_service.start_worker()
+
+async def stop_job_worker(application: Application):
+    await batch_job_service.stop_worker()
+    await job_service.stop_worker()
+
+async def open_http_client(application: Application):
+    global http_client
+    http_client = create_http_client()
+    fal_service.http = scene_context_service.http = credit_service.http_client = http_client
+    if httpx.AsyncClient not in services:
+        # resolves to the current run's client, also after a restart
+        services.add_transient_by_factory(lambda: http_client, httpx.AsyncClient)
+
+async def close_http_client(application: Application):
+    await http_client.aclose()
+
+async def start_image_pool(application: Application):
+    await image_service.warm_up()
+
+async def close_image_pool(application: Application):
+    image_service.close()
+
+app.on_start += open_http_client
+app.on_start += start_job_worker
+app.on_start += start_image_pool
+app.on_stop += stop_job_worker
+app.on_stop += close_http_client
+app.on_stop += close_image_pool
 
 # random test routes
 @app.router.get("/")
 def hello_world():
     return "Hello World"
 
+@app.router.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (values are per process)"""
+    if job_service.queue:
+        try:
+            JOB_QUEUE_DEPTH.set(await job_service.queue.depth())
+        except Exception as e:
+            logger.warning("Could not read job queue depth: %s", e)
+    try:
+        JOBS_ADMITTED.set(await job_service.admission.in_flight())
+    except Exception as e:
+        logger.warning("Could not read admitted jobs: %s", e)
+    JOB_EVENT_WATCHERS.set(job_service.events.watcher_count())
+    return Response(200, content=Content(b"text/plain; version=0.0.4; charset=utf-8", render().encode()))
+
 @app.router.get("/test")
 async def test_route():
     return await fal_service.test_service()
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Callable, Optional
+
+import jwt
+from blacksheep import Request
+from cachetools import TLRUCache
+from utils.metrics import AUTH_LATENCY, route_label
+
+# Supabase signs user access tokens for this audience
+SUPABASE_AUDIENCE = "authenticated"
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+
+class AuthService:
+    """
+    Verifies Supabase access tokens locally instead of asking GoTrue every time.
+
+    - HS256 tokens are checked against the project JWT secret
+    - RS256/ES256 tokens are checked against the project's JWKS (keys cached by PyJWT)
+    - Verified tokens are cached by sha256(token) until the token's own `exp`
+    - GoTrue is only called on a cache miss when local verification isn't possible,
+      or on every cache miss when revocation checks are enabled
+    """
+
+    def __init__(
+        self,
+        gotrue_lookup: Callable[[str], Optional[str]],
+        jwt_secret: str = "",
+        jwks_url: str = "",
+        issuer: str = "",
+        revocation_check: bool = False,
+        revocation_cache_seconds: int = 60,
+        max_cache_size: int = 10_000,
+    ):
+        self.gotrue_lookup = gotrue_lookup
+        self.jwt_secret = jwt_secret
+        self.issuer = issuer or None
+        self.revocation_check = revocation_check
+        self.revocation_cache_seconds = revocation_cache_seconds
+        self.jwks_client = jwt.PyJWKClient(jwks_url, cache_keys=True, lifespan=3600) if jwks_url else None
+
+        # value is (user_id, expires_at); each entry expires at its own deadline
+        self._cache: TLRUCache = TLRUCache(
+            maxsize=max_cache_size,
+            ttu=lambda _key, value, now: value[1],
+            timer=time.time,
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+        return entry[0] if entry else None
+
+    def _cache_put(self, key: str, user_id: str, expires_at: float) -> None:
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._cache[key] = (user_id, expires_at)
+
+    def _decode_locally(self, token: str) -> Optional[dict]:
+        """
+        Returns the verified claims, or None when this token can't be checked locally
+        (unknown algorithm, no secret configured, JWKS unreachable).
+        Raises jwt.InvalidTokenError when the token is definitely invalid.
+        """
+        alg = jwt.get_unverified_header(token).get("alg")
+        if alg == "HS256":
+            if not self.jwt_secret:
+                return None
+            key = self.jwt_secret
+        elif alg in ASYMMETRIC_ALGORITHMS:
+            if not self.jwks_client:
+                return None
+            try:
+                key = self.jwks_client.get_signing_key_from_jwt(token).key
+            except jwt.PyJWKClientError:
+                return None
+        else:
+            return None
+
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[alg],
+            audience=SUPABASE_AUDIENCE,
+            issuer=self.issuer,
+            options={"require": ["exp", "sub"]},
+        )
+
+    def get_user_id(self, token: str) -> Optional[str]:
+        """Return the user id for a valid access token, or None."""
+        if not token:
+            return None
+
+        key = self._cache_key(token)
+        cached = self._cache_get(key)
+        if cached:
+            return cached
+
+        try:
+            claims = self._decode_locally(token)
+        except jwt.InvalidTokenError:
+            # bad signature, expired, wrong audience... GoTrue would say the same
+            return None
+
+        if claims is None:
+            # can't verify here, ask GoTrue and cache for a short while
+            user_id = self.gotrue_lookup(token)
+            if user_id:
+                self._cache_put(key, user_id, time.time() + self.revocation_cache_seconds)
+            return user_id
+
+        user_id = claims["sub"]
+        expires_at = float(claims["exp"])
+
+        if self.revocation_check:
+            # signature is fine but the session may have been revoked (logout, ban)
+            if self.gotrue_lookup(token) != user_id:
+                return None
+            expires_at = min(expires_at, time.time() + self.revocation_cache_seconds)
+
+        self._cache_put(key, user_id, expires_at)
+        return user_id
+
+    async def get_user_id_async(self, token: str) -> Optional[str]:
+        """Same as get_user_id, but a cache miss (which may hit GoTrue or JWKS) runs off the event loop."""
+        if not token:
+            return None
+        cached = self._cache_get(self._cache_key(token))
+        if cached:
+            return cached
+        return await asyncio.to_thread(self.get_user_id, token)
+
+    @staticmethod
+    def get_bearer_token(request: Request) -> Optional[str]:
+        """Extract the Bearer token from the Authorization header."""
+        auth_header = request.get_first_header(b"authorization")
+        if not auth_header:
+            return None
+        try:
+            value = auth_header.decode()
+        except UnicodeDecodeError:
+            return None
+        if not value.lower().startswith("bearer "):
+            return None
+        return value[7:].strip() or None
+
+
+class CurrentUser:
+    """
+    The caller of the current request, injected into handlers as a scoped service.
+    Nothing is verified until a handler asks for the id, and then only once per request.
+    """
+
+    def __init__(self, request: Request, auth_service: AuthService):
+        self.request = request
+        self.auth_service = auth_service
+        self._resolved = False
+        self._user_id: Optional[str] = None
+
+    async def get_id(self) -> Optional[str]:
+        if self._resolved:
+            return self._user_id
+
+        with AUTH_LATENCY.time(route=self.request.scope.get("route") or route_label(None)):
+            token = self.auth_service.get_bearer_token(self.request)
+            self._user_id = await self.auth_service.get_user_id_async(token) if token else None
+
+        self._resolved = True
+        if self._user_id:
+            self.request.scope["user_id"] = self._user_id
+        return self._user_id
@@ -0,0 +1,359 @@
+import asyncio
+import dataclasses
+import logging
+import uuid
+from datetime import datetime
+from typing import Optional
+
+import msgpack
+import redis
+
+from models.job import BatchJob, BatchJobRequest, BatchStatus, JobStatus, VideoJobRequest
+from services.credit_service import InsufficientCredits
+from services.image_service import ImageService
+from services.job_admission import AdmissionRejected
+from services.job_queue import JobQueue
+from services.job_service import ANALYZE_PROMPT, JobService
+from services.upload_store import UploadStore
+from services.vertex_service import VertexService
+from services.video_merge_service import VideoMergeService
+from utils.env import settings
+from utils.images import sniff_mime
+from utils.logging_config import job_id_var, request_id_var
+from utils.metrics import BATCH_ANALYSIS_FRAMES
+
+logger = logging.getLogger(__name__)
+
+# A waiting batch outlives its slowest clip; finished ones live as long as their clips' records
+BATCH_TTL_SECONDS = {"waiting": 24 * 3600, "error": 3600, "done": 3600}
+# Re-read a clip's record this often even without a published change
+CHILD_RECHECK_SECONDS = 10
+
+
+class BatchJobService:
+    """
+    Generates a whole storyboard branch from one request.
+
+    A batch is a batch:{id} record plus one ordinary video job per frame (job ids
+    assigned up front), so clips keep their own status, events and stage timeline.
+    The batch itself is coordinated from its own Redis stream ("jobs:batch"), so a
+    restarted worker resumes it; without Redis it runs as an in-process task.
+
+    - Every distinct start frame is normalized once and all of them are described
+      with batched Gemini calls (BATCH_ANALYZE_MAX_FRAMES per call); the clips get
+      the normalized frame and its description and skip both steps
+    - Clips run BATCH_CONCURRENCY at a time. Each is admitted like a single job;
+      one over a cap waits for a slot instead of failing the batch
+    - The batch holds one admission slot of its own while it prepares frames, so
+      a caller already at the cap gets the same 429 as for a single job
+    - With `merge`, the clips are merged in order once all of them are done
+    """
+
+    def __init__(
+        self,
+        job_service: JobService,
+        vertex_service: VertexService,
+        image_service: ImageService,
+        upload_store: UploadStore,
+        video_merge_service: VideoMergeService,
+    ):
+        self.job_service = job_service
+        self.vertex_service = vertex_service
+        self.image_service = image_service
+        self.upload_store = upload_store
+        self.video_merge_service = video_merge_service
+        self.redis_client = job_service.redis_client
+        self.admission = job_service.admission
+        self.queue = self._make_queue() if job_service.queue else None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def _make_queue(self) -> JobQueue:
+        return JobQueue(
+            settings.REDIS_URL,
+            stream="jobs:batch",
+            group="batch-workers",
+            concurrency=settings.BATCH_WORKER_CONCURRENCY,
+            visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+            max_deliveries=settings.JOB_MAX_DELIVERIES,
+        )
+
+    @staticmethod
+    def _encode_request(request: BatchJobRequest) -> bytes:
+        return msgpack.packb(dataclasses.asdict(request), use_bin_type=True)
+
+    @staticmethod
+    def _decode_request(payload: bytes) -> BatchJobRequest:
+        data = msgpack.unpackb(payload, raw=False)
+        return BatchJobRequest(frames=[VideoJobRequest(**frame) for frame in data["frames"]], merge=data["merge"])
+
+    async def _save(self, batch_id: str, batch: BatchJob) -> None:
+        await self.redis_client.set(
+            f"batch:{batch_id}", msgpack.packb(batch, use_bin_type=True), ex=BATCH_TTL_SECONDS[batch["status"]]
+        )
+
+    async def _load(self, batch_id: str) -> Optional[BatchJob]:
+        data = await self.redis_client.get(f"batch:{batch_id}")
+        return msgpack.unpackb(data, raw=False) if data else None
+
+    async def create_batch_job(self, request: BatchJobRequest, user_id: str) -> tuple[str, list[str]]:
+        """
+        Create a batch job and return (batch_id, job ids of its clips) immediately.
+        Raises AdmissionRejected when the user or the whole service is at its cap.
+        """
+        batch_id = str(uuid.uuid4())
+        reason = await self.admission.acquire(batch_id, user_id)
+        if reason:
+            raise AdmissionRejected(reason, settings.JOB_ADMISSION_RETRY_AFTER_SECONDS)
+
+        children = [str(uuid.uuid4()) for _ in request.frames]
+        try:
+            await self._save(batch_id, {
+                "batch_id": batch_id,
+                "status": "waiting",
+                "version": 1,
+                "job_start_time": datetime.now().isoformat(),
+                "user_id": user_id,
+                "request_id": request_id_var.get(),
+                "children": children,
+            })
+            if self.queue:
+                await self.queue.enqueue(batch_id, self._encode_request(request))
+            else:
+                task = asyncio.create_task(self._process_batch(batch_id, request))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except BaseException:
+            await self.admission.release(batch_id)
+            raise
+
+        return batch_id, children
+
+    async def run_worker(self) -> None:
+        """Coordinate queued batches until stop_worker() is called."""
+        if not self.queue:
+            return
+        await self.queue.run(
+            self._run_queued_batch,
+            on_dead_letter=self._fail_abandoned_batch,
+            on_heartbeat=self.admission.renew,
+        )
+
+    def start_worker(self) -> None:
+        if self.queue and not self._worker_task:
+            self._worker_task = asyncio.create_task(self.run_worker())
+
+    async def stop_worker(self) -> None:
+        if not self.queue:
+            return
+        await self.queue.stop()
+        if self._worker_task:
+            self._worker_task.cancel()
+            self._worker_task = None
+
+    async def _run_queued_batch(self, batch_id: str, payload: bytes) -> None:
+        batch = await self._load(batch_id)
+        if batch and batch["status"] != "waiting":
+            return
+        await self._process_batch(batch_id, self._decode_request(payload))
+
+    async def _fail_abandoned_batch(self, batch_id: str) -> None:
+        batch = await self._load(batch_id)
+        if batch is None:
+            await self.admission.release(batch_id)
+            return
+        await self._finish(batch_id, {
+            **batch,
+            "status": "error",
+            "error": "Batch generation was interrupted too many times. Please try again.",
+        })
+
+    async def _finish(self, batch_id: str, batch: BatchJob) -> None:
+        batch["version"] = batch.get("version", 0) + 1
+        batch["job_end_time"] = datetime.now().isoformat()
+        await self._save(batch_id, batch)
+        await self._release_slot(batch_id)
+
+    async def _release_slot(self, batch_id: str) -> None:
+        try:
+            await self.admission.release(batch_id)
+        except redis.RedisError as e:
+            # the lease runs out on its own
+            logger.warning("Failed to release admission slot for batch %s: %s", batch_id, e)
+
+    async def _process_batch(self, batch_id: str, request: BatchJobRequest) -> None:
+        job_id_var.set(batch_id)
+        try:
+            batch = await self._load(batch_id)
+        except Exception:
+            # the queue dead-letters the batch; its slot mustn't wait for the lease
+            await self._release_slot(batch_id)
+            raise
+        if batch is None:
+            logger.warning("Batch %s expired before it ran", batch_id)
+            await self._release_slot(batch_id)
+            return
+        if batch.get("request_id"):
+            request_id_var.set(batch["request_id"])
+        # the lease may have run out while the batch was queued
+        await self.admission.renew(batch_id, batch["user_id"])
+
+        try:
+            frames = await self._prepare(batch_id, batch, request)
+            # from here on every clip is admitted on its own
+            await self._release_slot(batch_id)
+
+            slots = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+            results = await asyncio.gather(*(
+                self._run_child(batch_id, batch, child_id, frame, slots)
+                for child_id, frame in zip(batch["children"], frames)
+            ))
+            failed = [status for status in results if status is None or status.status != "done"]
+            if failed:
+                error = f"{len(failed)} of {len(results)} clips failed"
+                if str(InsufficientCredits()) in batch.get("not_started", {}).values():
+                    error += " (not enough credits)"
+                await self._finish(batch_id, {**batch, "status": "error", "error": error})
+                return
+
+            video_url = None
+            if request.merge:
+                video_url = await self.video_merge_service.merge_videos(
+                    [status.video_url for status in results], batch["user_id"]
+                )
+            await self._finish(batch_id, {**batch, "status": "done", "video_url": video_url})
+
+        except Exception as e:
+            logger.exception("Error processing batch %s", batch_id)
+            await self._finish(batch_id, {**batch, "status": "error", "error": str(e)})
+
+    async def _prepare(self, batch_id: str, batch: BatchJob, request: BatchJobRequest) -> list[VideoJobRequest]:
+        """
+        Normalize each distinct start frame once and describe all of them, then
+        point every clip at its normalized frame and description. The result is
+        kept on the batch record, so a redelivered batch doesn't redo it.
+        """
+        if "frames" not in batch:
+            keys = list(dict.fromkeys(frame.starting_image_key for frame in request.frames))
+            normalized = await asyncio.gather(*(self._normalize_upload(key) for key in keys))
+            descriptions = await self._describe([data for _, data in normalized])
+            batch["frames"] = {
+                key: {"key": normalized_key, "description": description}
+                for key, (normalized_key, _), description in zip(keys, normalized, descriptions)
+            }
+            await self._save(batch_id, batch)
+
+        return [
+            dataclasses.replace(
+                frame,
+                starting_image_key=batch["frames"][frame.starting_image_key]["key"],
+                annotation_description=batch["frames"][frame.starting_image_key]["description"],
+            )
+            for frame in request.frames
+        ]
+
+    async def _normalize_upload(self, key: str) -> tuple[str, bytes]:
+        data = await self.image_service.normalize(await self.upload_store.get(key))
+        return await self.upload_store.put_bytes(data, sniff_mime(data) or "application/octet-stream"), data
+
+    async def _describe(self, images: list[bytes]) -> list[str]:
+        size = settings.BATCH_ANALYZE_MAX_FRAMES
+        chunks = await asyncio.gather(*(
+            self._describe_chunk(images[start:start + size]) for start in range(0, len(images), size)
+        ))
+        return [description for chunk in chunks for description in chunk]
+
+    async def _describe_chunk(self, images: list[bytes]) -> list[str]:
+        if len(images) > 1:
+            try:
+                descriptions = await self.vertex_service.analyze_images_content(ANALYZE_PROMPT, images)
+                BATCH_ANALYSIS_FRAMES.inc(len(images), mode="batched")
+                return descriptions
+            except Exception as e:
+                logger.warning("Batched analysis of %d frames failed, analyzing them one by one: %s", len(images), e)
+        BATCH_ANALYSIS_FRAMES.inc(len(images), mode="single")
+        return list(await asyncio.gather(*(
+            self.vertex_service.analyze_image_content(prompt=ANALYZE_PROMPT, image_data=image_data)
+            for image_data in images
+        )))
+
+    async def _run_child(
+        self,
+        batch_id: str,
+        batch: BatchJob,
+        job_id: str,
+        request: VideoJobRequest,
+        slots: asyncio.Semaphore,
+    ) -> Optional[JobStatus]:
+        """
+        Start one clip (unless a previous delivery did) and wait until it is done or
+        failed. Never raises: a clip that can't be started or followed is that
+        clip's failure, and its siblings go on (each job settles its own credits).
+        """
+        async with slots:
+            try:
+                if await self.job_service.get_video_job_status(job_id) is None:
+                    while True:
+                        try:
+                            await self.job_service.create_video_job(request, batch["user_id"], job_id=job_id, batch_id=batch_id)
+                            break
+                        except AdmissionRejected as e:
+                            # the batch was accepted: its clips queue behind the caps instead of failing
+                            await asyncio.sleep(e.retry_after)
+                        except InsufficientCredits as e:
+                            logger.info("Clip %s of batch %s not started: %s", job_id, batch_id, e)
+                            await self._record_clip_failure(batch_id, batch, job_id, str(e))
+                            return None
+                return await self._wait_for(job_id)
+            except Exception:
+                logger.exception("Clip %s of batch %s failed", job_id, batch_id)
+                await self._record_clip_failure(batch_id, batch, job_id, "Video generation failed. Please try again.")
+                return None
+
+    async def _record_clip_failure(self, batch_id: str, batch: BatchJob, job_id: str, error: str) -> None:
+        """
+        Record why a clip failed on the batch record. Status reads show it for clips
+        without a job record of their own (see get_batch_status). Stored now, so it
+        shows while the other clips run.
+        """
+        batch.setdefault("not_started", {})[job_id] = error
+        try:
+            await self._save(batch_id, batch)
+        except redis.RedisError as e:
+            # _finish stores it with the rest of the batch
+            logger.warning("Failed to record clip %s of batch %s: %s", job_id, batch_id, e)
+
+    async def _wait_for(self, job_id: str) -> Optional[JobStatus]:
+        # woken by the clip's status events; re-reading the record on every wake
+        # (and every CHILD_RECHECK_SECONDS) means a missed event only costs a delay
+        updates = self.job_service.events.watch(job_id, timeout=CHILD_RECHECK_SECONDS)
+        try:
+            while True:
+                status = await self.job_service.get_video_job_status(job_id)
+                if status is None or status.status != "waiting":
+                    return status
+                await anext(updates)
+        finally:
+            await updates.aclose()
+
+    async def get_batch_status(self, batch_id: str) -> Optional[BatchStatus]:
+        """The batch's own state plus every clip's, in two reads (GET + MGET)."""
+        batch = await self._load(batch_id)
+        if batch is None:
+            return None
+        statuses = await self.job_service.get_video_job_statuses(batch["children"])
+        return BatchStatus(
+            status=batch["status"],
+            job_start_time=datetime.fromisoformat(batch["job_start_time"]),
+            job_end_time=datetime.fromisoformat(batch["job_end_time"]) if batch.get("job_end_time") else None,
+            video_url=batch.get("video_url"),
+            error=batch.get("error"),
+            jobs=[(job_id, statuses[job_id] or self._not_started(batch, job_id)) for job_id in batch["children"]],
+        )
+
+    @staticmethod
+    def _not_started(batch: BatchJob, job_id: str) -> Optional[JobStatus]:
+        error = batch.get("not_started", {}).get(job_id)
+        if error is None:
+            return None
+        return JobStatus(job_start_time=datetime.fromisoformat(batch["job_start_time"]), status="error", error=error)
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+import redis
+import redis.asyncio as aioredis
+from cachetools import TTLCache
+from services.storage_service import StorageService
+from utils.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+Creator = Callable[[], Awaitable[dict]]
+
+
+class ContentCache:
+    """
+    Content-addressed result cache shared by every replica.
+
+    Results live in R2 (the creator uploads them) and are indexed in Redis:
+      cache:{name}:{key}   -> JSON value, expires after `ttl`
+      cache:{name}:lru     -> sorted set of keys by last access, trimmed to `max_entries`
+      cache:{name}:paths   -> key -> R2 path, so evicted objects get deleted too
+    Entries that outlive their TTL are swept on later writes, together with their
+    R2 objects and index members; the LRU trim handles the rest.
+    Identical concurrent requests are coalesced: in-process through a shared future,
+    across replicas through a short Redis lock that other callers wait on.
+    Without Redis it degrades to an in-process TTL cache (local dev).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        storage_service: StorageService,
+        redis_client: Optional[aioredis.Redis],
+        ttl: int,
+        max_entries: int,
+        lock_timeout: int = 600,
+    ):
+        self.name = name
+        self.storage_service = storage_service
+        self.redis = redis_client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock_timeout = lock_timeout
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._local: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl)
+
+    def _key(self, key: str) -> str:
+        return f"cache:{self.name}:{key}"
+
+    async def get(self, key: str) -> Optional[dict]:
+        if not self.redis:
+            return self._local.get(key)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(self._key(key))
+                pipe.zadd(f"cache:{self.name}:lru", {key: time.time()}, xx=True)
+                raw, _ = await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("[%s] Redis read failed, treating as miss: %s", self.name, e)
+            return None
+        return json.loads(raw) if raw else None
+
+    async def get_many(self, keys: list[str]) -> list[Optional[dict]]:
+        """Bulk lookup in one round-trip (doesn't touch LRU order)."""
+        if not keys:
+            return []
+        if not self.redis:
+            return [self._local.get(key) for key in keys]
+        try:
+            raws = await self.redis.mget([self._key(key) for key in keys])
+        except redis.RedisError as e:
+            logger.warning("[%s] Redis read failed, treating as miss: %s", self.name, e)
+            return [None] * len(keys)
+        return [json.loads(raw) if raw else None for raw in raws]
+
+    async def put(self, key: str, value: dict, path: Optional[str] = None, ttl: Optional[int] = None) -> None:
+        """Store a value, for `ttl` seconds instead of the cache's own TTL if given (Redis only)."""
+        if not self.redis:
+            self._local[key] = value
+            return
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.set(self._key(key), json.dumps(value), ex=ttl or self.ttl)
+                pipe.zadd(f"cache:{self.name}:lru", {key: time.time()})
+                if path:
+                    pipe.hset(f"cache:{self.name}:paths", key, path)
+                pipe.zcard(f"cache:{self.name}:lru")
+                *_, size = await pipe.execute()
+            await self._sweep_expired()
+            if size > self.max_entries:
+                await self._evict(size - self.max_entries)
+        except redis.RedisError as e:
+            logger.warning("[%s] Redis write failed: %s", self.name, e)
+
+    async def _sweep_expired(self, batch: int = 100) -> None:
+        """
+        Drop entries whose value has expired. A value expires at most `ttl` after
+        it was written, and it was written no later than its last access (the LRU
+        score), so members last used over `ttl` ago are gone for sure.
+        """
+        lru = f"cache:{self.name}:lru"
+        expired = await self.redis.zrangebyscore(lru, "-inf", time.time() - self.ttl, start=0, num=batch)
+        # skip keys written again since (their member was just re-added)
+        keys = [raw_key.decode() for raw_key in expired if not await self.redis.exists(self._key(raw_key.decode()))]
+        if keys:
+            await self._drop(keys)
+
+    async def _evict(self, count: int) -> None:
+        """Drop the least recently used entries and their R2 objects."""
+        lru = f"cache:{self.name}:lru"
+        victims = await self.redis.zpopmin(lru, count)
+        await self._drop([raw_key.decode() for raw_key, _score in victims])
+
+    async def _drop(self, keys: list[str]) -> None:
+        for key in keys:
+            path = await self.redis.hget(f"cache:{self.name}:paths", key)
+            await self.redis.zrem(f"cache:{self.name}:lru", key)
+            await self.redis.delete(self._key(key))
+            await self.redis.hdel(f"cache:{self.name}:paths", key)
+            if path:
+                try:
+                    await self.storage_service.delete(path.decode())
+                except Exception as e:
+                    logger.warning("[%s] Failed to delete dropped object %r: %s", self.name, path, e)
+
+    async def get_or_create(
+        self, key: str, create: Creator, path: Optional[str] = None, ttl: Optional[int] = None
+    ) -> dict:
+        """
+        Return the cached value for `key`, or run `create` exactly once (across
+        concurrent callers) and cache what it returns, for `ttl` if given. `path`
+        is the R2 object the creator writes, deleted again on eviction.
+        """
+        cached = await self.get(key)
+        if cached is not None:
+            CACHE_REQUESTS.inc(cache=self.name, result="hit")
+            return cached
+
+        if key in self._inflight:
+            CACHE_REQUESTS.inc(cache=self.name, result="coalesced")
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._create_once(key, create, path, ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _create_once(self, key: str, create: Creator, path: Optional[str], ttl: Optional[int]) -> dict:
+        lock = f"{self._key(key)}:lock"
+        while self.redis:
+            try:
+                acquired = await self.redis.set(lock, b"1", nx=True, ex=self.lock_timeout)
+            except redis.RedisError:
+                break
+            if acquired:
+                try:
+                    CACHE_REQUESTS.inc(cache=self.name, result="miss")
+                    value = await create()
+                    await self.put(key, value, path, ttl)
+                    return value
+                finally:
+                    await self.redis.delete(lock)
+
+            # another replica is computing it, wait for its result
+            await asyncio.sleep(0.5)
+            cached = await self.get(key)
+            if cached is not None:
+                CACHE_REQUESTS.inc(cache=self.name, result="coalesced")
+                return cached
+
+        CACHE_REQUESTS.inc(cache=self.name, result="miss")
+        value = await create()
+        await self.put(key, value, path, ttl)
+        return value
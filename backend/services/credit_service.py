@@ -0,0 +1,75 @@
+import logging
+from typing import Any, Optional
+
+import httpx
+
+from utils.env import settings
+from utils.metrics import track_call
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientCredits(Exception):
+    """Raised by CreditService when the balance can't cover a charge."""
+
+    def __init__(self):
+        super().__init__("You don't have enough credits for this. Please get more credits to continue.")
+
+
+class CreditError(Exception):
+    """A credit RPC failed for any other reason (user not found, PostgREST down...)."""
+
+
+class CreditService:
+    """
+    Credit changes through the Postgres functions in scripts/db/functions.sql.
+    Each call is one PostgREST RPC, and the balance update and its
+    transaction_log row commit in the same transaction, so the two always agree.
+    Requests go out on the app's shared async HTTP client, which keeps the
+    connection to Supabase warm. No thread hop and no extra client.
+
+    Jobs reserve credits when they are created. The reservation is committed
+    when the job is done and refunded when it fails. Reservations are keyed by
+    job id, so a retried call never charges twice.
+    """
+
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        # the app's shared client; server.py sets it when the app starts
+        self.http_client = http_client
+        self.rpc_url = f"{settings.SUPABASE_URL.rstrip('/')}/rest/v1/rpc"
+        self.headers = {
+            "apikey": settings.SUPABASE_SECRET_KEY,
+            "Authorization": f"Bearer {settings.SUPABASE_SECRET_KEY}",
+        }
+
+    async def _rpc(self, function: str, params: dict) -> Any:
+        with track_call("supabase_rpc"):
+            try:
+                response = await self.http_client.post(f"{self.rpc_url}/{function}", json=params, headers=self.headers)
+            except httpx.HTTPError as e:
+                raise CreditError(f"{function} failed: {e!r}") from e
+            if response.is_error:
+                try:
+                    message = response.json().get("message") or response.text
+                except ValueError:
+                    message = response.text
+                if "insufficient_credits" in message:
+                    raise InsufficientCredits()
+                raise CreditError(f"{function} failed ({response.status_code}): {message}")
+            return response.json()
+
+    async def reserve(self, reservation_id: str, user_id: str, transaction_type: str, credits: int) -> float:
+        """Deduct credits and hold them until commit() or refund(). Returns the new balance."""
+        return await self._rpc("reserve_user_credits", {
+            "p_user_id": user_id,
+            "p_transaction_type": transaction_type,
+            "p_credits": credits,
+            "p_reservation_id": reservation_id,
+        })
+
+    async def commit(self, reservation_id: str) -> None:
+        await self._rpc("settle_user_credits", {"p_reservation_id": reservation_id, "p_refund": False})
+
+    async def refund(self, reservation_id: str) -> None:
+        """Give the reserved credits back (a no-op once the reservation is settled)."""
+        await self._rpc("settle_user_credits", {"p_reservation_id": reservation_id, "p_refund": True})
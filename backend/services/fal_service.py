@@ -1,45 +1,121 @@
+import asyncio
 import fal_client
+import hashlib
 import httpx
+import json
+import logging
+from typing import AsyncIterator, Optional
+from urllib.parse import urlsplit
 from models.job import JobStatus
+from services.content_cache import ContentCache
 from services.storage_service import StorageService
 from utils.env import settings
+from utils.images import sniff_mime
+from utils.metrics import track_call
+from utils.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
 
 MAX_RETRIES = 2
+STREAM_CHUNK_SIZE = 1024 * 1024
+# Per-call timeouts on the shared client (videos can be large)
+IMAGE_DOWNLOAD_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+VIDEO_DOWNLOAD_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+
+# fal CDN, where a video stays when storing it to R2 failed
+FAL_CDN_HOSTS = ("fal.media",)
+
+IMAGE_EDIT_MODEL = "fal-ai/nano-banana-pro/edit"
+IMAGE_EDIT_PARAMS = {
+    "aspect_ratio": "16:9",
+    "resolution": "1K",
+    "output_format": "png",
+    "num_images": 1,
+}
+
+
+def is_fal_cdn_url(url: str) -> bool:
+    """An https URL on fal's CDN"""
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    return parts.scheme == "https" and any(host == cdn or host.endswith(f".{cdn}") for cdn in FAL_CDN_HOSTS)
 
 
 class FalService:
-    def __init__(self, storage_service: StorageService):
+    def __init__(self, storage_service: StorageService, http_client: Optional[httpx.AsyncClient] = None):
         self.storage_service = storage_service
+        # the app's shared client; server.py sets it when the app starts
+        self.http = http_client
         # Set FAL_KEY environment variable for fal_client
         import os
         os.environ["FAL_KEY"] = settings.FAL_KEY
+        # cleaned frames, keyed by (image, prompt, model, params)
+        self.image_edit_cache = ContentCache(
+            "image-edit",
+            storage_service,
+            get_async_redis(),
+            ttl=settings.IMAGE_EDIT_CACHE_TTL_SECONDS,
+            max_entries=settings.IMAGE_EDIT_CACHE_MAX_ENTRIES,
+        )
+        # R2 copies of fresh edits, made in the background
+        self._background: set[asyncio.Task] = set()
+        # sha256(image bytes) -> fal CDN URL, so the same image is uploaded once
+        self.upload_cache = ContentCache(
+            "fal-upload",
+            storage_service,
+            get_async_redis(),
+            ttl=settings.FAL_UPLOAD_URL_TTL_SECONDS,
+            max_entries=settings.FAL_UPLOAD_URL_MAX_ENTRIES,
+        )
 
     async def _upload_image_bytes(self, image_data: bytes) -> str:
-        """Upload image bytes to fal CDN and return URL"""
-        url = await fal_client.upload_async(
-            data=image_data,
-            content_type="image/png"
-        )
-        return url
+        """Upload image bytes to fal CDN and return URL (reused while the cached URL is fresh)"""
+        async def create() -> dict:
+            with track_call("fal_upload"):
+                url = await fal_client.upload_async(
+                    data=image_data,
+                    content_type=sniff_mime(image_data) or "image/png"
+                )
+            return {"url": url}
 
-    async def _download_and_store_video(self, video_url: str, job_id: str) -> str:
-        """Download video from fal CDN and store in GCS for longer lifespan"""
-        print(f"[Fal] Downloading video from: {video_url}")
-        
-        # Use longer timeout for video downloads (videos can be large)
-        async with httpx.AsyncClient(timeout=httpx.Timeout(300.0)) as client:
-            response = await client.get(video_url)
-            response.raise_for_status()
-            video_data = response.content
+        entry = await self.upload_cache.get_or_create(hashlib.sha256(image_data).hexdigest(), create)
+        return entry["url"]
+
+    async def _download_and_store_video(self, video_url: str, job_id: str) -> tuple[str, str]:
+        """
+        Stream video from fal CDN straight into R2 for longer lifespan.
+        Only a few multipart parts are held in memory at once, whatever the video size.
+        """
+        logger.debug("Streaming video from: %s", video_url)
+        gcs_path = f"videos/{job_id}.mp4"
         
-        print(f"[Fal] Downloaded video, size: {len(video_data)} bytes")
+        # streamed into R2 as it arrives, so this times the whole CDN -> R2 transfer
+        with track_call("cdn_download"):
+            async with self.http.stream("GET", video_url, timeout=VIDEO_DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
+                digest = hashlib.sha256()
+                body = self._verified_stream(response, digest)
+                gcs_url = await self.storage_service.upload(body, gcs_path, "video/mp4")
         
-        # Upload to GCS
-        gcs_path = f"videos/{job_id}.mp4"
-        print(f"[Fal] Uploading to GCS path: {gcs_path}")
-        gcs_url = self.storage_service.upload_bytes(video_data, gcs_path, "video/mp4")
-        print(f"[Fal] Video stored at GCS URL: {gcs_url}")
-        return gcs_url
+        logger.info("Video stored at %s (sha256 %s)", gcs_url, digest.hexdigest()[:16])
+        return gcs_url, digest.hexdigest()
+
+    @staticmethod
+    async def _verified_stream(response: httpx.Response, digest) -> AsyncIterator[bytes]:
+        """
+        Yield the response body while hashing it. Raises before the last part is
+        uploaded if the body is shorter/longer than Content-Length, so a truncated
+        download never becomes a stored video.
+        """
+        # Content-Length is the encoded size, so only compare when the body isn't compressed
+        expected = 0 if "content-encoding" in response.headers else int(response.headers.get("content-length") or 0)
+        received = 0
+        async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+            digest.update(chunk)
+            received += len(chunk)
+            yield chunk
+        if expected and received != expected:
+            raise IOError(f"Video download truncated: got {received} of {expected} bytes")
 
     async def generate_video_content(
         self, 
@@ -56,89 +132,96 @@ class FalService:
         - Audio disabled by default
         - Downloads and stores to GCS for longer lifespan
         """
-        print(f"[Fal] generate_video_content called, image size: {len(image_data)} bytes, job_id: {job_id}")
+        logger.debug("generate_video_content called, image size: %d bytes, job_id: %s", len(image_data), job_id)
         
         # Upload starting image to fal CDN
         image_url = await self._upload_image_bytes(image_data)
-        print(f"[Fal] Uploaded starting image to: {image_url}")
-        
-        # Map duration to fal format
-        duration_map = {4: "4s", 5: "4s", 6: "6s", 7: "6s", 8: "8s"}
-        duration = duration_map.get(duration_seconds, "6s")
+        logger.debug("Uploaded starting image to: %s", image_url)
         
         ending_image_url = None
         if ending_image_data:
             ending_image_url = await self._upload_image_bytes(ending_image_data)
-            print(f"[Fal] Uploaded ending image to: {ending_image_url}")
+            logger.debug("Uploaded ending image to: %s", ending_image_url)
+
+        result = await self.generate_video_from_urls(prompt, image_url, ending_image_url, duration_seconds)
+        if job_id:
+            result["video"]["gcs_url"], result["video"]["sha256"] = await self.store_video(result["video"]["url"], job_id)
+        return result
+
+    async def generate_video_from_urls(
+        self,
+        prompt: str,
+        image_url: str,
+        ending_image_url: str = None,
+        duration_seconds: int = 6
+    ) -> dict:
+        """Run Veo 3.1 Fast on frames that are already on the fal CDN (see generate_video_content)"""
+        # Map duration to fal format
+        duration_map = {4: "4s", 5: "4s", 6: "6s", 7: "6s", 8: "8s"}
+        duration = duration_map.get(duration_seconds, "6s")
 
         # Retry loop: first attempt with full prompt, fallback with simplified prompt
         last_error = None
         for attempt in range(1, MAX_RETRIES + 1):
             current_prompt = prompt if attempt == 1 else self._simplify_prompt(prompt)
-            print(f"[Fal] Attempt {attempt}/{MAX_RETRIES}, prompt length: {len(current_prompt)}")
+            logger.info("Veo attempt %d/%d, prompt length: %d", attempt, MAX_RETRIES, len(current_prompt))
 
             try:
-                if ending_image_url:
-                    print(f"[Fal] Calling fal-ai/veo3.1/fast/first-last-frame-to-video...")
-                    result = await fal_client.subscribe_async(
-                        "fal-ai/veo3.1/fast/first-last-frame-to-video",
-                        arguments={
-                            "prompt": current_prompt,
-                            "first_frame_url": image_url,
-                            "last_frame_url": ending_image_url,
-                            "duration": duration,
-                            "aspect_ratio": "16:9",
-                            "resolution": "720p",
-                            "generate_audio": False,
-                            "safety_tolerance": "6",
-                        },
-                        with_logs=True,
-                    )
-                else:
-                    print(f"[Fal] Calling fal-ai/veo3.1/fast/image-to-video...")
-                    result = await fal_client.subscribe_async(
-                        "fal-ai/veo3.1/fast/image-to-video",
-                        arguments={
-                            "prompt": current_prompt,
-                            "image_url": image_url,
-                            "duration": duration,
-                            "aspect_ratio": "16:9",
-                            "resolution": "720p",
-                            "generate_audio": False,
-                            "safety_tolerance": "6",
-                        },
-                        with_logs=True,
-                    )
+                with track_call("fal_veo"):
+                    if ending_image_url:
+                        result = await fal_client.subscribe_async(
+                            "fal-ai/veo3.1/fast/first-last-frame-to-video",
+                            arguments={
+                                "prompt": current_prompt,
+                                "first_frame_url": image_url,
+                                "last_frame_url": ending_image_url,
+                                "duration": duration,
+                                "aspect_ratio": "16:9",
+                                "resolution": "720p",
+                                "generate_audio": False,
+                                "safety_tolerance": "6",
+                            },
+                            with_logs=True,
+                        )
+                    else:
+                        result = await fal_client.subscribe_async(
+                            "fal-ai/veo3.1/fast/image-to-video",
+                            arguments={
+                                "prompt": current_prompt,
+                                "image_url": image_url,
+                                "duration": duration,
+                                "aspect_ratio": "16:9",
+                                "resolution": "720p",
+                                "generate_audio": False,
+                                "safety_tolerance": "6",
+                            },
+                            with_logs=True,
+                        )
                 # Success — break out of retry loop
                 break
             except fal_client.client.FalClientHTTPError as e:
                 last_error = e
                 error_str = str(e)
                 if "no_media_generated" in error_str and attempt < MAX_RETRIES:
-                    print(f"[Fal] no_media_generated on attempt {attempt}, retrying with simplified prompt...")
+                    logger.warning("no_media_generated on attempt %d, retrying with simplified prompt", attempt)
                     continue
                 raise  # Re-raise on final attempt or non-retryable errors
         
-        print(f"[Fal] Video generation complete, result: {result}")
-        
-        # Download video and store to GCS for longer lifespan
-        video_url = result["video"]["url"]
-        print(f"[Fal] Fal CDN video URL: {video_url}")
-        
-        if job_id:
-            try:
-                gcs_url = await self._download_and_store_video(video_url, job_id)
-                result["video"]["gcs_url"] = gcs_url
-                print(f"[Fal] Successfully stored video to GCS: {gcs_url}")
-            except Exception as e:
-                print(f"[Fal] ERROR storing to GCS: {e}")
-                import traceback
-                traceback.print_exc()
-                # Fallback to fal CDN URL if GCS fails
-                result["video"]["gcs_url"] = video_url
-        
+        logger.debug("Video generation complete, result: %s", result)
         return result
 
+    async def store_video(self, video_url: str, job_id: str) -> tuple[str, Optional[str]]:
+        """
+        Download the generated video and store it to GCS for longer lifespan.
+        Returns the stored URL and the video's sha256, or the fal CDN URL and None if storing fails.
+        """
+        try:
+            return await self._download_and_store_video(video_url, job_id)
+        except Exception:
+            logger.exception("Storing video to GCS failed, keeping fal CDN URL %s", video_url)
+            # Fallback to fal CDN URL if GCS fails
+            return video_url, None
+
     @staticmethod
     def _simplify_prompt(prompt: str) -> str:
         """Create a shorter, safer version of the prompt for retry attempts.
@@ -156,49 +239,97 @@ class FalService:
         # Truncate to a reasonable length
         if len(simplified) > 500:
             simplified = simplified[:500].rsplit(' ', 1)[0]
-        print(f"[Fal] Simplified prompt ({len(simplified)} chars): {simplified[:100]}...")
+        logger.debug("Simplified prompt (%d chars): %s...", len(simplified), simplified[:100])
         return simplified
 
-    async def generate_image_content(self, prompt: str, image: bytes) -> bytes:
+    async def edit_image(self, prompt: str, image: bytes) -> str:
         """
         Edit image using fal.ai Nano Banana Pro (Gemini 3 Pro Image architecture)
         Used for removing annotations/text from images
-        Returns the edited image as bytes
+        Returns the edited image's fal CDN URL, which fal models (Veo) read directly
         """
-        print(f"[Fal] generate_image_content called, image size: {len(image)} bytes")
+        logger.debug("edit_image called, image size: %d bytes", len(image))
         
         # Upload image to fal CDN
         image_url = await self._upload_image_bytes(image)
-        print(f"[Fal] Uploaded image to: {image_url}")
-        print(f"[Fal] Calling fal-ai/nano-banana-pro/edit...")
+        logger.debug("Uploaded image to %s, calling %s", image_url, IMAGE_EDIT_MODEL)
         
-        result = await fal_client.subscribe_async(
-            "fal-ai/nano-banana-pro/edit",
-            arguments={
-                "prompt": prompt,
-                "image_urls": [image_url],
-                "aspect_ratio": "16:9",
-                "resolution": "1K",
-                "output_format": "png",
-                "num_images": 1,
-            },
-            with_logs=True,
-        )
-        
-        print(f"[Fal] Got response: {result}")
+        with track_call("fal_image_edit"):
+            result = await fal_client.subscribe_async(
+                IMAGE_EDIT_MODEL,
+                arguments={
+                    "prompt": prompt,
+                    "image_urls": [image_url],
+                    **IMAGE_EDIT_PARAMS,
+                },
+                with_logs=True,
+            )
         
-        # Download the edited image and return as bytes
-        edited_image_url = result["images"][0]["url"]
-        print(f"[Fal] Downloading edited image from: {edited_image_url}")
+        logger.debug("Got response: %s", result)
+        return result["images"][0]["url"]
+
+    async def generate_image_content(self, prompt: str, image: bytes) -> bytes:
+        """Same as edit_image, for callers that need the edited image as bytes"""
+        edited_image_url = await self.edit_image(prompt, image)
+        logger.debug("Downloading edited image from: %s", edited_image_url)
         
-        async with httpx.AsyncClient(timeout=httpx.Timeout(120.0)) as client:
-            response = await client.get(edited_image_url)
+        with track_call("cdn_download"):
+            response = await self.http.get(edited_image_url, timeout=IMAGE_DOWNLOAD_TIMEOUT)
             response.raise_for_status()
             image_bytes = response.content
+
+        # These bytes already live on the fal CDN: when they're sent on to Veo,
+        # _upload_image_bytes hands back this URL instead of uploading them again
+        await self.upload_cache.put(hashlib.sha256(image_bytes).hexdigest(), {"url": edited_image_url})
         
-        print(f"[Fal] Success! Returning image data, size: {len(image_bytes)} bytes")
+        logger.info("Edited image ready, size: %d bytes", len(image_bytes))
         return image_bytes
 
+    async def edit_image_cached(self, prompt: str, image: bytes) -> str:
+        """
+        Same as edit_image, for deterministic edits (annotation cleaning) that are
+        worth reusing: results are indexed by sha256(image, prompt, model, params),
+        and identical in-flight requests share one fal call.
+
+        A fresh edit's fal CDN URL is returned right away. Its R2 copy, which later
+        hits are served from, is made in the background, so the edited bytes are
+        only downloaded for the cache and never on the job's critical path.
+        """
+        if not self.storage_service.client:
+            return await self.edit_image(prompt, image)
+
+        digest = hashlib.sha256(image)
+        digest.update(json.dumps({"prompt": prompt, "model": IMAGE_EDIT_MODEL, "params": IMAGE_EDIT_PARAMS}, sort_keys=True).encode())
+        key = digest.hexdigest()
+        path = f"images/edited/{key}.png"
+
+        async def create() -> dict:
+            url = await self.edit_image(prompt, image)
+            task = asyncio.create_task(self._store_edit(key, path, url))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+            return {"url": url}
+
+        # until the R2 copy replaces it, the entry holds the fal URL, and not longer than the CDN keeps it
+        entry = await self.image_edit_cache.get_or_create(key, create, ttl=settings.FAL_UPLOAD_URL_TTL_SECONDS)
+        if "path" in entry:
+            logger.info("Image edit cache hit: %s", key[:16])
+            return self.storage_service.get_url(entry["path"])
+        return entry["url"]
+
+    async def _store_edit(self, key: str, path: str, url: str) -> None:
+        """Copy an edit from the fal CDN to R2 and point its cache entry there (best effort)"""
+        try:
+            with track_call("cdn_download"):
+                response = await self.http.get(url, timeout=IMAGE_DOWNLOAD_TIMEOUT)
+                response.raise_for_status()
+            await self.storage_service.upload(response.content, path, "image/png")
+        except Exception as e:
+            # the cache is an optimization: the entry keeps the fal URL until it expires
+            logger.warning("Failed to store edited image %s: %s", key[:16], e)
+            return
+        await self.image_edit_cache.put(key, {"path": path}, path)
+
     async def test_service(self) -> str:
         """Test if fal.ai service is working"""
         return "Fal.ai service is configured"
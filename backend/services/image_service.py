@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import UnidentifiedImageError
+
+from utils.env import settings
+from utils.images import is_normalized, normalize_image, sniff_mime
+from utils.metrics import IMAGE_BYTES, IMAGE_NORMALIZE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ImageService:
+    """
+    Normalizes frames before they reach any model: decoded once, shrunk to the
+    model resolution (IMAGE_MAX_SIDE, Veo runs at 720p and the image editor at 1K),
+    re-encoded as IMAGE_FORMAT without metadata. Pillow runs in a small process
+    pool, so neither the event loop nor the web process's GIL is held by it.
+    """
+
+    def __init__(self):
+        self.max_side = settings.IMAGE_MAX_SIDE
+        self.format = settings.IMAGE_FORMAT
+        self.quality = settings.IMAGE_QUALITY
+        # spawn: forking a process that already runs threads (logging, boto3 pools) can deadlock the child
+        self._pool = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    async def warm_up(self) -> None:
+        """Start a worker process now rather than on the first job."""
+        await asyncio.get_running_loop().run_in_executor(self._pool, sniff_mime, b"")
+
+    async def normalize(self, data: bytes) -> bytes:
+        """Normalized image bytes; the original if Pillow can't read it (the model may still manage)."""
+        if is_normalized(data, self.max_side, self.format):
+            # e.g. a batch job's frames, normalized before its batched analysis: no second lossy encode
+            return data
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            normalized, _mime = await loop.run_in_executor(
+                self._pool, normalize_image, data, self.max_side, self.format, self.quality
+            )
+        except (UnidentifiedImageError, OSError) as e:
+            logger.warning("Could not normalize image (%d bytes), using it as is: %s", len(data), e)
+            return data
+        IMAGE_NORMALIZE_SECONDS.observe(time.perf_counter() - start)
+        IMAGE_BYTES.observe(len(data), stage="original")
+        IMAGE_BYTES.observe(len(normalized), stage="normalized")
+        return normalized
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,160 @@
+import time
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from utils.metrics import ADMISSION_REJECTIONS
+
+KEY_PREFIX = "admission:"
+
+# KEYS: leases (zset job -> lease expiry), owners (hash job -> user), users (hash user -> jobs in flight)
+# ARGV: now, lease seconds, job id, user id, global cap, per-user cap
+# Returns "" when admitted, otherwise the reason ("global" / "user").
+_ADMIT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, job in ipairs(expired) do
+    local owner = redis.call('HGET', KEYS[2], job)
+    if owner and redis.call('HINCRBY', KEYS[3], owner, -1) <= 0 then
+        redis.call('HDEL', KEYS[3], owner)
+    end
+    redis.call('HDEL', KEYS[2], job)
+    redis.call('ZREM', KEYS[1], job)
+end
+local global_cap = tonumber(ARGV[5])
+if redis.call('ZCARD', KEYS[1]) >= global_cap then
+    return 'global'
+end
+local mine = tonumber(redis.call('HGET', KEYS[3], ARGV[4]) or '0')
+local active = redis.call('HLEN', KEYS[3])
+if mine == 0 then
+    active = active + 1
+end
+local share = math.max(1, math.floor(global_cap / active))
+if mine >= math.min(tonumber(ARGV[6]), share) then
+    return 'user'
+end
+redis.call('ZADD', KEYS[1], tonumber(ARGV[1]) + tonumber(ARGV[2]), ARGV[3])
+redis.call('HSET', KEYS[2], ARGV[3], ARGV[4])
+redis.call('HINCRBY', KEYS[3], ARGV[4], 1)
+return ''
+"""
+
+# KEYS as above, ARGV: job id
+_RELEASE = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 1 then
+    local owner = redis.call('HGET', KEYS[2], ARGV[1])
+    if owner and redis.call('HINCRBY', KEYS[3], owner, -1) <= 0 then
+        redis.call('HDEL', KEYS[3], owner)
+    end
+end
+redis.call('HDEL', KEYS[2], ARGV[1])
+"""
+
+# KEYS as above, ARGV: lease expiry, job id, user id
+# Extends the lease, or takes it again (with its counts) if it ran out.
+_READMIT = """
+if redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2]) == 1 then
+    redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+    redis.call('HINCRBY', KEYS[3], ARGV[3], 1)
+end
+"""
+
+
+class AdmissionRejected(Exception):
+    """Raised by JobService.create_video_job when the job would go over a cap."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(
+            "You have too many videos generating right now. Please wait for one to finish."
+            if reason == "user"
+            else "Video generation is busy right now. Please try again shortly."
+        )
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class JobAdmission:
+    """
+    Caps video jobs in flight (queued or running), globally and per user.
+
+    Each admitted job holds a lease until it finishes; leases of jobs that
+    vanished (crashed process, lost record) expire on their own. The per-user
+    cap shrinks to a fair share of the global one as more users have jobs in
+    flight, so one user's burst can't take every slot. That's the only fairness:
+    there is no per-user scheduling, admitted jobs still run in queue (FIFO) order. With Redis the counts
+    are shared by every replica (one Lua script per check); without it they
+    are per process.
+    """
+
+    def __init__(self, redis_client: Optional[aioredis.Redis], global_limit: int, user_limit: int, lease_seconds: int):
+        self.redis = redis_client
+        self.global_limit = global_limit
+        self.user_limit = user_limit
+        self.lease_seconds = lease_seconds
+        self._keys = [f"{KEY_PREFIX}leases", f"{KEY_PREFIX}owners", f"{KEY_PREFIX}users"]
+        if redis_client:
+            self._admit = redis_client.register_script(_ADMIT)
+            self._release = redis_client.register_script(_RELEASE)
+            self._readmit = redis_client.register_script(_READMIT)
+        # in-process fallback: job -> (user, lease expiry)
+        self._leases: dict[str, tuple[str, float]] = {}
+
+    async def acquire(self, job_id: str, user_id: str) -> Optional[str]:
+        """Take a slot for the job. Returns None when admitted, else why not ("global" / "user")."""
+        now = time.time()
+        if self.redis:
+            reason = await self._admit(
+                keys=self._keys,
+                args=[now, self.lease_seconds, job_id, user_id, self.global_limit, self.user_limit],
+            )
+            reason = reason.decode() if isinstance(reason, bytes) else reason
+        else:
+            reason = self._acquire_local(job_id, user_id, now)
+        if reason:
+            ADMISSION_REJECTIONS.inc(reason=reason)
+            return reason
+        return None
+
+    def _acquire_local(self, job_id: str, user_id: str, now: float) -> str:
+        self._leases = {job: lease for job, lease in self._leases.items() if lease[1] > now}
+        if len(self._leases) >= self.global_limit:
+            return "global"
+        per_user: dict[str, int] = {}
+        for owner, _ in self._leases.values():
+            per_user[owner] = per_user.get(owner, 0) + 1
+        mine = per_user.get(user_id, 0)
+        active = len(per_user) + (0 if mine else 1)
+        if mine >= min(self.user_limit, max(1, self.global_limit // active)):
+            return "user"
+        self._leases[job_id] = (user_id, now + self.lease_seconds)
+        return ""
+
+    async def renew(self, job_id: str, user_id: Optional[str] = None) -> None:
+        """
+        Extend the lease. Queue heartbeats pass only the job id, and never bring
+        back a lease that was released. When processing starts the owner is
+        passed too: a lease that ran out while the job sat in the queue is taken
+        again, over the caps if need be, since the job runs now either way and
+        must be counted while it does.
+        """
+        expiry = time.time() + self.lease_seconds
+        if self.redis:
+            if user_id:
+                await self._readmit(keys=self._keys, args=[expiry, job_id, user_id])
+            else:
+                await self.redis.zadd(self._keys[0], {job_id: expiry}, xx=True)
+        elif job_id in self._leases:
+            self._leases[job_id] = (self._leases[job_id][0], expiry)
+        elif user_id:
+            self._leases[job_id] = (user_id, expiry)
+
+    async def release(self, job_id: str) -> None:
+        if self.redis:
+            await self._release(keys=self._keys, args=[job_id])
+        else:
+            self._leases.pop(job_id, None)
+
+    async def in_flight(self) -> int:
+        if self.redis:
+            return await self.redis.zcard(self._keys[0])
+        return len(self._leases)
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import logging
+from typing import Optional
+
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "job-events:"
+
+
+class JobEvents:
+    """
+    Fans job state changes out to every watcher in this process.
+
+    Workers PUBLISH a small JSON status on job-events:{job_id}. Each web process
+    holds a single pattern subscription and hands messages to local watchers
+    through tiny per-connection queues, so an open watch costs one queue and
+    nothing else. Without Redis, publish delivers locally.
+    """
+
+    def __init__(self, redis_client: Optional[aioredis.Redis]):
+        self.redis = redis_client
+        self._watchers: dict[str, set[asyncio.Queue]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    async def publish(self, job_id: str, status: dict) -> None:
+        if not self.redis:
+            self._dispatch(job_id, status)
+            return
+        try:
+            await self.redis.publish(f"{CHANNEL_PREFIX}{job_id}", json.dumps(status))
+        except redis.RedisError as e:
+            # watchers still have the polling route, so this is not fatal
+            logger.warning("Publish failed for %s: %s", job_id, e)
+
+    def publish_in(self, pipe: aioredis.client.Pipeline, job_id: str, status: dict) -> None:
+        """Queue the publish on a caller's pipeline so it goes out with the state write."""
+        pipe.publish(f"{CHANNEL_PREFIX}{job_id}", json.dumps(status))
+
+    def _dispatch(self, job_id: str, status: dict) -> None:
+        for queue in self._watchers.get(job_id, ()):
+            if queue.full():
+                # only the latest state matters
+                queue.get_nowait()
+            queue.put_nowait(status)
+
+    def _ensure_listener(self) -> None:
+        if self.redis and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                async for message in pubsub.listen():
+                    job_id = message["channel"].decode()[len(CHANNEL_PREFIX):]
+                    if job_id in self._watchers:
+                        self._dispatch(job_id, json.loads(message["data"]))
+            except redis.RedisError as e:
+                logger.warning("Subscription lost, reconnecting: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def watch(self, job_id: str, timeout: float) -> "JobWatch":
+        """
+        Start watching a job: registered before this returns, so a change published
+        after the call is never missed (read the current state after calling it).
+        Iterate for status dicts; yields None every `timeout` seconds without news
+        so callers can send keep-alives (and re-read the record: the first watch in
+        a process can still race the pattern subscription). Close with aclose().
+        """
+        self._ensure_listener()
+        return JobWatch(self, job_id, timeout)
+
+    def _remove(self, job_id: str, queue: asyncio.Queue) -> None:
+        watchers = self._watchers.get(job_id)
+        if watchers is not None:
+            watchers.discard(queue)
+            if not watchers:
+                del self._watchers[job_id]
+
+    def watcher_count(self) -> int:
+        return sum(len(queues) for queues in self._watchers.values())
+
+    async def close(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+
+
+class JobWatch:
+    """One watcher of one job (see JobEvents.watch). Costs a one-slot queue."""
+
+    def __init__(self, events: JobEvents, job_id: str, timeout: float):
+        self.events = events
+        self.job_id = job_id
+        self.timeout = timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        events._watchers.setdefault(job_id, set()).add(self.queue)
+
+    def __aiter__(self) -> "JobWatch":
+        return self
+
+    async def __anext__(self) -> Optional[dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), self.timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self) -> None:
+        self.events._remove(self.job_id, self.queue)
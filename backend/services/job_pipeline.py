@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from utils.metrics import JOB_STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+StageDone = Callable[[dict], Awaitable[None]]
+
+
+@dataclass
+class Stage:
+    """One step of a job. `run` receives the results of `deps`, in order."""
+    name: str
+    run: Callable[..., Awaitable[Any]]
+    deps: tuple[str, ...] = ()
+
+
+class Pipeline:
+    """
+    Runs stages as a DAG: every stage starts the moment its own dependencies have
+    finished, not when a whole "step" has. Records a timeline entry per stage
+    (offsets in seconds from the pipeline start). The first failure cancels
+    everything still running and is re-raised.
+    """
+
+    def __init__(self, stages: list[Stage], on_stage_done: Optional[StageDone] = None):
+        names = {stage.name for stage in stages}
+        for stage in stages:
+            missing = set(stage.deps) - names
+            if missing:
+                raise ValueError(f"Stage {stage.name!r} depends on unknown stages {sorted(missing)}")
+        self.stages = stages
+        self.on_stage_done = on_stage_done
+        self.timeline: list[dict] = []
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._start = 0.0
+
+    async def _run_stage(self, stage: Stage) -> Any:
+        inputs = [await self._tasks[dep] for dep in stage.deps]
+        started = time.perf_counter()
+        entry = {"stage": stage.name, "started": round(started - self._start, 3)}
+        succeeded = False
+        try:
+            result = await stage.run(*inputs)
+            succeeded = True
+            return result
+        except asyncio.CancelledError:
+            entry["cancelled"] = True
+            raise
+        except Exception:
+            entry["failed"] = True
+            raise
+        finally:
+            finished = time.perf_counter()
+            entry["finished"] = round(finished - self._start, 3)
+            JOB_STAGE_SECONDS.observe(finished - started, stage=stage.name)
+            self.timeline.append(entry)
+            if succeeded and self.on_stage_done:
+                # awaited, not fire-and-forget: a late progress write could land after the
+                # job's final record. A failing hook is only logged, the stage still succeeded
+                try:
+                    await self.on_stage_done(entry)
+                except Exception:
+                    logger.exception("on_stage_done failed for stage %s", stage.name)
+
+    async def run(self) -> dict[str, Any]:
+        """Run every stage and return their results by name."""
+        self._start = time.perf_counter()
+        # all tasks exist before any of them runs, so declaration order doesn't matter
+        for stage in self.stages:
+            self._tasks[stage.name] = asyncio.create_task(self._run_stage(stage))
+        try:
+            await asyncio.gather(*self._tasks.values())
+        except BaseException:
+            for task in self._tasks.values():
+                task.cancel()
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+            raise
+        return {name: task.result() for name, task in self._tasks.items()}
@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Awaitable, Callable, Optional
+
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[str, bytes], Awaitable[None]]
+DeadLetterHandler = Callable[[str], Awaitable[None]]
+HeartbeatHandler = Callable[[str], Awaitable[None]]
+
+# Idle PEL entries looked at per reclaim pass
+RECLAIM_SCAN_COUNT = 100
+
+
+class JobQueue:
+    """
+    Durable work queue on a Redis stream with a consumer group.
+
+    - Producers XADD a job id + payload; any worker process in the group can pick it up
+    - Each worker runs at most `concurrency` jobs at once, and only reads (or
+      reclaims) entries it has a free slot for, so none waits unheartbeated
+    - While a job runs the worker heartbeats it (XCLAIM JUSTID resets the idle timer)
+      and calls `on_heartbeat`, so leases tied to the job stay alive as long as it runs
+    - Entries idle longer than the visibility timeout belong to a dead worker and are
+      re-claimed (XPENDING IDLE + XCLAIM) and run again, up to `max_deliveries` times
+    - Finished entries are acked and deleted so the stream only holds outstanding work
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        stream: str = "jobs:video",
+        group: str = "video-workers",
+        concurrency: int = 4,
+        visibility_timeout: int = 120,
+        max_deliveries: int = 3,
+        consumer_name: Optional[str] = None,
+    ):
+        self.client = aioredis.Redis.from_url(redis_url, decode_responses=False)
+        self.stream = stream
+        self.group = group
+        self.concurrency = concurrency
+        self.visibility_timeout_ms = visibility_timeout * 1000
+        self.heartbeat_interval = max(1, visibility_timeout // 3)
+        self.max_deliveries = max_deliveries
+        self.consumer_name = consumer_name or f"{socket.gethostname()}-{os.getpid()}"
+        self._slots = asyncio.Semaphore(concurrency)
+        self._running: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        self._on_dead_letter: Optional[DeadLetterHandler] = None
+        self._on_heartbeat: Optional[HeartbeatHandler] = None
+        # where the next reclaim pass resumes scanning the PEL
+        self._reclaim_cursor = "-"
+        self._next_reclaim = 0.0
+
+    async def enqueue(self, job_id: str, payload: bytes) -> None:
+        await self.client.xadd(self.stream, {b"job_id": job_id.encode(), b"payload": payload})
+
+    async def _ensure_group(self) -> None:
+        try:
+            await self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def depth(self) -> int:
+        """Entries waiting or in flight across all workers."""
+        return await self.client.xlen(self.stream)
+
+    async def run(
+        self,
+        handler: JobHandler,
+        on_dead_letter: Optional[DeadLetterHandler] = None,
+        on_heartbeat: Optional[HeartbeatHandler] = None,
+    ) -> None:
+        """Consume jobs until stop() is called."""
+        await self._ensure_group()
+        self._on_dead_letter = on_dead_letter
+        self._on_heartbeat = on_heartbeat
+        logger.info("Worker %s consuming %s (concurrency %d)", self.consumer_name, self.stream, self.concurrency)
+        while not self._stopping.is_set():
+            # slots are taken before anything is read: an entry is only read (or
+            # reclaimed) when it can start at once
+            taken = await self._take_slots()
+            started = 0
+            try:
+                if time.monotonic() >= self._next_reclaim:
+                    self._next_reclaim = time.monotonic() + self.heartbeat_interval
+                    started = await self._reclaim(handler, taken)
+                if started < taken:
+                    started += await self._read(handler, taken - started)
+            finally:
+                for _ in range(taken - started):
+                    self._slots.release()
+
+    async def stop(self, drain_timeout: float = 10) -> None:
+        """Stop taking new work. Unfinished jobs stay pending and get redelivered to another worker."""
+        self._stopping.set()
+        if self._running:
+            await asyncio.wait(self._running, timeout=drain_timeout)
+        for task in self._running:
+            task.cancel()
+        await self.client.aclose()
+
+    async def _take_slots(self) -> int:
+        """Wait for a free slot, then take every other free one too. Returns how many were taken."""
+        await self._slots.acquire()
+        taken = 1
+        while not self._slots.locked():
+            await self._slots.acquire()
+            taken += 1
+        return taken
+
+    async def _read(self, handler: JobHandler, count: int) -> int:
+        """Start up to `count` new entries. Returns how many were started."""
+        try:
+            response = await self.client.xreadgroup(
+                self.group, self.consumer_name, {self.stream: ">"},
+                # don't hold the slots past the next reclaim pass
+                count=count, block=min(5000, self.heartbeat_interval * 1000),
+            )
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            logger.warning("Redis unavailable, retrying: %s", e)
+            await asyncio.sleep(2)
+            return 0
+        started = 0
+        for _stream, entries in response or []:
+            for entry_id, fields in entries:
+                self._start(entry_id, fields, handler)
+                started += 1
+        return started
+
+    def _start(self, entry_id: bytes, fields: dict, handler: JobHandler) -> None:
+        """Run an entry on a slot the caller holds; the slot is released when the job ends."""
+        task = asyncio.create_task(self._execute(entry_id, fields, handler))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _execute(self, entry_id: bytes, fields: dict, handler: JobHandler) -> None:
+        job_id = fields[b"job_id"].decode()
+        heartbeat = asyncio.create_task(self._heartbeat(entry_id, job_id))
+        try:
+            await handler(job_id, fields[b"payload"])
+        except asyncio.CancelledError:
+            # shutting down: leave the entry pending so another worker picks it up
+            raise
+        except Exception:
+            # handlers record their own failures, this is a last resort: a handler
+            # that raises would likely raise again, so don't wait out the visibility
+            # timeout to retry it, dead-letter it now
+            logger.exception("Unhandled error in job %s", job_id)
+            await self._dead_letter(entry_id, job_id)
+        else:
+            await self._ack(entry_id)
+        finally:
+            heartbeat.cancel()
+            self._slots.release()
+
+    async def _ack(self, entry_id: bytes) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, self.group, entry_id)
+            pipe.xdel(self.stream, entry_id)
+            await pipe.execute()
+
+    async def _dead_letter(self, entry_id: bytes, job_id: str) -> None:
+        try:
+            if self._on_dead_letter:
+                await self._on_dead_letter(job_id)
+            await self._ack(entry_id)
+        except Exception:
+            # still pending: the reclaimer retries it after the visibility timeout
+            logger.exception("Failed to dead-letter job %s", job_id)
+
+    async def _heartbeat(self, entry_id: bytes, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.client.xclaim(
+                    self.stream, self.group, self.consumer_name, 0, [entry_id], justid=True
+                )
+                if self._on_heartbeat:
+                    await self._on_heartbeat(job_id)
+            except redis.RedisError as e:
+                logger.warning("Heartbeat failed for %r: %s", entry_id, e)
+
+    async def _reclaim(self, handler: JobHandler, slots: int) -> int:
+        """
+        Take over up to `slots` entries whose worker stopped heartbeating. Each pass
+        scans the next RECLAIM_SCAN_COUNT idle entries of the group's PEL, resuming
+        where the previous pass stopped, so an orphan behind many live entries is
+        still found. Returns how many were started.
+        """
+        started = 0
+        try:
+            pending = await self.client.xpending_range(
+                self.stream, self.group, min=self._reclaim_cursor, max="+",
+                count=RECLAIM_SCAN_COUNT, idle=self.visibility_timeout_ms,
+            )
+            # a short page means the end of the PEL: start over from its head
+            self._reclaim_cursor = "-"
+            if len(pending) == RECLAIM_SCAN_COUNT:
+                self._reclaim_cursor = f"({pending[-1]['message_id'].decode()}"
+            for entry in pending:
+                if started == slots:
+                    self._reclaim_cursor = entry["message_id"].decode()
+                    break
+                # min_idle_time again: only one worker wins an entry, and not one that just heartbeated
+                claimed = await self.client.xclaim(
+                    self.stream, self.group, self.consumer_name,
+                    min_idle_time=self.visibility_timeout_ms, message_ids=[entry["message_id"]],
+                )
+                if not claimed:
+                    continue
+                entry_id, fields = claimed[0]
+                if not fields:
+                    # deleted from the stream but still pending
+                    await self._ack(entry_id)
+                    continue
+                job_id = fields[b"job_id"].decode()
+                deliveries = entry["times_delivered"] + 1
+                if deliveries > self.max_deliveries:
+                    logger.error("Job %s failed %d deliveries, giving up", job_id, deliveries - 1)
+                    await self._dead_letter(entry_id, job_id)
+                    continue
+                logger.warning("Redelivering orphaned job %s (delivery %d)", job_id, deliveries)
+                self._start(entry_id, fields, handler)
+                started += 1
+        except redis.RedisError as e:
+            logger.warning("Reclaim failed: %s", e)
+        except Exception:
+            # never let a pass kill the consumer: without it crashed workers' jobs are never redelivered
+            logger.exception("Reclaim failed")
+        return started
@@ -1,29 +1,46 @@
 from datetime import datetime
 from typing import Optional, Any
 from models.job import JobStatus, VideoJobRequest, VideoJob
+from services.credit_service import CreditError, CreditService
 from services.fal_service import FalService
+from services.image_service import ImageService
+from services.job_admission import AdmissionRejected, JobAdmission
+from services.job_events import JobEvents
+from services.job_pipeline import Pipeline, Stage
+from services.job_queue import JobQueue
+from services.scene_context_service import SceneContextService
+from services.upload_store import UploadStore
 from services.vertex_service import VertexService
 from utils.prompt_builder import create_video_prompt
 from utils.env import settings
+from utils.logging_config import job_id_var, request_id_var
+from utils.metrics import JOB_QUEUE_WAIT_SECONDS, JOBS_IN_FLIGHT
+from utils.redis_client import get_async_redis
+import dataclasses
+import httpx
+import logging
 import uuid
 import redis
-import pickle
-import lzma
+import redis.asyncio as aioredis
+import msgpack
 import asyncio
-import traceback
 import time
 
+logger = logging.getLogger(__name__)
+
+# How long a job record lives after each transition
+JOB_TTL_SECONDS = {"waiting": 600, "error": 600, "done": 3600}
+
+ANALYZE_PROMPT = "Describe any animation annotations you see. Use this description to inform a video director. Be descriptive about location and purpose of the annotations."
+
 
 class _MemoryStore:
-    """In-memory store with TTL for local dev when Redis is unavailable."""
+    """In-memory store with TTL for local dev when Redis is unavailable (same async API as redis.asyncio)."""
 
     def __init__(self):
         self._data: dict[str, tuple[float, bytes]] = {}
 
-    def setex(self, name: str, time_sec: int, value: bytes) -> None:
-        self._data[name] = (time.time() + time_sec, value)
-
-    def get(self, name: str) -> Optional[bytes]:
+    def _get(self, name: str) -> Optional[bytes]:
         if name not in self._data:
             return None
         expiry, val = self._data[name]
@@ -32,117 +49,300 @@ class _MemoryStore:
             return None
         return val
 
-    def delete(self, *names: str) -> None:
+    async def set(self, name: str, value: bytes, ex: int) -> None:
+        self._data[name] = (time.time() + ex, value)
+
+    async def get(self, name: str) -> Optional[bytes]:
+        return self._get(name)
+
+    async def mget(self, names: list[str]) -> list[Optional[bytes]]:
+        return [self._get(name) for name in names]
+
+    async def getex(self, name: str, ex: int) -> Optional[bytes]:
+        val = self._get(name)
+        if val is not None:
+            self._data[name] = (time.time() + ex, val)
+        return val
+
+    async def delete(self, *names: str) -> None:
         for name in names:
             self._data.pop(name, None)
 
-    def ping(self) -> bool:
+    async def ping(self) -> bool:
         return True
 
-
 class JobService:
-    def __init__(self, fal_service: FalService, vertex_service: VertexService):
+    def __init__(
+        self,
+        fal_service: FalService,
+        vertex_service: VertexService,
+        scene_context_service: SceneContextService,
+        upload_store: UploadStore,
+        image_service: ImageService,
+        credit_service: CreditService,
+    ):
         self.fal_service = fal_service
         self.vertex_service = vertex_service  # Keep for image analysis (Gemini)
+        self.scene_context_service = scene_context_service
+        self.upload_store = upload_store
+        self.image_service = image_service
+        self.credit_service = credit_service
+        self._background: set[asyncio.Task] = set()
+        # jobs run in-process when there's no queue
+        self._local_jobs: set[asyncio.Task] = set()
         self.redis_client = self._make_store()
+        # Without Redis (local dev) jobs run as in-process tasks like before
+        self.queue = self._make_queue() if isinstance(self.redis_client, aioredis.Redis) else None
+        self._worker_task: Optional[asyncio.Task] = None
+        # pushes state changes to /events watchers on every web process
+        self.events = JobEvents(self.redis_client if self.queue else None)
+        # caps jobs in flight per user and overall, shared by every replica through Redis
+        self.admission = JobAdmission(
+            self.redis_client if self.queue else None,
+            global_limit=settings.JOB_MAX_IN_FLIGHT,
+            user_limit=settings.JOB_MAX_IN_FLIGHT_PER_USER,
+            lease_seconds=settings.JOB_ADMISSION_LEASE_SECONDS,
+        )
 
     def _make_store(self) -> Any:
         if not settings.REDIS_URL:
             return _MemoryStore()
+        # One blocking probe at startup (before the loop serves anything) decides
+        # between Redis and the dev fallback; all later calls use the shared async pool
+        probe = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=3)
         try:
-            client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=False, socket_connect_timeout=3)
-            client.ping()
-            return client
+            probe.ping()
         except (redis.RedisError, OSError):
             return _MemoryStore()
+        finally:
+            probe.close()
+        return get_async_redis()
+
+    def _make_queue(self) -> JobQueue:
+        return JobQueue(
+            settings.REDIS_URL,
+            concurrency=settings.JOB_WORKER_CONCURRENCY,
+            visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+            max_deliveries=settings.JOB_MAX_DELIVERIES,
+        )
+
+    @staticmethod
+    def _encode_request(request: VideoJobRequest) -> bytes:
+        return msgpack.packb(dataclasses.asdict(request), use_bin_type=True)
+
+    @staticmethod
+    def _decode_request(payload: bytes) -> VideoJobRequest:
+        return VideoJobRequest(**msgpack.unpackb(payload, raw=False))
 
     def _serialize(self, data: dict) -> bytes:
-        """Serialize + compress any data to bytes for Redis storage"""
-        return lzma.compress(pickle.dumps(data))
+        """Serialize a job record for Redis (msgpack: small, fast, and safe to load unlike pickle)"""
+        return msgpack.packb(data, use_bin_type=True)
     
     def _deserialize(self, data: bytes) -> Optional[dict]:
-        """Deserialize + decompress bytes from Redis storage"""
+        """Deserialize a job record from Redis storage"""
         if not data:
             return None
-        return pickle.loads(lzma.decompress(data))
-
-    async def create_video_job(self, request: VideoJobRequest) -> str:
-        """Create a video job and return job_id immediately, processing happens in background"""
-        job_id = str(uuid.uuid4())
-        
-        pending_job = {
-            "status": "pending",
-            "job_start_time": datetime.now().isoformat()
-        }
-        # Store pending job BEFORE starting background task to avoid 404 race condition
-        self.redis_client.setex(f"job:{job_id}:pending", 600, self._serialize(pending_job))
-        
-        # start background task
-        asyncio.create_task(self._process_video_job(job_id, request))
-        
+        return msgpack.unpackb(data, raw=False)
+
+    async def _save_job(self, job_id: str, job: VideoJob) -> None:
+        """
+        Every state transition rewrites the single job:{id} record with one SET EX,
+        so readers never see a half-finished transition.
+        """
+        await self.redis_client.set(f"job:{job_id}", self._serialize(job), ex=JOB_TTL_SECONDS[job["status"]])
+
+    async def _load_job(self, job_id: str) -> Optional[VideoJob]:
+        return self._deserialize(await self.redis_client.get(f"job:{job_id}"))
+
+    @staticmethod
+    def _to_status(job: VideoJob) -> JobStatus:
+        return JobStatus(
+            status=job["status"],
+            job_start_time=datetime.fromisoformat(job["job_start_time"]),
+            job_end_time=datetime.fromisoformat(job["job_end_time"]) if job.get("job_end_time") else None,
+            video_url=job.get("video_url"),
+            error=job.get("error"),
+            metadata=job.get("metadata"),
+            version=job.get("version", 0),
+            stages=job.get("stages"),
+        )
+
+    async def _finish_job(self, job_id: str, job: VideoJob) -> None:
+        job["version"] = job.get("version", 0) + 1
+        status = self._to_status(job).to_dict()
+        if not self.events.redis:
+            await self._save_job(job_id, job)
+            await self.events.publish(job_id, status)
+        else:
+            # record + notification in one MULTI round-trip: watchers never hear
+            # about a state that isn't stored yet, and a stored state is always announced
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.set(f"job:{job_id}", self._serialize(job), ex=JOB_TTL_SECONDS[job["status"]])
+                self.events.publish_in(pipe, job_id, status)
+                await pipe.execute()
+        try:
+            await self.admission.release(job_id)
+        except redis.RedisError as e:
+            # the lease runs out on its own
+            logger.warning("Failed to release admission slot for %s: %s", job_id, e)
+        if job.get("credits"):
+            await self._settle_credits(job_id, refund=job["status"] != "done")
+
+    async def _settle_credits(self, job_id: str, refund: bool) -> None:
+        """Commit a job's reserved credits, or give them back (settling twice is a no-op)."""
+        try:
+            if refund:
+                await self.credit_service.refund(job_id)
+            else:
+                await self.credit_service.commit(job_id)
+        except (CreditError, httpx.HTTPError) as e:
+            # the reservation stays "reserved" in credit_reservations until settled by hand
+            logger.error("Failed to %s credits reserved by %s: %s", "refund" if refund else "commit", job_id, e)
+
+    async def create_video_job(
+        self,
+        request: VideoJobRequest,
+        user_id: str,
+        job_id: Optional[str] = None,
+        batch_id: Optional[str] = None,
+    ) -> str:
+        """
+        Create a video job and return job_id immediately, processing happens in background.
+        Raises AdmissionRejected when the user or the whole service is at its cap,
+        and InsufficientCredits when the user can't pay for it.
+        Batch jobs pass the clip's pre-assigned job_id and their own batch_id.
+        """
+        job_id = job_id or str(uuid.uuid4())
+        reason = await self.admission.acquire(job_id, user_id)
+        if reason:
+            raise AdmissionRejected(reason, settings.JOB_ADMISSION_RETRY_AFTER_SECONDS)
+
+        credits = settings.VIDEO_JOB_CREDITS
+        reserved = False
+        try:
+            if credits:
+                # held while the job runs: committed when it's done, refunded when it fails
+                await self.credit_service.reserve(job_id, user_id, "video_gen", credits)
+                reserved = True
+            # Store pending job BEFORE starting background task to avoid 404 race condition
+            await self._save_job(job_id, {
+                "job_id": job_id,
+                "status": "waiting",
+                "version": 1,
+                "job_start_time": datetime.now().isoformat(),
+                "user_id": user_id,
+                "admitted_at": time.time(),
+                "credits": credits,
+                # the request that created the job, so worker logs can be joined with it
+                "request_id": request_id_var.get(),
+                **({"batch_id": batch_id} if batch_id else {}),
+            })
+
+            if self.queue:
+                # durable: any worker process can pick it up, and it survives restarts
+                await self.queue.enqueue(job_id, self._encode_request(request))
+            else:
+                task = asyncio.create_task(self._process_video_job(job_id, request))
+                self._local_jobs.add(task)
+                task.add_done_callback(self._local_jobs.discard)
+        except BaseException:
+            await self.admission.release(job_id)
+            if reserved:
+                await self._settle_credits(job_id, refund=True)
+            raise
+
         return job_id
-    
+
+    async def run_worker(self) -> None:
+        """Consume queued video jobs until stop_worker() is called."""
+        if not self.queue:
+            return
+        await self.queue.run(
+            self._run_queued_job,
+            on_dead_letter=self._fail_abandoned_job,
+            # a job that runs longer than the lease must not give up its slot
+            on_heartbeat=self.admission.renew,
+        )
+
+    def start_worker(self) -> None:
+        """Run a queue consumer inside this process (used by the web app when JOB_WORKER_EMBEDDED is set)."""
+        if self.queue and not self._worker_task:
+            self._worker_task = asyncio.create_task(self.run_worker())
+
+    async def stop_worker(self, drain_timeout: float = 10) -> None:
+        if not self.queue:
+            # like JobQueue.stop(): give in-process jobs a moment, then cancel them
+            if self._local_jobs:
+                await asyncio.wait(self._local_jobs, timeout=drain_timeout)
+            for task in self._local_jobs:
+                task.cancel()
+            return
+        await self.queue.stop()
+        if self._worker_task:
+            self._worker_task.cancel()
+            self._worker_task = None
+
+    async def _run_queued_job(self, job_id: str, payload: bytes) -> None:
+        job = await self._load_job(job_id)
+        if job and job["status"] != "waiting":
+            # already finished by a previous delivery
+            return
+        await self._process_video_job(job_id, self._decode_request(payload))
+
+    async def _fail_abandoned_job(self, job_id: str) -> None:
+        job = await self._load_job(job_id) or {"job_id": job_id, "job_start_time": datetime.now().isoformat()}
+        await self._finish_job(job_id, {
+            **job,
+            "status": "error",
+            "error": "Video generation was interrupted too many times. Please try again.",
+        })
+
     async def _process_video_job(self, job_id: str, request: VideoJobRequest):
         """Background task that processes the video generation using fal.ai"""
+        job_id_var.set(job_id)
+        # keep the record alive for jobs that waited in the queue or were redelivered (GETEX: read + refresh TTL in one call)
+        pending_job = self._deserialize(await self.redis_client.getex(f"job:{job_id}", ex=JOB_TTL_SECONDS["waiting"]))
+        if pending_job is None:
+            pending_job = {
+                "job_id": job_id,
+                "status": "waiting",
+                "version": 1,
+                "job_start_time": datetime.now().isoformat()
+            }
+            await self._save_job(job_id, pending_job)
+        if pending_job.get("request_id"):
+            request_id_var.set(pending_job["request_id"])
+        if "processing_started_at" not in pending_job:
+            # first delivery: how long the job sat behind others
+            pending_job["processing_started_at"] = time.time()
+            if pending_job.get("admitted_at"):
+                JOB_QUEUE_WAIT_SECONDS.observe(pending_job["processing_started_at"] - pending_job["admitted_at"])
+        # the lease may have run out while the job was queued
+        await self.admission.renew(job_id, pending_job.get("user_id"))
+        pipeline = self._build_pipeline(job_id, request, pending_job)
         try:
-            # Step 1: Analyze annotations using Gemini (vertex_service)
-            # and clean images using fal.ai FLUX Kontext in parallel
-            tasks = [
-                self.vertex_service.analyze_image_content(
-                    prompt="Describe any animation annotations you see. Use this description to inform a video director. Be descriptive about location and purpose of the annotations.",
-                    image_data=request.starting_image
-                ),
-                self.fal_service.generate_image_content(
-                    prompt="Remove all text, captions, subtitles, annotations from this image. Generate a clean version of the image with no text. Keep everything else the exact same.",
-                    image=request.starting_image
-                )
-            ]
-            
-            if request.ending_image:
-                tasks.append(
-                    self.fal_service.generate_image_content(
-                        prompt="Remove all text, captions, subtitles, annotations from this image. Generate a clean version of the image with no text. Keep the art/image style the exact same.",
-                        image=request.ending_image
-                    )
-                )
-            
-            results = await asyncio.gather(*tasks)
-            annotation_description = results[0]
-            starting_frame = results[1]  # bytes from fal
-            ending_frame = results[2] if len(results) > 2 else None
-
-            # Step 2: Generate video using fal.ai Veo 3.1
-            # This call waits for completion (subscribe_async) and stores to GCS
-            video_result = await self.fal_service.generate_video_content(
-                prompt=create_video_prompt(request.custom_prompt, request.global_context, annotation_description),
-                image_data=starting_frame,
-                ending_image_data=ending_frame,
-                duration_seconds=request.duration_seconds,
-                job_id=job_id  # Used for GCS storage path
-            )
-            
-            # Get the GCS URL (stored for longevity) or fallback to fal CDN URL
-            video_url = video_result["video"].get("gcs_url") or video_result["video"]["url"]
+            with JOBS_IN_FLIGHT.track_inprogress():
+                results = await pipeline.run()
+            annotation_description = results["analyze"]
+            video_url, video_sha256 = results["persist"]
             
             # Store completed job with video URL directly
-            job = {
-                "job_id": job_id,
+            await self._finish_job(job_id, {
+                **pending_job,
                 "status": "done",
                 "video_url": video_url,
-                "job_start_time": datetime.now().isoformat(),
                 "job_end_time": datetime.now().isoformat(),
+                "stages": pipeline.timeline,
                 "metadata": {
-                    "annotation_description": annotation_description
+                    "annotation_description": annotation_description,
+                    "video_sha256": video_sha256,
                 }
-            }
-            
-            self.redis_client.delete(f"job:{job_id}:pending")
-            self.redis_client.setex(f"job:{job_id}", 3600, self._serialize(job))  # Keep for 1 hour
+            })
+            if settings.SCENE_CONTEXT_PREFETCH:
+                self._prefetch_scene_context(video_url, video_sha256)
             
         except Exception as e:
-            # debug stuff
-            print(f"Error processing video job {job_id}: {e}")
-            traceback.print_exc()
+            logger.exception("Error processing video job %s", job_id)
             
             # Parse error for user-friendly message
             error_str = str(e)
@@ -153,62 +353,145 @@ class JobService:
             else:
                 user_error = error_str
             
-            error_job = {
+            await self._finish_job(job_id, {
+                **pending_job,
                 "status": "error",
                 "error": user_error,
-                "job_start_time": datetime.now().isoformat()
-            }
-            self.redis_client.delete(f"job:{job_id}:pending")
-            self.redis_client.setex(f"job:{job_id}:error", 600, self._serialize(error_job))
-
-    async def get_video_job_status(self, job_id: str) -> JobStatus:
-        # Check if job is still pending (processing with fal.ai)
-        pending_data = self.redis_client.get(f"job:{job_id}:pending")
-        if pending_data:
-            pending_job = self._deserialize(pending_data)
-            return JobStatus(
-                status="waiting",
-                job_start_time=datetime.fromisoformat(pending_job["job_start_time"]),
-                job_end_time=None,
-                video_url=None,
+                "stages": pipeline.timeline,
+            })
+
+    def _prefetch_scene_context(self, video_url: str, video_sha256: Optional[str]) -> None:
+        """
+        Post-stage, after the job is already done: extract the clip's scene context
+        so the frontend's extract-context call is a cache hit (or joins this call).
+        """
+        async def prefetch():
+            try:
+                await self.scene_context_service.extract_from_url(video_url, video_sha256)
+            except Exception as e:
+                logger.warning("Scene context prefetch failed for %s: %s", video_url, e)
+
+        task = asyncio.create_task(prefetch())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _build_pipeline(self, job_id: str, request: VideoJobRequest, pending_job: VideoJob) -> Pipeline:
+        """
+        The video job as a DAG. Each stage starts as soon as its own inputs exist:
+        the start and end frames are cleaned side by side, and Veo starts the
+        moment the description and both cleaned frame URLs are ready.
+
+            load_start ── normalize_start ─┬─ analyze ──────┐
+                                           └─ clean_start ──┼── generate ── persist
+            load_end ──── normalize_end ────── clean_end ────┘   (end frame optional)
+
+        The request only carries upload keys; load_* read the frames from the
+        upload store, so the bytes are held only while the job actually runs.
+        normalize_* shrink and re-encode each frame once, and every model call
+        after that gets the normalized bytes. clean_* hand Veo the edited frames'
+        URLs, so the edits are never downloaded on the way.
+        """
+        async def load_start() -> bytes:
+            return await self.upload_store.get(request.starting_image_key)
+
+        async def load_end() -> bytes:
+            return await self.upload_store.get(request.ending_image_key)
+
+        async def analyze(starting_image: bytes) -> str:
+            if request.annotation_description is not None:
+                # analyzed together with the rest of its batch
+                return request.annotation_description
+            return await self.vertex_service.analyze_image_content(
+                prompt=ANALYZE_PROMPT,
+                image_data=starting_image
             )
-        
-        # Check if job failed
-        error_data = self.redis_client.get(f"job:{job_id}:error")
-        if error_data:
-            error_job = self._deserialize(error_data)
-            return JobStatus(
-                status="error",
-                job_start_time=datetime.fromisoformat(error_job["job_start_time"]),
-                job_end_time=None,
-                video_url=None,
-                error=error_job.get("error")
+
+        async def clean_start(starting_image: bytes) -> str:
+            # the cleaned frame's URL: Veo reads it where the edit left it, it is never downloaded
+            return await self.fal_service.edit_image_cached(
+                prompt="Remove all text, captions, subtitles, annotations from this image. Generate a clean version of the image with no text. Keep everything else the exact same.",
+                image=starting_image
             )
-        
-        # Retrieve completed job from Redis
-        job_data = self.redis_client.get(f"job:{job_id}")
 
-        if job_data is None:  # if job not found
-            return None
+        async def clean_end(ending_image: bytes) -> str:
+            return await self.fal_service.edit_image_cached(
+                prompt="Remove all text, captions, subtitles, annotations from this image. Generate a clean version of the image with no text. Keep the art/image style the exact same.",
+                image=ending_image
+            )
 
-        job = self._deserialize(job_data)
+        async def generate(annotation_description: str, image_url: str, ending_image_url: Optional[str] = None) -> dict:
+            # fal.ai Veo 3.1, waits for completion (subscribe_async)
+            return await self.fal_service.generate_video_from_urls(
+                prompt=create_video_prompt(request.custom_prompt, request.global_context, annotation_description),
+                image_url=image_url,
+                ending_image_url=ending_image_url,
+                duration_seconds=request.duration_seconds
+            )
 
-        # Job is complete - return the stored video URL directly
-        ret = JobStatus(
-            status="done",
-            job_start_time=datetime.fromisoformat(job["job_start_time"]),
-            job_end_time=datetime.fromisoformat(job["job_end_time"]) if job.get("job_end_time") else datetime.now(),
-            video_url=job["video_url"],
-            metadata=job.get("metadata")
-        )
+        async def persist(video_result: dict) -> tuple[str, Optional[str]]:
+            # GCS URL (stored for longevity) and sha256, or the fal CDN URL if storing failed
+            return await self.fal_service.store_video(video_result["video"]["url"], job_id)
+
+        stages = [
+            Stage("load_start", load_start),
+            Stage("normalize_start", self.image_service.normalize, deps=("load_start",)),
+            Stage("analyze", analyze, deps=("normalize_start",)),
+            Stage("clean_start", clean_start, deps=("normalize_start",)),
+        ]
+        generate_deps = ("analyze", "clean_start")
+        if request.ending_image_key:
+            stages += [
+                Stage("load_end", load_end),
+                Stage("normalize_end", self.image_service.normalize, deps=("load_end",)),
+                Stage("clean_end", clean_end, deps=("normalize_end",)),
+            ]
+            generate_deps += ("clean_end",)
+        stages += [
+            Stage("generate", generate, deps=generate_deps),
+            Stage("persist", persist, deps=("generate",)),
+        ]
+
+        async def record_progress(entry: dict) -> None:
+            # live timeline for GET /video/{job_id}/stages while the job runs (best effort)
+            pending_job["stages"] = pipeline.timeline
+            # a new timeline is a new state for /video/status:batch (since / ETag)
+            pending_job["version"] = pending_job.get("version", 0) + 1
+            try:
+                await self._save_job(job_id, pending_job)
+            except redis.RedisError as e:
+                logger.warning("Failed to record stage %s for %s: %s", entry["stage"], job_id, e)
+
+        pipeline = Pipeline(stages, on_stage_done=record_progress)
+        return pipeline
 
-        # Don't delete completed jobs immediately - let them expire naturally
-        return ret
+    async def get_video_job_status(self, job_id: str) -> Optional[JobStatus]:
+        # One read: the record holds whatever state the job is in
+        job = await self._load_job(job_id)
+        if job is None:  # if job not found
+            return None
+        return self._to_status(job)
+
+    async def get_user_video_job_status(self, job_id: str, user_id: str) -> Optional[JobStatus]:
+        """Like get_video_job_status, but None for other users' jobs too."""
+        job = await self._load_job(job_id)
+        if job is None or job.get("user_id") != user_id:
+            return None
+        return self._to_status(job)
+
+    async def get_video_job_statuses(self, job_ids: list[str]) -> dict[str, Optional[JobStatus]]:
+        """Status of many jobs in one MGET (None for unknown ids)."""
+        if not job_ids:
+            return {}
+        records = await self.redis_client.mget([f"job:{job_id}" for job_id in job_ids])
+        return {
+            job_id: self._to_status(job) if (job := self._deserialize(raw)) else None
+            for job_id, raw in zip(job_ids, records)
+        }
 
     async def redis_health_check(self) -> bool:
         try:
-            self.redis_client.ping()
+            await asyncio.wait_for(self.redis_client.ping(), timeout=2)
             return True
-        except redis.RedisError:
+        except (redis.RedisError, OSError, asyncio.TimeoutError):
             return False
         
\ No newline at end of file
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+from typing import Optional
+
+import httpx
+
+from services.content_cache import ContentCache
+from services.fal_service import is_fal_cdn_url
+from services.storage_service import ObjectTooLarge, StorageService
+from services.vertex_service import VertexService
+from utils.env import settings
+from utils.metrics import track_call
+from utils.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+VIDEO_DOWNLOAD_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+PROMPT = (
+    "Extract structured scene information from this video.\n"
+    "Respond with ONLY valid JSON. No explanations, no markdown, no backticks.\n"
+    "Follow this exact structure, keys required:\n"
+    "{\n"
+    '  "entities": [\n'
+    '    { "id": "id-1", "description": "...", "appearance": "..." }\n'
+    "  ],\n"
+    '  "environment": "...",\n'
+    '  "style": "..."\n'
+    "}\n"
+    "If information is missing, use empty strings.\n"
+)
+
+
+class SceneContextError(Exception):
+    """Gemini answered with something that isn't the requested JSON."""
+
+    def __init__(self, raw: str):
+        super().__init__("Failed to parse JSON")
+        self.raw = raw
+
+
+class SceneContextService:
+    """
+    Scene context (entities, environment, style) of generated clips, cached by
+    the sha256 of the video. Videos are read server-side from R2 (or the fal CDN),
+    so the browser never has to download a clip just to upload it again.
+    """
+
+    def __init__(
+        self,
+        vertex_service: VertexService,
+        storage_service: StorageService,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.vertex_service = vertex_service
+        self.storage_service = storage_service
+        # the app's shared client; server.py sets it when the app starts
+        self.http = http_client
+        self.cache = ContentCache(
+            "scene-context",
+            storage_service,
+            get_async_redis(),
+            ttl=settings.SCENE_CONTEXT_CACHE_TTL_SECONDS,
+            max_entries=settings.SCENE_CONTEXT_CACHE_MAX_ENTRIES,
+        )
+
+    async def extract(self, video: bytes) -> dict:
+        """Scene context of an uploaded video"""
+        return await self._extract(hashlib.sha256(video).hexdigest(), video)
+
+    async def extract_from_url(self, video_url: str, sha256: Optional[str] = None) -> dict:
+        """
+        Scene context of a stored video. With its sha256 (recorded when the job
+        stored it) the clip is only downloaded on a cache miss.
+        Raises ValueError for URLs that aren't ours and for videos over UPLOAD_MAX_VIDEO_MB.
+        """
+        path = self.storage_service.path_for_url(video_url)
+        if path is None and not is_fal_cdn_url(video_url):
+            raise ValueError("video_url must point to a stored video")
+
+        async def load() -> bytes:
+            if not path:
+                return await self._download(video_url)
+            try:
+                return await self.storage_service.download(path, max_bytes=settings.UPLOAD_MAX_VIDEO_MB * 1024 * 1024)
+            except ObjectTooLarge:
+                raise ValueError(f"Video is larger than {settings.UPLOAD_MAX_VIDEO_MB} MB") from None
+
+        if sha256:
+            async def create() -> dict:
+                # only the caller that runs the extraction downloads the clip
+                return await self._analyze(await load())
+
+            return await self.cache.get_or_create(sha256, create)
+        video = await load()
+        return await self._extract(hashlib.sha256(video).hexdigest(), video)
+
+    async def _extract(self, key: str, video: bytes) -> dict:
+        # concurrent requests for the same clip (post-job prefetch + the frontend) share one Gemini call
+        return await self.cache.get_or_create(key, lambda: self._analyze(video))
+
+    async def _analyze(self, video: bytes) -> dict:
+        response = await self.vertex_service.analyze_video_content(prompt=PROMPT, video_data=video)
+        return self._parse(response.text or response.candidates[0].content.parts[0].text)
+
+    async def _download(self, video_url: str) -> bytes:
+        """Read a clip from the fal CDN, no bigger than an uploaded video may be."""
+        limit = settings.UPLOAD_MAX_VIDEO_MB * 1024 * 1024
+        with track_call("cdn_download"):
+            async with self.http.stream("GET", video_url, timeout=VIDEO_DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
+                if int(response.headers.get("content-length") or 0) > limit:
+                    raise ValueError(f"Video is larger than {settings.UPLOAD_MAX_VIDEO_MB} MB")
+                video = bytearray()
+                async for chunk in response.aiter_bytes():
+                    video += chunk
+                    if len(video) > limit:
+                        raise ValueError(f"Video is larger than {settings.UPLOAD_MAX_VIDEO_MB} MB")
+                return bytes(video)
+
+    @staticmethod
+    def _parse(raw: str) -> dict:
+        # Strip markdown if present
+        cleaned = raw.strip()
+        if cleaned.startswith("```"):
+            lines = cleaned.split('\n')
+            cleaned = '\n'.join(lines[1:])
+        if cleaned.endswith("```"):
+            cleaned = cleaned[:-3]
+        cleaned = cleaned.strip()
+
+        try:
+            parsed = json.loads(cleaned)
+        except ValueError:
+            raise SceneContextError(raw)
+        if not isinstance(parsed, dict):
+            raise SceneContextError(raw)
+        return parsed
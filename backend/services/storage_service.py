@@ -1,13 +1,37 @@
 import boto3
 from botocore.client import Config
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Optional, Union
+from urllib.parse import unquote, urlsplit
 from utils.env import settings
-import io
+from utils.metrics import STORAGE_UPLOAD_BYTES, STORAGE_UPLOAD_SECONDS, track_call
+import asyncio
+import base64
+import functools
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+UploadData = Union[bytes, AsyncIterator[bytes]]
+
+
+class ObjectTooLarge(ValueError):
+    """A stored object is bigger than the caller is willing to read."""
+
 
 class StorageService:
     def __init__(self):
         self.client = None
         self.bucket_name = None
         self.public_url = None
+        # boto3 is blocking, so every call runs on this bounded pool instead of the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.STORAGE_MAX_WORKERS, thread_name_prefix="r2"
+        )
+        self.part_size = settings.STORAGE_PART_SIZE_MB * 1024 * 1024
+        self.upload_concurrency = settings.STORAGE_UPLOAD_CONCURRENCY
         
         # Only initialize if R2 bucket name is configured
         if settings.R2_BUCKET_NAME:
@@ -19,22 +43,23 @@ class StorageService:
                     aws_access_key_id=settings.R2_ACCESS_KEY_ID,
                     aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
                     region_name='auto',
-                    config=Config(signature_version='s3v4')
+                    config=Config(
+                        signature_version='s3v4',
+                        max_pool_connections=settings.STORAGE_MAX_WORKERS,
+                    )
                 )
                 self.bucket_name = settings.R2_BUCKET_NAME
                 # Use public URL if configured (for permanent public access)
                 self.public_url = settings.R2_PUBLIC_URL.rstrip('/') if settings.R2_PUBLIC_URL else None
-                print(f"Successfully initialized Cloudflare R2 Storage with bucket: {settings.R2_BUCKET_NAME}")
+                logger.info("Initialized Cloudflare R2 Storage with bucket: %s", settings.R2_BUCKET_NAME)
                 if self.public_url:
-                    print(f"Using public URL: {self.public_url}")
-            except Exception as e:
-                import traceback
-                print(f"Warning: Could not initialize Cloudflare R2 Storage: {e}")
-                traceback.print_exc()
+                    logger.info("Using public URL: %s", self.public_url)
+            except Exception:
+                logger.exception("Could not initialize Cloudflare R2 Storage")
                 self.client = None
                 self.bucket_name = None
         else:
-            print("Warning: R2_BUCKET_NAME not set in environment")
+            logger.warning("R2_BUCKET_NAME not set in environment")
             self.client = None
             self.bucket_name = None
 
@@ -49,20 +74,186 @@ class StorageService:
             ExpiresIn=7 * 24 * 60 * 60
         )
 
-    async def upload_file(self, item_name: str, file_data: bytes):
+    def get_url(self, path: str) -> str:
+        """URL for an object that is already stored"""
+        return self._get_url(path)
+
+    def path_for_url(self, url: str) -> Optional[str]:
+        """Object path behind a URL this service handed out (public or presigned), None for anything else"""
+        if not self.client:
+            return None
+        if self.public_url and url.startswith(f"{self.public_url}/"):
+            return unquote(url[len(self.public_url) + 1:].split("?", 1)[0]) or None
+        parts = urlsplit(url)
+        endpoint = f"{settings.R2_ACCOUNT_ID}.r2.cloudflarestorage.com"
+        if parts.hostname == f"{self.bucket_name}.{endpoint}":
+            return unquote(parts.path.lstrip("/")) or None
+        if parts.hostname == endpoint and parts.path.startswith(f"/{self.bucket_name}/"):
+            return unquote(parts.path[len(self.bucket_name) + 2:]) or None
+        return None
+
+    async def download(self, path: str, max_bytes: Optional[int] = None) -> bytes:
+        """Read an object. Raises ObjectTooLarge, before reading the body, for objects over max_bytes."""
         if not self.client:
             raise ValueError("Cloudflare R2 Storage not configured. Set R2_BUCKET_NAME in .env")
-        
-        self.client.upload_fileobj(
-            io.BytesIO(file_data),
-            self.bucket_name,
-            item_name
+
+        def read() -> bytes:
+            response = self.client.get_object(Bucket=self.bucket_name, Key=path)
+            if max_bytes is not None and response["ContentLength"] > max_bytes:
+                response["Body"].close()
+                raise ObjectTooLarge(path)
+            return response["Body"].read()
+
+        with track_call("r2_download"):
+            return await self._run(read)
+
+    async def delete(self, path: str) -> None:
+        if not self.client:
+            raise ValueError("Cloudflare R2 Storage not configured. Set R2_BUCKET_NAME in .env")
+        await self._run(self.client.delete_object, Bucket=self.bucket_name, Key=path)
+
+    async def _run(self, fn, *args, **kwargs):
+        """Run a blocking boto3 call on the storage thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def upload(
+        self,
+        data: UploadData,
+        path: str,
+        content_type: str = "application/octet-stream",
+        on_first_part: Optional[Callable[[], None]] = None,
+    ) -> str:
+        """
+        Upload bytes or an async byte iterator to R2 without blocking the event loop.
+        Anything larger than one part goes up as a multipart upload with parts sent in parallel.
+        `on_first_part` is called once the first bytes are stored.
+        Returns URL for access.
+        """
+        if not self.client:
+            raise ValueError("Cloudflare R2 Storage not configured. Set R2_BUCKET_NAME in .env")
+
+        start = time.perf_counter()
+        if isinstance(data, (bytes, bytearray)):
+            data = self._iter_bytes(bytes(data))
+        parts = self._parts(data)
+        try:
+            size = await self._upload_parts(path, parts, content_type, on_first_part)
+        finally:
+            # close the source right away (e.g. stop a producing subprocess) if we bailed out early
+            await parts.aclose()
+            if hasattr(data, "aclose"):
+                await data.aclose()
+
+        elapsed = time.perf_counter() - start
+        STORAGE_UPLOAD_SECONDS.observe(elapsed)
+        STORAGE_UPLOAD_BYTES.inc(size)
+        logger.info(
+            "Uploaded %s: %.1f MB in %.2fs (%.1f MB/s)",
+            path, size / 1e6, elapsed, size / 1e6 / max(elapsed, 1e-6),
         )
-        
-        return self._get_url(item_name)
+        return self._get_url(path)
+
+    async def _iter_bytes(self, data: bytes) -> AsyncIterator[bytes]:
+        for offset in range(0, len(data), self.part_size):
+            yield data[offset:offset + self.part_size]
+
+    async def _parts(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Re-chunk an arbitrary byte stream into part_size pieces (last one may be smaller)."""
+        buffer = bytearray()
+        async for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= self.part_size:
+                with memoryview(buffer) as view:
+                    part = bytes(view[:self.part_size])
+                del buffer[:self.part_size]
+                yield part
+        if buffer:
+            yield bytes(buffer)
+
+    async def _upload_parts(
+        self, path: str, parts: AsyncIterator[bytes], content_type: str, on_first_part: Optional[Callable[[], None]]
+    ) -> int:
+        first = await anext(parts, b"")
+        second = await anext(parts, None)
+        if second is None:
+            # fits in one part, a plain PUT is cheaper
+            await self._run(self._put_object, path, first, content_type)
+            if on_first_part:
+                on_first_part()
+            return len(first)
+
+        upload = await self._run(
+            self.client.create_multipart_upload, Bucket=self.bucket_name, Key=path, ContentType=content_type
+        )
+        upload_id = upload["UploadId"]
+        etags: dict[int, str] = {}
+        # at most upload_concurrency parts are buffered/in flight, which bounds memory per upload
+        slots = asyncio.Semaphore(self.upload_concurrency)
+        tasks: list[asyncio.Task] = []
+        size = 0
+
+        async def send(part_number: int, body: bytes):
+            try:
+                etags[part_number] = await self._run(self._upload_part, path, upload_id, part_number, body)
+                if on_first_part and len(etags) == 1:
+                    on_first_part()
+            finally:
+                slots.release()
+
+        async def all_parts():
+            nonlocal first, second
+            head, first, second = (first, second), None, None  # don't pin them for the whole upload
+            for part in head:
+                yield part
+            del head
+            async for part in parts:
+                yield part
+
+        try:
+            async for body in all_parts():
+                await slots.acquire()
+                failed = next((t for t in tasks if t.done() and t.exception()), None)
+                if failed:
+                    slots.release()
+                    raise failed.exception()
+                size += len(body)
+                tasks.append(asyncio.create_task(send(len(tasks) + 1, body)))
+            await asyncio.gather(*tasks)
+            await self._run(
+                self.client.complete_multipart_upload,
+                Bucket=self.bucket_name, Key=path, UploadId=upload_id,
+                MultipartUpload={"Parts": [{"PartNumber": n, "ETag": etags[n]} for n in sorted(etags)]},
+            )
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await self._run(self.client.abort_multipart_upload, Bucket=self.bucket_name, Key=path, UploadId=upload_id)
+            raise
+        return size
+
+    @staticmethod
+    def _md5(body: bytes) -> str:
+        # R2 rejects the body if it doesn't match, so corruption in transit fails the upload
+        return base64.b64encode(hashlib.md5(body).digest()).decode()
+
+    def _put_object(self, path: str, body: bytes, content_type: str) -> None:
+        self.client.put_object(
+            Bucket=self.bucket_name, Key=path, Body=body, ContentType=content_type, ContentMD5=self._md5(body)
+        )
+
+    def _upload_part(self, path: str, upload_id: str, part_number: int, body: bytes) -> str:
+        res = self.client.upload_part(
+            Bucket=self.bucket_name, Key=path, UploadId=upload_id, PartNumber=part_number,
+            Body=body, ContentMD5=self._md5(body),
+        )
+        return res["ETag"]
+
+    async def upload_file(self, item_name: str, file_data: UploadData):
+        return await self.upload(file_data, item_name)
 
     def upload_bytes(self, data: bytes, path: str, content_type: str = "application/octet-stream") -> str:
-        """Upload bytes to R2 and return URL for access"""
+        """Upload bytes to R2 and return URL for access (blocking, prefer `await upload(...)` from async code)"""
         if not self.client:
             raise ValueError("Cloudflare R2 Storage not configured. Set R2_BUCKET_NAME in .env")
         
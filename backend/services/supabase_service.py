@@ -1,7 +1,11 @@
 from supabase import Client, create_client
+from services.auth_service import AuthService
 from utils.env import settings
 from typing import Optional, Tuple
 from blacksheep import Request
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class SupabaseService:
@@ -9,12 +13,26 @@ class SupabaseService:
         self.supabase: Client = create_client(
             settings.SUPABASE_URL, settings.SUPABASE_SECRET_KEY
         )
+        auth_url = f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1"
+        self.auth = AuthService(
+            gotrue_lookup=self._get_user_id_from_gotrue,
+            jwt_secret=settings.SUPABASE_JWT_SECRET,
+            jwks_url=f"{auth_url}/.well-known/jwks.json",
+            issuer=auth_url,
+            revocation_check=settings.SUPABASE_AUTH_REVOCATION_CHECK,
+            max_cache_size=settings.AUTH_CACHE_MAX_SIZE,
+        )
     
     def get_user_id_from_token(self, token: str) -> Optional[str]:
         """Return the Supabase user id from a JWT access token.
-        Uses GoTrue to validate the token and fetch the user.
+        Verifies the token locally (cached until it expires) and only
+        falls back to GoTrue when it can't.
         Returns None if invalid or user not found.
         """
+        return self.auth.get_user_id(token)
+
+    def _get_user_id_from_gotrue(self, token: str) -> Optional[str]:
+        """Uses GoTrue to validate the token and fetch the user (network round-trip)."""
         if not token:
             return None
         try:
@@ -28,43 +46,28 @@ class SupabaseService:
 
     def get_user_id_from_request(self, request: Request) -> Optional[str]:
         """Extract Bearer token from Authorization header and return user id."""
-        auth_header = request.get_first_header(b"authorization")
-        if not auth_header:
-            return None
-        try:
-            value = auth_header.decode()
-            if value.lower().startswith("bearer "):
-                token = value[7:].strip()
-            else:
-                # Not a Bearer token
-                return None
-            return self.get_user_id_from_token(token)
-        except Exception:
-            return None
+        return self.get_user_id_from_token(self.auth.get_bearer_token(request))
 
     def do_transaction(self, user_id: str, transaction_type: str, credit_usage: int) -> Tuple[bool, Optional[str]]:
         """
-        Logs transaction and deducts credit usage for user.
+        Logs transaction and deducts credit usage for user, in one RPC (one Postgres
+        transaction, so the balance and the ledger can't disagree).
+        Blocking: async code should use CreditService.reserve.
         Returns (success, error_message) tuple.
         """
         try:
             self.supabase.rpc(
-                "sub_user_credits",
+                "reserve_user_credits",
                 {
                     "p_user_id": user_id,
-                    "p_credit_change": credit_usage
+                    "p_transaction_type": transaction_type,
+                    "p_credits": credit_usage
                 }
             ).execute()
-
-            self.supabase.table("transaction_log").insert({
-                "transaction_type": transaction_type,
-                "user_id": user_id,
-                "credit_usage": credit_usage
-            }).execute()
             return (True, None)
         except Exception as e:
             error_msg = str(e)
-            print(f"Failed to do transaction: {error_msg}")
+            logger.error("Failed to do transaction: %s", error_msg)
             if "insufficient_credits" in error_msg:
                 return (False, "insufficient_credits")
             return (False, error_msg)
@@ -111,8 +114,8 @@ class SupabaseService:
                 }
             ).execute()
             return True
-        except Exception as e:
-            print(f"Failed to add credits: {e}")
+        except Exception:
+            logger.exception("Failed to add credits for %s", user_id)
             return False
 
     def update_user_plan(self, user_id: str, plan: str):
@@ -124,8 +127,8 @@ class SupabaseService:
                 "billing_type": plan  # Column is billing_type, not plan
             }).eq("user_id", user_id).execute()
             return True
-        except Exception as e:
-            print(f"Failed to update plan: {e}")
+        except Exception:
+            logger.exception("Failed to update plan for %s", user_id)
             return False
 
     def log_credit_purchase(self, user_id: str, credits: int, product_id: str):
@@ -139,7 +142,7 @@ class SupabaseService:
                 "credit_usage": -credits,  # Negative because user gained credits
             }).execute()
             return True
-        except Exception as e:
-            print(f"Failed to log credit purchase: {e}")
+        except Exception:
+            logger.exception("Failed to log credit purchase for %s", user_id)
             return False
         
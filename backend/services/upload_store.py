@@ -0,0 +1,67 @@
+import hashlib
+from typing import Optional
+
+import redis.asyncio as aioredis
+from cachetools import TTLCache
+
+from services.storage_service import StorageService
+from utils.redis_client import get_async_redis
+from utils.uploads import Upload
+
+KEY_PREFIX = "uploads/"
+
+
+class UploadStore:
+    """
+    Parks uploaded job inputs in R2 under uploads/{sha256}, so a queued job
+    carries a short key instead of the image bytes and any worker can read it.
+    Content addressed: the same image uploaded twice is one object. The prefix
+    is meant to be cleared by a bucket lifecycle rule (a day is plenty).
+    Without R2 the bytes go to Redis for local_ttl seconds, so a separate
+    worker process still finds them; with neither (local dev) they stay in process.
+    """
+
+    def __init__(
+        self,
+        storage_service: StorageService,
+        local_ttl: int = 3600,
+        redis_client: Optional[aioredis.Redis] = None,
+    ):
+        self.storage_service = storage_service
+        self.local_ttl = local_ttl
+        self.redis = redis_client if redis_client is not None else get_async_redis()
+        self._local: TTLCache = TTLCache(maxsize=1000, ttl=local_ttl)
+
+    async def put(self, upload: Upload) -> str:
+        key = f"{KEY_PREFIX}{upload.sha256}"
+        if not self.storage_service.client:
+            await self._put_without_r2(key, await upload.read())
+            return key
+        await self.storage_service.upload(upload.chunks(), key, upload.content_type or "application/octet-stream")
+        return key
+
+    async def put_bytes(self, data: bytes, content_type: str) -> str:
+        """put() for bytes made in process (e.g. a normalized frame)"""
+        key = f"{KEY_PREFIX}{hashlib.sha256(data).hexdigest()}"
+        if not self.storage_service.client:
+            await self._put_without_r2(key, data)
+            return key
+        await self.storage_service.upload(data, key, content_type)
+        return key
+
+    async def get(self, key: str) -> bytes:
+        if not self.storage_service.client:
+            if self.redis:
+                data: Optional[bytes] = await self.redis.get(key)
+            else:
+                data = self._local.get(key)
+            if data is None:
+                raise KeyError(f"Upload {key} is gone")
+            return data
+        return await self.storage_service.download(key)
+
+    async def _put_without_r2(self, key: str, data: bytes) -> None:
+        if self.redis:
+            await self.redis.set(key, data, ex=self.local_ttl)
+        else:
+            self._local[key] = data
@@ -1,7 +1,14 @@
+import asyncio
+import json
+import logging
 from google import genai
 from google.genai.types import GenerateVideosConfig, GenerateVideosOperation, Image, GenerateContentConfig, ImageConfig, Part, VideoGenerationReferenceImage
 from models.job import JobStatus
 from utils.env import settings
+from utils.images import sniff_mime
+from utils.metrics import track_call
+
+logger = logging.getLogger(__name__)
 
 class VertexService:
     def __init__(self):
@@ -10,6 +17,19 @@ class VertexService:
             project=settings.GOOGLE_CLOUD_PROJECT,
             location=settings.GOOGLE_CLOUD_LOCATION
         )
+        # Native async client, so Gemini calls never block the event loop
+        self.aio = self.client.aio
+        self._semaphore = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+        self.timeout = settings.GEMINI_TIMEOUT_SECONDS
+
+    async def _generate_content(self, timeout: float = None, **kwargs):
+        """generate_content with bounded concurrency and a per-call timeout"""
+        async with self._semaphore:
+            with track_call("gemini"):
+                return await asyncio.wait_for(
+                    self.aio.models.generate_content(**kwargs),
+                    timeout=timeout or self.timeout,
+                )
 
     async def generate_video_content(self, prompt: str, image_data: bytes = None, ending_image_data: bytes = None, duration_seconds: int = 6) -> GenerateVideosOperation:
         ending_frame = None
@@ -20,7 +40,7 @@ class VertexService:
             )
 
         # gen vid (deprecated - now using fal.ai service)
-        operation = self.client.models.generate_videos(
+        operation = await self.aio.models.generate_videos(
             model="veo-3.1-fast-generate-001",
             prompt=prompt,
             image=Image(
@@ -38,9 +58,8 @@ class VertexService:
         return operation
     
     async def generate_image_content(self, prompt: str, image: bytes) -> str:
-        print(f"[Vertex] generate_image_content called, image size: {len(image)} bytes")
-        print(f"[Vertex] Using model: gemini-2.5-flash-image")
-        response = self.client.models.generate_content(
+        logger.debug("generate_image_content called, image size: %d bytes", len(image))
+        response = await self._generate_content(
             model="gemini-2.5-flash-image",
             contents=[
                 Part.from_bytes(
@@ -57,15 +76,13 @@ class VertexService:
                 candidate_count=1,
             ),
         )
-        print(f"[Vertex] Got response, checking candidates...")
         if not response.candidates or not response.candidates[0].content.parts:
-            print(f"[Vertex] ERROR: No candidates or parts in response: {response}")
+            logger.error("No candidates or parts in response: %s", response)
             raise Exception(str(response))
-        print(f"[Vertex] Success! Returning image data")
         return response.candidates[0].content.parts[0].inline_data.data
     
     async def get_video_status(self, operation: GenerateVideosOperation) -> JobStatus:
-        operation = self.client.operations.get(operation)
+        operation = await self.aio.operations.get(operation)
         if operation.done and operation.result and operation.result.generated_videos:
             return JobStatus(status="done", job_start_time=None, video_url=operation.result.generated_videos[0].video.uri)
         return JobStatus(status="waiting", job_start_time=None, video_url=None)
@@ -74,17 +91,18 @@ class VertexService:
         """Get video status by operation name (avoids serialization)"""
         # Create a minimal operation object with just the name since get() expects an operation object
         operation = GenerateVideosOperation(name=operation_name)
-        operation = self.client.operations.get(operation)
+        operation = await self.aio.operations.get(operation)
         if operation.done and operation.result and operation.result.generated_videos:
             return JobStatus(status="done", job_start_time=None, video_url=operation.result.generated_videos[0].video.uri)
         return JobStatus(status="waiting", job_start_time=None, video_url=None)
     
-    def analyze_video_content(self, prompt: str, video_data: bytes) -> dict:
-        return self.client.models.generate_content(
+    async def analyze_video_content(self, prompt: str, video_data: bytes) -> dict:
+        return await self._generate_content(
+            timeout=self.timeout * 2,  # whole clips take longer than stills
             model="gemini-2.0-flash",
             contents=[
                 Part.from_bytes(
-                    data=video_data.data,
+                    data=video_data,
                     mime_type="video/mp4",
                 ),
                 prompt
@@ -92,20 +110,49 @@ class VertexService:
         )
     
     async def analyze_image_content(self, prompt: str, image_data: bytes) -> dict:
-        return self.client.models.generate_content(
+        response = await self._generate_content(
             model="gemini-2.0-flash",
             contents=[
                 Part.from_bytes(
                     data=image_data,
-                    mime_type="image/png",
+                    mime_type=sniff_mime(image_data) or "image/png",
                 ),
                 prompt
                 ]
-        ).candidates[0].content.parts[0].text.strip()
+        )
+        return response.candidates[0].content.parts[0].text.strip()
+
+    async def analyze_images_content(self, prompt: str, images: list[bytes]) -> list[str]:
+        """
+        One Gemini call for several images: each is labelled "Frame n" and the answer
+        is a JSON array with one response to `prompt` per frame, in order. Raises
+        ValueError when the answer doesn't have exactly one string per frame.
+        """
+        contents = []
+        for n, image_data in enumerate(images, 1):
+            contents += [
+                f"Frame {n}:",
+                Part.from_bytes(data=image_data, mime_type=sniff_mime(image_data) or "image/png"),
+            ]
+        contents.append(
+            f"{prompt}\nAnswer for each of the {len(images)} frames on its own, "
+            f"as a JSON array of {len(images)} strings in frame order."
+        )
+        response = await self._generate_content(
+            timeout=self.timeout * 2,  # several images per call
+            model="gemini-2.0-flash",
+            contents=contents,
+            config=GenerateContentConfig(response_mime_type="application/json", response_schema=list[str]),
+        )
+        descriptions = json.loads(response.text)
+        if not isinstance(descriptions, list) or len(descriptions) != len(images) \
+                or not all(isinstance(description, str) for description in descriptions):
+            raise ValueError(f"Expected {len(images)} descriptions, got: {response.text[:200]}")
+        return [description.strip() for description in descriptions]
     
 
     async def test_service(self):
-        return self.client.models.generate_content(
+        return await self._generate_content(
             model="gemini-2.0-flash",
             contents="Hi there, does u work?",
         )
@@ -2,15 +2,39 @@ import asyncio
 import logging
 import time
 from services.storage_service import StorageService
-import uuid
+import hashlib
+import json
 import shutil
+from typing import AsyncIterator
+from urllib.parse import urlsplit
+from services.content_cache import ContentCache
+from services.fal_service import is_fal_cdn_url
+from utils.env import settings
+from utils.metrics import MERGE_FIRST_BYTE_SECONDS, MERGE_PREFIX_REUSED, MERGE_TOTAL_SECONDS
+from utils.redis_client import get_async_redis
 
 logger = logging.getLogger(__name__)
 
+STDERR_TAIL_BYTES = 8 * 1024
+
+# Output options are part of the cache key, so changing them never serves stale merges
+FFMPEG_OUTPUT_ARGS = [
+    "-c", "copy",  # Stream copy (no re-encoding) for maximum speed
+    "-f", "mp4",
+    "-movflags", "frag_keyframe+empty_moov",  # Enable streaming output
+]
+
 class VideoMergeService:
     def __init__(self, storage_service: StorageService):
         self.storage_service = storage_service
         self.ffmpeg_available = True
+        self.cache = ContentCache(
+            "merge",
+            storage_service,
+            get_async_redis(),
+            ttl=settings.MERGE_CACHE_TTL_SECONDS,
+            max_entries=settings.MERGE_CACHE_MAX_ENTRIES,
+        )
         # Check if ffmpeg is available
         self._check_ffmpeg()
 
@@ -30,10 +54,13 @@ class VideoMergeService:
         
         Args:
             video_urls: List of video URLs in order (from root to end frame)
-            user_id: User ID for organizing storage
+            user_id: Requesting user (merged objects are shared by content, not per user)
             
         Returns:
             Public URL of the merged video
+
+        Raises:
+            ValueError: for URLs that aren't our stored clips or the fal CDN
         """
         if not self.ffmpeg_available:
             raise RuntimeError(
@@ -42,39 +69,87 @@ class VideoMergeService:
             )
 
         start_time = time.time()
-        print(f"[VIDEO MERGE] Starting merge for user {user_id}: {len(video_urls)} videos")
+        logger.info("Starting merge for user %s: %d videos", user_id, len(video_urls))
         
         if not video_urls:
             raise ValueError("No video URLs provided")
+        # ffmpeg fetches these itself, so only clips we handed out are accepted
+        if not all(self._is_mergeable(url) for url in video_urls):
+            raise ValueError("video_urls must point to stored videos")
         
         if len(video_urls) == 1:
             # Single video, just return the URL
             return video_urls[0]
         
-        try:
-            # Merge videos using FFmpeg with HTTP inputs directly
-            merge_start = time.time()
-            
-            merged_video_data = await self._merge_with_ffmpeg_http(video_urls)
-            
-            merge_duration = time.time() - merge_start
-            merged_size = len(merged_video_data)
-            
-            # Upload to storage
-            upload_start = time.time()
-            video_id = str(uuid.uuid4())
-            video_path = f"videos/{user_id}/merged_{video_id}.mp4"
-            
-            public_url = await self.storage_service.upload_file(video_path, merged_video_data)
-            
-            upload_duration = time.time() - upload_start
-            total_duration = time.time() - start_time
-            
-            return public_url
-        except Exception as e:
-            raise
+        # Same ordered clips + same ffmpeg options => same output, so merges are
+        # content-addressed and a re-export returns the stored object. Merged
+        # objects are shared and their URLs are handed out, so the cache never
+        # deletes them (no `path`): evicting an entry only drops it from the index
+        merge_key = self._merge_key(video_urls)
+        video_path = f"videos/merged/{merge_key}.mp4"
+        result = await self.cache.get_or_create(
+            merge_key,
+            lambda: self._merge_and_store(video_urls, video_path, start_time),
+        )
+        logger.info("Merge ready in %.3fs", time.time() - start_time)
+        return self.storage_service.get_url(result["path"])
+
+    def _is_mergeable(self, url: str) -> bool:
+        if not isinstance(url, str) or not url.isprintable():
+            return False
+        if urlsplit(url).scheme not in ("http", "https"):
+            return False
+        return self.storage_service.path_for_url(url) is not None or is_fal_cdn_url(url)
+
+    def _merge_key(self, video_urls: list[str]) -> str:
+        # stored clips are keyed by object path: presigned URLs change with every signature
+        clips = [self.storage_service.path_for_url(url) or url for url in video_urls]
+        material = json.dumps({"video_urls": clips, "ffmpeg": FFMPEG_OUTPUT_ARGS})
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    async def _merge_and_store(self, video_urls: list[str], video_path: str, start_time: float) -> dict:
+        first_byte_at = None
+
+        def on_first_part():
+            nonlocal first_byte_at
+            first_byte_at = time.time() - start_time
+            MERGE_FIRST_BYTE_SECONDS.observe(first_byte_at)
 
-    async def _merge_with_ffmpeg_http(self, video_urls: list[str]) -> bytes:
+        sources = await self._sources_with_cached_prefix(video_urls)
+
+        # ffmpeg's fragmented MP4 output is piped straight into a multipart upload,
+        # so memory per merge stays at a few parts no matter how long the result is
+        await self.storage_service.upload(
+            self._merge_with_ffmpeg_http(sources),
+            video_path,
+            "video/mp4",
+            on_first_part=on_first_part,
+        )
+
+        total_duration = time.time() - start_time
+        MERGE_TOTAL_SECONDS.observe(total_duration)
+        logger.info("Merged in %.2fs (first bytes uploaded after %.2fs)", total_duration, first_byte_at or total_duration)
+        return {"path": video_path, "clips": len(video_urls)}
+
+    async def _sources_with_cached_prefix(self, video_urls: list[str]) -> list[str]:
+        """
+        Storyboards grow one clip at a time, so the chain minus its last clip(s) was
+        usually merged moments ago. Start from the longest already-merged prefix and
+        only append the clips after it (stream copy, no re-encode), so a merge fetches
+        and demuxes the new clips plus one prefix object instead of every clip again.
+        """
+        prefix_lengths = list(range(len(video_urls) - 1, 1, -1))
+        cached = await self.cache.get_many(
+            [self._merge_key(video_urls[:length]) for length in prefix_lengths]
+        )
+        for length, entry in zip(prefix_lengths, cached):
+            if entry:
+                MERGE_PREFIX_REUSED.inc()
+                logger.info("Reusing merged prefix of %d clips, appending %d", length, len(video_urls) - length)
+                return [self.storage_service.get_url(entry["path"])] + video_urls[length:]
+        return video_urls
+
+    async def _merge_with_ffmpeg_http(self, video_urls: list[str]) -> AsyncIterator[bytes]:
         """
         Merges videos using FFmpeg with HTTP inputs directly.
         FFmpeg downloads and merges in one pass - no temporary files, no intermediate downloads.
@@ -84,29 +159,30 @@ class VideoMergeService:
         1. Create concat file content in memory (as string)
         2. Pipe concat file to FFmpeg via stdin
         3. FFmpeg reads videos directly from HTTP URLs
-        4. Stream output directly to stdout
+        4. Yield stdout chunks as they are produced; ffmpeg blocks on a full pipe
+           when the consumer (the upload) falls behind, which gives us backpressure
         """
         # Build concat file content in memory
         # Format: file 'http://url1'
         #         file 'http://url2'
         #         ...
-        concat_content = "".join([f"file '{url}'\n" for url in video_urls])
+        # a quote inside a URL is written as '\'' (close, escaped quote, reopen)
+        concat_content = "".join(["file '" + url.replace("'", "'\\''") + "'\n" for url in video_urls])
         concat_bytes = concat_content.encode('utf-8')
         
         # FFmpeg command using concat demuxer with stdin for concat file
-        # -protocol_whitelist allows HTTP/HTTPS access (required for remote URLs)
-        # -f concat -safe 0 -i - reads concat file from stdin
+        # -protocol_whitelist allows HTTP/HTTPS access (required for remote URLs), no local files
+        # -f concat -safe 0 -i - reads concat file from stdin (-safe 0 is needed for URLs;
+        #   merge_videos only lets through clips we stored)
         # -c copy uses stream copy (no re-encoding) for maximum speed
         # -movflags frag_keyframe+empty_moov enables streaming output
         ffmpeg_cmd = [
             "ffmpeg",
-            "-protocol_whitelist", "file,http,https,tcp,tls,fd",  # Allow HTTP/HTTPS protocols and fd for stdin
+            "-protocol_whitelist", "http,https,tcp,tls,fd",  # Allow HTTP/HTTPS protocols and fd for stdin
             "-f", "concat",
             "-safe", "0",
             "-i", "-",  # Read concat file from stdin
-            "-c", "copy",  # Stream copy (no re-encoding) for maximum speed
-            "-f", "mp4",
-            "-movflags", "frag_keyframe+empty_moov",  # Enable streaming output
+            *FFMPEG_OUTPUT_ARGS,
             "-"  # Output to stdout
         ]
         
@@ -118,61 +194,40 @@ class VideoMergeService:
             stderr=asyncio.subprocess.PIPE
         )
         
-        # Write concat file to stdin first, then read output in parallel
-        async def write_concat_file():
-            """Write concat file content to FFmpeg stdin."""
-            try:
-                process.stdin.write(concat_bytes)
-                await process.stdin.drain()
-                process.stdin.close()
-                await process.stdin.wait_closed()
-            except Exception as e:
-                raise
-        
-        async def read_output():
-            """Read merged video output from FFmpeg stdout."""
-            chunks = []
-            try:
-                while True:
-                    chunk = await process.stdout.read(1024 * 1024)  # Read 1MB chunks
-                    if not chunk:
-                        break
-                    chunks.append(chunk)
-                return b"".join(chunks)
-            except Exception as e:
-                raise
-        
         async def monitor_progress():
-            """Monitor FFmpeg stderr for progress and errors."""
-            chunks = []
-            try:
-                while True:
-                    chunk = await process.stderr.read(1024)
-                    if not chunk:
-                        break
-                    chunks.append(chunk)
-            except Exception as e:
-                pass
-            
-            return b"".join(chunks)
+            """Drain FFmpeg stderr so it never blocks, keeping the tail for error messages."""
+            tail = b""
+            while True:
+                chunk = await process.stderr.read(1024)
+                if not chunk:
+                    break
+                tail = (tail + chunk)[-STDERR_TAIL_BYTES:]
+            return tail
 
-        # Write concat file first, then read output and monitor progress in parallel
+        stderr_task = asyncio.create_task(monitor_progress())
+        finished = False
         try:
-            await write_concat_file()
-            stdout_data, stderr_data = await asyncio.gather(
-                read_output(),
-                monitor_progress()
-            )
-        except Exception as e:
-            process.terminate()
-            await process.wait()
-            raise Exception(f"Error during FFmpeg execution: {e}")
-        
-        # Wait for process to complete
-        return_code = await process.wait()
+            # Write concat file to stdin first, then stream the output
+            process.stdin.write(concat_bytes)
+            await process.stdin.drain()
+            process.stdin.close()
+            await process.stdin.wait_closed()
 
-        if return_code != 0:
-            error_msg = stderr_data.decode() if stderr_data else "Unknown FFmpeg error"
-            raise Exception(f"FFmpeg failed with return code {return_code}: {error_msg}")
-        
-        return stdout_data
+            while True:
+                chunk = await process.stdout.read(1024 * 1024)  # Read 1MB chunks
+                if not chunk:
+                    break
+                yield chunk
+
+            # Wait for process to complete; failing here aborts the upload before it's finalized
+            return_code = await process.wait()
+            stderr_data = await stderr_task
+            if return_code != 0:
+                error_msg = stderr_data.decode(errors="replace") if stderr_data else "Unknown FFmpeg error"
+                raise Exception(f"FFmpeg failed with return code {return_code}: {error_msg}")
+            finished = True
+        finally:
+            if not finished and process.returncode is None:
+                process.terminate()
+                await process.wait()
+            stderr_task.cancel()
@@ -0,0 +1,38 @@
+"""
+Shared test setup. Settings are read from the environment when utils.env is
+imported, so placeholder values go in first. Redis is fakeredis (with Lua, for
+the admission scripts), one fresh server per test.
+
+Run from backend/: pip install -r requirements-dev.txt && python -m pytest -q
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+for name, value in {
+    "GOOGLE_CLOUD_PROJECT": "test",
+    "GOOGLE_CLOUD_LOCATION": "us-central1",
+    "GOOGLE_GENAI_USE_VERTEXAI": "true",
+    "R2_ACCOUNT_ID": "test",
+    "R2_ACCESS_KEY_ID": "test",
+    "R2_SECRET_ACCESS_KEY": "test",
+    "R2_BUCKET_NAME": "",  # local upload store, no R2
+    "REDIS_URL": "",  # in-memory job store; tests hand fakeredis to what needs Redis
+    "SUPABASE_URL": "https://test.supabase.co",
+    "SUPABASE_SECRET_KEY": "test",
+    "FAL_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+import fakeredis  # noqa: E402
+
+
+@pytest.fixture
+def redis_factory():
+    """Makes async fakeredis clients sharing one server (create them inside the test's event loop)."""
+    server = fakeredis.FakeServer()
+    return lambda: fakeredis.aioredis.FakeRedis(server=server)
@@ -0,0 +1,157 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from models.job import BatchJobRequest, VideoJobRequest
+from services.batch_job_service import BatchJobService
+from services.credit_service import CreditError, InsufficientCredits
+from services.job_service import JobService
+
+
+class FakeUploads:
+    async def get(self, key: str) -> bytes:
+        return key.encode()
+
+    async def put_bytes(self, data: bytes, content_type: str) -> str:
+        return f"normalized/{data.decode()}"
+
+
+class FakeImages:
+    async def normalize(self, data: bytes) -> bytes:
+        return data
+
+
+class FakeVertex:
+    async def analyze_images_content(self, prompt: str, images: list[bytes]) -> list[str]:
+        return [f"description of {image.decode()}" for image in images]
+
+    async def analyze_image_content(self, prompt: str, image_data: bytes) -> str:
+        return f"description of {image_data.decode()}"
+
+
+def make_services() -> tuple[JobService, BatchJobService]:
+    # no REDIS_URL: in-memory records, in-process admission and events
+    job_service = JobService(None, FakeVertex(), None, FakeUploads(), FakeImages(), None)
+    batch_service = BatchJobService(job_service, FakeVertex(), FakeImages(), FakeUploads(), None)
+    return job_service, batch_service
+
+
+def frame(key: str) -> VideoJobRequest:
+    return VideoJobRequest(starting_image_key=key, global_context="", custom_prompt="")
+
+
+async def wait_until(condition, timeout: float = 5) -> None:
+    async def poll():
+        while not await condition():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_clip_without_credits_shows_while_the_batch_runs():
+    async def main():
+        job_service, batch_service = make_services()
+        started = []
+
+        async def create_video_job(request, user_id, job_id=None, batch_id=None):
+            if request.starting_image_key == "normalized/frame-2":
+                raise InsufficientCredits()
+            assert request.annotation_description == "description of frame-1"
+            await job_service._save_job(job_id, {
+                "job_id": job_id, "status": "waiting", "version": 1, "job_start_time": datetime.now().isoformat(),
+            })
+            started.append(job_id)
+            return job_id
+
+        job_service.create_video_job = create_video_job
+        batch_id, children = await batch_service.create_batch_job(
+            BatchJobRequest(frames=[frame("frame-1"), frame("frame-2")]), "alice"
+        )
+
+        async def second_clip_failed():
+            status = await batch_service.get_batch_status(batch_id)
+            return status.jobs[1][1] is not None
+        await wait_until(second_clip_failed)
+        status = await batch_service.get_batch_status(batch_id)
+        assert status.status == "waiting"
+        assert status.jobs[1][1].status == "error"
+        assert started == [children[0]]
+
+        job = await job_service._load_job(children[0])
+        await job_service._finish_job(children[0], {**job, "status": "done", "video_url": "https://cdn/1.mp4"})
+
+        async def batch_finished():
+            return (await batch_service.get_batch_status(batch_id)).status != "waiting"
+        await wait_until(batch_finished)
+        status = await batch_service.get_batch_status(batch_id)
+        assert status.status == "error"
+        assert status.error == "1 of 2 clips failed (not enough credits)"
+        assert await job_service.admission.in_flight() == 0
+
+    asyncio.run(main())
+
+
+def test_one_clip_error_does_not_fail_its_siblings():
+    async def main():
+        job_service, batch_service = make_services()
+
+        async def create_video_job(request, user_id, job_id=None, batch_id=None):
+            if request.starting_image_key == "normalized/frame-2":
+                raise CreditError("reserve_user_credits failed (503)")
+            await job_service._save_job(job_id, {
+                "job_id": job_id, "status": "waiting", "version": 1, "job_start_time": datetime.now().isoformat(),
+            })
+            return job_id
+
+        job_service.create_video_job = create_video_job
+        batch_id, children = await batch_service.create_batch_job(
+            BatchJobRequest(frames=[frame("frame-1"), frame("frame-2")]), "alice"
+        )
+
+        async def first_clip_started():
+            return await job_service.get_video_job_status(children[0]) is not None
+        await wait_until(first_clip_started)
+        # the sibling is still followed: the batch waits for it
+        await asyncio.sleep(0.1)
+        assert (await batch_service.get_batch_status(batch_id)).status == "waiting"
+
+        job = await job_service._load_job(children[0])
+        await job_service._finish_job(children[0], {**job, "status": "done", "video_url": "https://cdn/1.mp4"})
+
+        async def batch_finished():
+            return (await batch_service.get_batch_status(batch_id)).status != "waiting"
+        await wait_until(batch_finished)
+        status = await batch_service.get_batch_status(batch_id)
+        assert status.error == "1 of 2 clips failed"
+        assert status.jobs[0][1].status == "done"
+        assert status.jobs[1][1].status == "error"
+
+    asyncio.run(main())
+
+
+def test_failed_batch_read_releases_its_slot():
+    async def main():
+        job_service, batch_service = make_services()
+
+        async def broken_load(batch_id):
+            raise ConnectionError("store unavailable")
+
+        batch_service._load = broken_load
+        assert await job_service.admission.acquire("batch-1", "alice") is None
+        with pytest.raises(ConnectionError):
+            await batch_service._process_batch("batch-1", BatchJobRequest(frames=[frame("frame-1")]))
+        assert await job_service.admission.in_flight() == 0
+
+    asyncio.run(main())
+
+
+def test_stage_progress_is_a_new_version():
+    async def main():
+        job_service, _ = make_services()
+        job = {"job_id": "job-1", "status": "waiting", "version": 1, "job_start_time": datetime.now().isoformat()}
+        await job_service._save_job("job-1", job)
+        pipeline = job_service._build_pipeline("job-1", frame("frame-1"), job)
+        await pipeline.on_stage_done({"stage": "analyze"})
+        assert (await job_service.get_video_job_status("job-1")).version == 2
+
+    asyncio.run(main())
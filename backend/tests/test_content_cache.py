@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from services.content_cache import ContentCache
+from services.video_merge_service import VideoMergeService
+
+
+class FakeStorage:
+    def __init__(self):
+        self.deleted = []
+
+    async def delete(self, path: str) -> None:
+        self.deleted.append(path)
+
+    def path_for_url(self, url: str):
+        prefix = "https://bucket.r2.example/"
+        return url[len(prefix):].split("?", 1)[0] if url.startswith(prefix) else None
+
+
+def test_expired_entries_are_swept_with_their_objects(redis_factory):
+    async def main():
+        storage = FakeStorage()
+        cache = ContentCache("test", storage, redis_factory(), ttl=60, max_entries=10)
+        await cache.put("old", {"path": "objects/old"}, "objects/old")
+        # as if last written and read over a TTL ago: the value is gone, the index isn't
+        await cache.redis.zadd("cache:test:lru", {"old": time.time() - 120})
+        await cache.redis.delete("cache:test:old")
+
+        await cache.put("new", {"path": "objects/new"}, "objects/new")
+        assert storage.deleted == ["objects/old"]
+        assert await cache.redis.zrange("cache:test:lru", 0, -1) == [b"new"]
+        assert await cache.redis.hkeys("cache:test:paths") == [b"new"]
+
+    asyncio.run(main())
+
+
+def test_eviction_deletes_only_tracked_objects(redis_factory):
+    async def main():
+        storage = FakeStorage()
+        cache = ContentCache("test", storage, redis_factory(), ttl=60, max_entries=1)
+        await cache.put("a", {"path": "objects/a"}, "objects/a")
+        await cache.put("b", {"path": "objects/b"})  # handed out: never deleted
+        await cache.put("c", {"path": "objects/c"})
+        assert storage.deleted == ["objects/a"]
+        assert await cache.get("b") is None
+        assert await cache.get("c") == {"path": "objects/c"}
+
+    asyncio.run(main())
+
+
+def test_merge_key_ignores_url_signatures():
+    merge_service = VideoMergeService.__new__(VideoMergeService)
+    merge_service.storage_service = FakeStorage()
+    signed = merge_service._merge_key([
+        "https://bucket.r2.example/videos/a.mp4?X-Amz-Signature=1",
+        "https://bucket.r2.example/videos/b.mp4?X-Amz-Signature=1",
+    ])
+    resigned = merge_service._merge_key([
+        "https://bucket.r2.example/videos/a.mp4?X-Amz-Signature=2",
+        "https://bucket.r2.example/videos/b.mp4?X-Amz-Signature=2",
+    ])
+    assert signed == resigned
+    assert signed != merge_service._merge_key([
+        "https://bucket.r2.example/videos/b.mp4?X-Amz-Signature=1",
+        "https://bucket.r2.example/videos/a.mp4?X-Amz-Signature=1",
+    ])
+
+
+def test_merge_only_takes_stored_clips():
+    merge_service = VideoMergeService.__new__(VideoMergeService)
+    merge_service.storage_service = FakeStorage()
+    assert merge_service._is_mergeable("https://bucket.r2.example/videos/a.mp4?X-Amz-Signature=1")
+    assert merge_service._is_mergeable("https://v3.fal.media/files/clip.mp4")
+    assert not merge_service._is_mergeable("file:///etc/passwd")
+    assert not merge_service._is_mergeable("https://internal.example/clip.mp4")
+    assert not merge_service._is_mergeable("https://bucket.r2.example/a.mp4'\nfile '/etc/passwd")
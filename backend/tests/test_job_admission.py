@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+
+from services.job_admission import JobAdmission
+from tests.test_job_queue import make_queue, run_until
+
+
+@pytest.fixture(params=["redis", "local"])
+def make_admission(request, redis_factory):
+    def make(global_limit=4, user_limit=4, lease_seconds=60):
+        client = redis_factory() if request.param == "redis" else None
+        return JobAdmission(client, global_limit=global_limit, user_limit=user_limit, lease_seconds=lease_seconds)
+    return make
+
+
+def test_global_and_user_caps(make_admission):
+    async def main():
+        admission = make_admission(global_limit=3, user_limit=2)
+        assert await admission.acquire("a1", "alice") is None
+        assert await admission.acquire("a2", "alice") is None
+        assert await admission.acquire("a3", "alice") == "user"
+        assert await admission.acquire("b1", "bob") is None
+        assert await admission.acquire("c1", "carol") == "global"
+        assert await admission.in_flight() == 3
+
+        await admission.release("a1")
+        await admission.release("a1")  # releasing twice frees one slot only
+        assert await admission.in_flight() == 2
+        assert await admission.acquire("c1", "carol") is None
+
+    asyncio.run(main())
+
+
+def test_user_cap_shrinks_to_a_fair_share(make_admission):
+    async def main():
+        admission = make_admission(global_limit=4, user_limit=4)
+        assert await admission.acquire("a1", "alice") is None
+        assert await admission.acquire("b1", "bob") is None
+        # two users active: each gets at most 4 // 2
+        assert await admission.acquire("a2", "alice") is None
+        assert await admission.acquire("a3", "alice") == "user"
+        assert await admission.acquire("b2", "bob") is None
+
+    asyncio.run(main())
+
+
+def test_expired_lease_frees_its_slot(make_admission):
+    async def main():
+        admission = make_admission(global_limit=1, lease_seconds=0)
+        assert await admission.acquire("a1", "alice") is None
+        await asyncio.sleep(0.01)
+        assert await admission.acquire("b1", "bob") is None
+        assert await admission.in_flight() == 1
+
+    asyncio.run(main())
+
+
+def test_renew_keeps_the_slot_and_ignores_released_jobs(make_admission):
+    async def main():
+        admission = make_admission(global_limit=1, lease_seconds=0)
+        assert await admission.acquire("a1", "alice") is None
+        admission.lease_seconds = 60
+        await admission.renew("a1")
+        assert await admission.acquire("b1", "bob") == "global"
+
+        await admission.release("a1")
+        await admission.renew("a1")
+        assert await admission.in_flight() == 0
+
+    asyncio.run(main())
+
+
+def test_lease_lost_while_queued_is_taken_again_on_start(make_admission):
+    async def main():
+        admission = make_admission(global_limit=2, lease_seconds=0)
+        assert await admission.acquire("a1", "alice") is None
+        await asyncio.sleep(0.01)
+        admission.lease_seconds = 60
+        assert await admission.acquire("b1", "bob") is None  # sweeps a1's lease
+        assert await admission.in_flight() == 1
+        await admission.renew("a1")  # a heartbeat never brings a lease back
+        assert await admission.in_flight() == 1
+        await admission.renew("a1", "alice")  # processing starts
+        await admission.renew("a1", "alice")  # already held: counted once
+        assert await admission.in_flight() == 2
+        assert await admission.acquire("c1", "carol") == "global"
+        await admission.release("a1")
+        assert await admission.acquire("c1", "carol") is None
+
+    asyncio.run(main())
+
+
+def test_queue_heartbeat_renews_the_lease(redis_factory):
+    async def main():
+        admission = JobAdmission(redis_factory(), global_limit=1, user_limit=1, lease_seconds=2)
+        queue = make_queue(redis_factory)
+        assert await admission.acquire("job-1", "alice") is None
+        _, first_expiry = (await admission.redis.zrange("admission:leases", 0, 0, withscores=True))[0]
+        renewed = asyncio.Event()
+
+        async def on_heartbeat(job_id):
+            await admission.renew(job_id)
+            renewed.set()
+
+        async def handler(job_id, payload):
+            await asyncio.sleep(5)
+
+        await queue._ensure_group()
+        await queue.enqueue("job-1", b"payload")
+        started = time.time()
+        await run_until(queue, renewed, handler=handler, on_heartbeat=on_heartbeat)
+        _, expiry = (await admission.redis.zrange("admission:leases", 0, 0, withscores=True))[0]
+        assert expiry >= first_expiry + (time.time() - started) - 0.1
+
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime
+
+from services.job_events import JobEvents
+
+
+def test_watch_sees_a_publish_made_before_the_first_read():
+    async def main():
+        events = JobEvents(None)
+        updates = events.watch("job-1", timeout=0.1)
+        await events.publish("job-1", {"status": "done"})
+        assert await anext(updates) == {"status": "done"}
+        assert await anext(updates) is None  # keepalive tick
+        await updates.aclose()
+        assert events.watcher_count() == 0
+
+    asyncio.run(main())
+
+
+def test_watch_over_redis_pubsub(redis_factory):
+    async def main():
+        events = JobEvents(redis_factory())
+        updates = events.watch("job-1", timeout=0.1)
+        other = events.watch("job-2", timeout=0.1)
+        # the listener subscribes in the background; keep publishing until it's in
+        for _ in range(50):
+            await events.publish("job-1", {"status": "done"})
+            update = await anext(updates)
+            if update:
+                break
+        assert update == {"status": "done"}
+        assert await anext(other) is None
+        await updates.aclose()
+        await other.aclose()
+        await events.close()
+
+    asyncio.run(main())
+
+
+def test_event_stream_recovers_a_lost_publish(monkeypatch):
+    import server
+    from controllers import jobs
+
+    monkeypatch.setattr(jobs, "SSE_KEEPALIVE_SECONDS", 0.1)
+
+    async def main():
+        job_service = server.job_service
+        record = {"job_id": "job-1", "status": "waiting", "version": 1, "job_start_time": datetime.now().isoformat()}
+        await job_service._save_job("job-1", record)
+        controller = jobs.Jobs(job_service, None, None, None)
+        response = await controller.watch_video_job_status("job-1")
+
+        async def finish_silently():
+            await asyncio.sleep(0.3)
+            # stored without a publish, as when a notification is lost
+            await job_service._save_job("job-1", {**record, "status": "done", "video_url": "https://cdn/v.mp4"})
+
+        async def read_stream() -> str:
+            return "".join([part.decode() async for part in response.content.get_parts()])
+
+        finisher = asyncio.create_task(finish_silently())
+        body = await asyncio.wait_for(read_stream(), timeout=5)
+        await finisher
+        assert "event: keepalive" in body
+        assert "https://cdn/v.mp4" in body
+
+    asyncio.run(main())
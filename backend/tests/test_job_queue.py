@@ -0,0 +1,165 @@
+import asyncio
+
+from services import job_queue
+from services.job_queue import JobQueue
+
+
+def make_queue(redis_factory, **kwargs) -> JobQueue:
+    queue = JobQueue("redis://unused", visibility_timeout=1, **kwargs)
+    queue.client = redis_factory()
+    xreadgroup = queue.client.xreadgroup
+
+    async def blocking_xreadgroup(*args, block=None, **kwargs):
+        # fakeredis answers XREADGROUP BLOCK at once; without a pause the consumer loop never yields
+        response = await xreadgroup(*args, **kwargs)
+        if not response and block:
+            await asyncio.sleep(0.05)
+        return response
+
+    queue.client.xreadgroup = blocking_xreadgroup
+    return queue
+
+
+async def orphan_entry(queue: JobQueue, job_id: str) -> None:
+    """Enqueue a job and read it as a consumer that then dies without acking."""
+    await queue._ensure_group()
+    await queue.enqueue(job_id, b"payload")
+    await queue.client.xreadgroup(queue.group, "dead-worker", {queue.stream: ">"}, count=1)
+
+
+async def run_until(queue: JobQueue, done: asyncio.Event, timeout: float = 10, **kwargs) -> None:
+    runner = asyncio.create_task(queue.run(**kwargs))
+    try:
+        await asyncio.wait_for(done.wait(), timeout)
+    finally:
+        queue._stopping.set()
+        runner.cancel()
+
+
+def test_orphaned_job_is_redelivered(redis_factory):
+    async def main():
+        queue = make_queue(redis_factory)
+        await orphan_entry(queue, "job-1")
+        ran = asyncio.Event()
+        seen = []
+
+        async def handler(job_id, payload):
+            seen.append((job_id, payload))
+            ran.set()
+
+        await run_until(queue, ran, handler=handler)
+        await asyncio.sleep(0.1)
+        assert seen == [("job-1", b"payload")]
+        assert await queue.client.xlen(queue.stream) == 0  # acked and deleted
+
+    asyncio.run(main())
+
+
+def test_orphan_behind_live_entries_is_redelivered(redis_factory, monkeypatch):
+    monkeypatch.setattr(job_queue, "RECLAIM_SCAN_COUNT", 2)
+
+    async def main():
+        queue = make_queue(redis_factory, concurrency=1)
+        await queue._ensure_group()
+        live = [await queue.client.xadd(queue.stream, {b"job_id": f"live-{i}".encode(), b"payload": b""}) for i in range(5)]
+        await queue.client.xreadgroup(queue.group, "live-worker", {queue.stream: ">"}, count=5)
+        await orphan_entry(queue, "orphan")
+
+        async def heartbeat_live():
+            while True:
+                await queue.client.xclaim(queue.stream, queue.group, "live-worker", 0, live, justid=True)
+                await asyncio.sleep(0.1)
+
+        heartbeats = asyncio.create_task(heartbeat_live())
+        ran = asyncio.Event()
+        seen = []
+
+        async def handler(job_id, payload):
+            seen.append(job_id)
+            ran.set()
+
+        try:
+            await run_until(queue, ran, handler=handler)
+        finally:
+            heartbeats.cancel()
+        assert seen == ["orphan"]
+
+    asyncio.run(main())
+
+
+def test_entries_wait_in_the_stream_while_slots_are_busy(redis_factory):
+    async def main():
+        queue = make_queue(redis_factory, concurrency=1)
+        await queue._ensure_group()
+        release = asyncio.Event()
+        done = asyncio.Event()
+        seen = []
+
+        async def handler(job_id, payload):
+            seen.append(job_id)
+            if job_id == "job-1":
+                await release.wait()
+            else:
+                done.set()
+
+        await queue.enqueue("job-1", b"payload")
+        await queue.enqueue("job-2", b"payload")
+        runner = asyncio.create_task(queue.run(handler=handler))
+        await asyncio.sleep(0.3)
+        # job-2 was never read: it isn't pending (unheartbeated) on this worker
+        assert (await queue.client.xpending(queue.stream, queue.group))["pending"] == 1
+        release.set()
+        try:
+            await asyncio.wait_for(done.wait(), 5)
+        finally:
+            queue._stopping.set()
+            runner.cancel()
+        assert seen == ["job-1", "job-2"]
+
+    asyncio.run(main())
+
+
+def test_job_over_max_deliveries_is_dead_lettered(redis_factory):
+    async def main():
+        queue = make_queue(redis_factory, max_deliveries=1)
+        await orphan_entry(queue, "job-1")
+        dead = asyncio.Event()
+        handled = []
+
+        async def handler(job_id, payload):
+            handled.append(job_id)
+
+        async def on_dead_letter(job_id):
+            assert job_id == "job-1"
+            dead.set()
+
+        await run_until(queue, dead, handler=handler, on_dead_letter=on_dead_letter)
+        await asyncio.sleep(0.1)
+        assert handled == []
+        assert await queue.client.xlen(queue.stream) == 0
+
+    asyncio.run(main())
+
+
+def test_failing_handler_is_dead_lettered_without_waiting(redis_factory):
+    async def main():
+        queue = make_queue(redis_factory)
+        dead = asyncio.Event()
+
+        async def handler(job_id, payload):
+            raise RuntimeError("boom")
+
+        async def on_dead_letter(job_id):
+            dead.set()
+
+        await queue._ensure_group()
+        await queue.enqueue("job-1", b"payload")
+        # well inside the 1s visibility timeout: not left for the reclaimer
+        await run_until(queue, dead, timeout=0.8, handler=handler, on_dead_letter=on_dead_letter)
+        await asyncio.sleep(0.1)
+        assert await queue.client.xlen(queue.stream) == 0
+        assert await queue.client.xpending(queue.stream, queue.group) == {
+            "pending": 0, "min": None, "max": None, "consumers": []
+        }
+
+    asyncio.run(main())
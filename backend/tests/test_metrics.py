@@ -0,0 +1,32 @@
+import asyncio
+
+from blacksheep.testing import TestClient
+
+from utils.metrics import HTTP_REQUEST_SECONDS, route_label
+
+
+def test_route_label_uses_the_route_pattern():
+    assert route_label(b"/api/jobs/video/{job_id}") == "/api/jobs/video/{job_id}"
+    assert route_label(None) == "unmatched"
+
+
+def test_request_metrics_record_the_handled_status():
+    import server
+
+    async def main():
+        await server.app.start()
+        client = TestClient(server.app)
+        response = await client.put(
+            "/api/files/video/clip-1",
+            headers={"Content-Type": "multipart/form-data; boundary=x", "Content-Length": str(10 ** 12)},
+        )
+        assert response.status == 413
+        await client.get("/api/jobs/VIDEO/unknown-1")
+        await client.get("/api/jobs/video/unknown-2")
+
+    asyncio.run(main())
+    labels = {"method": "PUT", "route": "/api/files/video/{item_name}"}
+    assert HTTP_REQUEST_SECONDS.count(**labels, status="413") == 1
+    assert HTTP_REQUEST_SECONDS.count(**labels, status="500") == 0
+    # any spelling of the path lands on the route's pattern
+    assert HTTP_REQUEST_SECONDS.count(method="GET", route="/api/jobs/video/{job_id}", status="404") == 2
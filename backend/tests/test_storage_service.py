@@ -0,0 +1,29 @@
+import asyncio
+import io
+
+import pytest
+
+from services.storage_service import ObjectTooLarge, StorageService
+
+
+class FakeS3:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.body = io.BytesIO(data)
+
+    def get_object(self, Bucket: str, Key: str) -> dict:
+        return {"ContentLength": len(self.data), "Body": self.body}
+
+
+def test_download_refuses_objects_over_the_cap():
+    async def main():
+        storage = StorageService()
+        storage.client, storage.bucket_name = FakeS3(b"x" * 10), "bucket"
+        assert await storage.download("videos/a.mp4", max_bytes=10) == b"x" * 10
+
+        storage.client = FakeS3(b"x" * 11)
+        with pytest.raises(ObjectTooLarge):
+            await storage.download("videos/a.mp4", max_bytes=10)
+        assert storage.client.body.closed
+
+    asyncio.run(main())
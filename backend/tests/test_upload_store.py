@@ -0,0 +1,21 @@
+import asyncio
+
+import pytest
+
+from services.storage_service import StorageService
+from services.upload_store import UploadStore
+
+
+def test_without_r2_another_process_reads_uploads_from_redis(redis_factory):
+    async def main():
+        client = redis_factory()
+        storage = StorageService()  # no R2_BUCKET_NAME
+        key = await UploadStore(storage, redis_client=client).put_bytes(b"frame", "image/png")
+        # the worker's store: a separate process, sharing only Redis
+        assert await UploadStore(storage, redis_client=client).get(key) == b"frame"
+        assert 0 < await client.ttl(key) <= 3600
+
+        with pytest.raises(KeyError):
+            await UploadStore(storage, redis_client=client).get("uploads/unknown")
+
+    asyncio.run(main())
@@ -0,0 +1,36 @@
+import asyncio
+import os
+
+import pytest
+from blacksheep import Request
+from blacksheep.contents import FormPart, MultiPartFormData
+
+from utils.uploads import SPOOL_MEMORY_BYTES, UploadTooLarge, read_multipart
+
+
+def multipart_request(data: bytes) -> Request:
+    content = MultiPartFormData([FormPart(b"prompt", b"a cat"), FormPart(b"file", data, b"video/mp4", b"clip.mp4")])
+    return Request("POST", b"/", [(b"content-type", content.type)]).with_content(content)
+
+
+@pytest.mark.parametrize("size", [1024, 3 * SPOOL_MEMORY_BYTES + 5])
+def test_file_round_trips_in_memory_and_on_disk(size):
+    async def main():
+        data = os.urandom(size)
+        with await read_multipart(multipart_request(data), max_file_bytes=4 * SPOOL_MEMORY_BYTES) as form:
+            upload = form.files[0]
+            assert form.fields == {"prompt": "a cat"}
+            assert upload.size == size
+            assert upload.on_disk == (size > SPOOL_MEMORY_BYTES)
+            assert await upload.read() == data
+            assert b"".join([chunk async for chunk in upload.chunks()]) == data
+
+    asyncio.run(main())
+
+
+def test_file_over_the_limit_is_rejected():
+    async def main():
+        with pytest.raises(UploadTooLarge):
+            await read_multipart(multipart_request(os.urandom(2048)), max_file_bytes=1024)
+
+    asyncio.run(main())
@@ -7,16 +7,69 @@ class Settings(BaseSettings):
     GOOGLE_CLOUD_PROJECT: str
     GOOGLE_CLOUD_LOCATION: str
     GOOGLE_GENAI_USE_VERTEXAI: bool
+    GEMINI_MAX_CONCURRENCY: int = 8  # Gemini calls in flight per process
+    GEMINI_TIMEOUT_SECONDS: float = 60
     # Cloudflare R2 settings
     R2_ACCOUNT_ID: str
     R2_ACCESS_KEY_ID: str
     R2_SECRET_ACCESS_KEY: str
     R2_BUCKET_NAME: str
     R2_PUBLIC_URL: str = ""  # Optional public URL for R2 bucket
+    STORAGE_MAX_WORKERS: int = 16  # Threads (and pooled connections) for R2 calls
+    STORAGE_PART_SIZE_MB: int = 8  # Multipart part size (R2 minimum is 5)
+    STORAGE_UPLOAD_CONCURRENCY: int = 4  # Parts in flight per upload
     REDIS_URL: str
+    REDIS_MAX_CONNECTIONS: int = 64  # Shared asyncio pool size per process
+    REDIS_POOL_TIMEOUT_SECONDS: float = 5  # Wait this long for a free pooled connection
+    MERGE_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    MERGE_CACHE_MAX_ENTRIES: int = 5000
+    IMAGE_EDIT_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    IMAGE_EDIT_CACHE_MAX_ENTRIES: int = 20000
+    SCENE_CONTEXT_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    SCENE_CONTEXT_CACHE_MAX_ENTRIES: int = 20000
+    SCENE_CONTEXT_PREFETCH: bool = True  # Extract scene context as soon as a job is done
+    # Video job queue (Redis stream consumed by worker.py and/or the web process)
+    JOB_WORKER_EMBEDDED: bool = True  # Also consume jobs inside the web process
+    JOB_WORKER_CONCURRENCY: int = 4  # Jobs in flight per worker process
+    JOB_VISIBILITY_TIMEOUT_SECONDS: int = 120  # Redeliver a job if its worker stops heartbeating this long
+    JOB_MAX_DELIVERIES: int = 3
+    # Admission control (queued + running jobs, across replicas)
+    JOB_MAX_IN_FLIGHT: int = 32  # Over this, new jobs get a 429
+    JOB_MAX_IN_FLIGHT_PER_USER: int = 4  # Shrinks to a fair share of JOB_MAX_IN_FLIGHT when many users are active
+    JOB_ADMISSION_LEASE_SECONDS: int = 900  # A slot is freed after this long even if its job never finished
+    JOB_ADMISSION_RETRY_AFTER_SECONDS: int = 15  # Retry-After sent with a 429
+    VIDEO_JOB_CREDITS: int = 0  # Credits reserved per video job, refunded if it fails (0: jobs are free)
+    # Batch jobs (POST /api/jobs/video/batch): one clip per frame, coordinated on their own stream
+    BATCH_MAX_FRAMES: int = 16  # Clips per batch
+    BATCH_CONCURRENCY: int = 4  # Clips of one batch in flight (each is still admitted like a single job)
+    BATCH_ANALYZE_MAX_FRAMES: int = 8  # Frames per batched Gemini analysis call
+    BATCH_WORKER_CONCURRENCY: int = 8  # Batches coordinated at once per worker process
     SUPABASE_URL: str
     SUPABASE_SECRET_KEY: str
+    # Local JWT verification (legacy HS256 secret; asymmetric keys come from JWKS)
+    SUPABASE_JWT_SECRET: str = ""
+    SUPABASE_AUTH_REVOCATION_CHECK: bool = False  # Also ask GoTrue on every cache miss
+    AUTH_CACHE_MAX_SIZE: int = 10000
     FAL_KEY: str  # fal.ai API key
+    FAL_UPLOAD_URL_TTL_SECONDS: int = 12 * 3600  # Reuse fal CDN URLs for this long (well inside the CDN's own expiry)
+    FAL_UPLOAD_URL_MAX_ENTRIES: int = 50000
+    # Shared outbound HTTP client (fal CDN downloads etc.)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 60
+    # Upload limits per file (multipart bodies are streamed, never buffered whole)
+    UPLOAD_MAX_IMAGE_MB: int = 10
+    UPLOAD_MAX_VIDEO_MB: int = 200
+    # Input frames are normalized before any model call
+    IMAGE_MAX_SIDE: int = 1280  # Longer side in px (Veo renders 720p, the image editor 1K)
+    IMAGE_FORMAT: str = "webp"  # "webp", "jpeg" or "png"
+    IMAGE_QUALITY: int = 90
+    IMAGE_WORKERS: int = 2  # Processes for Pillow work
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""  # Per-module overrides, e.g. "services.fal_service=DEBUG,services.job_queue=WARNING"
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    LOG_DEBUG_SAMPLE_RATE: float = 0.1  # Fraction of DEBUG lines kept
     FRONTEND_URL: str = "http://localhost:5173"  # Default for local dev
     model_config = SettingsConfigDict(
         env_file=".env",
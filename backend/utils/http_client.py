@@ -0,0 +1,36 @@
+import httpx
+from utils.env import settings
+from utils.metrics import HTTP_CLIENT_CONNECTIONS, HTTP_CLIENT_REQUESTS
+
+# Default for calls that don't pass their own timeout
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+
+async def _track_connections(request: httpx.Request) -> None:
+    """Count requests and newly opened connections per host: opened / requests is the reuse miss rate."""
+    host = request.url.host
+    HTTP_CLIENT_REQUESTS.inc(host=host)
+
+    async def trace(event_name: str, info: dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            HTTP_CLIENT_CONNECTIONS.inc(host=host)
+
+    request.extensions["trace"] = trace
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    The app-wide outbound HTTP client. One pool per process, so downloads from the
+    same CDN reuse warm TCP+TLS connections (and multiplex over HTTP/2 when offered).
+    Owned by the app: close it with `aclose()` on shutdown.
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=DEFAULT_TIMEOUT,
+        event_hooks={"request": [_track_connections]},
+    )
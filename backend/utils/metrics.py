@@ -0,0 +1,211 @@
+"""
+Minimal in-process metrics (counters, gauges, histograms) rendered in the
+Prometheus text exposition format. Each process keeps its own values.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_registry: list["_Metric"] = []
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abstractmethod
+    def collect(self) -> list[str]:
+        """Sample lines in the text exposition format."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: dict[tuple[str, ...], tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[0][-1] if entry else 0
+
+    def collect(self) -> list[str]:
+        with self._lock:
+            items = [(key, (list(counts), total)) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, (counts, total) in items:
+            bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, counts):
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {counts[-1]}")
+        return lines
+
+
+def render() -> str:
+    """Render every registered metric in Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def track_call(call: str) -> Iterator[None]:
+    """Time a call to an external service into external_call_seconds, labelled ok/error."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        EXTERNAL_CALL_SECONDS.observe(time.perf_counter() - start, call=call, outcome=outcome)
+
+
+def route_label(pattern: Optional[bytes]) -> str:
+    """
+    Label a request by the pattern of the route it matched (/api/jobs/video/{job_id}),
+    never by its raw path, so label cardinality stays bounded whatever clients send.
+    """
+    return pattern.decode() if pattern else "unmatched"
+
+
+# Shared metrics
+AUTH_LATENCY = Histogram(
+    "auth_resolve_seconds",
+    "Time spent resolving the caller's identity, by route",
+    ("route",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+STORAGE_UPLOAD_SECONDS = Histogram("storage_upload_seconds", "R2 upload duration")
+STORAGE_UPLOAD_BYTES = Counter("storage_upload_bytes_total", "Bytes uploaded to R2")
+MERGE_FIRST_BYTE_SECONDS = Histogram("merge_first_byte_uploaded_seconds", "Merge start until the first part of the output is stored")
+MERGE_TOTAL_SECONDS = Histogram("merge_total_seconds", "Total merge time including upload")
+CACHE_REQUESTS = Counter("cache_requests_total", "Content cache lookups by outcome (hit/miss/coalesced)", ("cache", "result"))
+MERGE_PREFIX_REUSED = Counter("merge_prefix_reused_total", "Merges built by appending to an already merged prefix")
+HTTP_CLIENT_REQUESTS = Counter("http_client_requests_total", "Outbound HTTP requests by host", ("host",))
+HTTP_CLIENT_CONNECTIONS = Counter("http_client_connections_opened_total", "New outbound TCP connections by host (the rest reused a pooled one)", ("host",))
+JOB_STAGE_SECONDS = Histogram("job_stage_seconds", "Duration of each video job pipeline stage", ("stage",))
+HTTP_REQUEST_SECONDS = Histogram("http_request_seconds", "Time to produce a response, by route", ("method", "route", "status"))
+EXTERNAL_CALL_SECONDS = Histogram(
+    "external_call_seconds",
+    "Latency of calls to external services (gemini, fal_image_edit, fal_veo, fal_upload, cdn_download, r2_download, supabase_rpc)",
+    ("call", "outcome"),
+)
+JOBS_IN_FLIGHT = Gauge("jobs_in_flight", "Video jobs being processed by this process")
+JOBS_IN_FLIGHT.set(0)
+JOB_QUEUE_DEPTH = Gauge("job_queue_depth", "Entries in the video job stream (waiting or being processed), sampled at scrape time")
+JOB_EVENT_WATCHERS = Gauge("job_event_watchers", "Open job status event streams on this process, sampled at scrape time")
+ADMISSION_REJECTIONS = Counter("job_admission_rejections_total", "Video jobs turned away with a 429, by the cap that was hit (global/user)", ("reason",))
+JOBS_ADMITTED = Gauge("jobs_admitted", "Video jobs holding an admission slot (queued or running, all replicas when Redis backs the caps), sampled at scrape time")
+JOB_QUEUE_WAIT_SECONDS = Histogram(
+    "job_queue_wait_seconds",
+    "Time from admission until a worker starts processing the job",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+IMAGE_NORMALIZE_SECONDS = Histogram("image_normalize_seconds", "Decode + resize + re-encode of an input frame, including the hop to the worker process")
+IMAGE_BYTES = Histogram(
+    "image_bytes",
+    "Size of input frames before and after normalization (stage=original/normalized)",
+    ("stage",),
+    buckets=(16_384, 65_536, 131_072, 262_144, 524_288, 1_048_576, 2_097_152, 4_194_304, 8_388_608, 16_777_216),
+)
+BATCH_ANALYSIS_FRAMES = Counter(
+    "batch_analysis_frames_total",
+    "Batch job frames described by Gemini, by how (batched: several per call, single: one call each after a batched call failed)",
+    ("mode",),
+)
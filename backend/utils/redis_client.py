@@ -0,0 +1,27 @@
+from typing import Optional
+
+import redis.asyncio as aioredis
+from utils.env import settings
+
+_client: Optional[aioredis.Redis] = None
+
+
+def get_async_redis() -> Optional[aioredis.Redis]:
+    """Shared asyncio Redis client (one connection pool per process), or None when REDIS_URL isn't set."""
+    global _client
+    if not settings.REDIS_URL:
+        return None
+    if _client is None:
+        # Bounded pool: under bursts callers wait briefly for a free connection
+        # instead of opening unbounded new ones (or failing with "Too many connections")
+        pool = aioredis.BlockingConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+            decode_responses=False,
+            socket_connect_timeout=3,
+            socket_keepalive=True,
+            health_check_interval=30,
+        )
+        _client = aioredis.Redis(connection_pool=pool)
+    return _client
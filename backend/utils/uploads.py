@@ -0,0 +1,128 @@
+"""
+Streaming multipart parsing with size limits.
+
+`request.files()` / `FromFiles` / `FromForm` buffer the whole body in memory.
+`read_multipart` reads the request stream part by part instead: files are
+hashed and written to spooled temp files (memory up to SPOOL_MEMORY_BYTES,
+disk beyond; disk I/O runs in a thread, off the event loop), and a request is cut off with UploadTooLarge as soon as it
+declares or sends more than the route allows.
+"""
+import asyncio
+import hashlib
+import tempfile
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+
+from blacksheep import Request
+
+SPOOL_MEMORY_BYTES = 1024 * 1024
+READ_CHUNK_SIZE = 256 * 1024
+MAX_FIELD_BYTES = 256 * 1024  # text fields (prompts, scene JSON)
+
+
+class UploadTooLarge(Exception):
+    """The request body (or one of its files) is over the route's limit; answered with a 413."""
+
+    def __init__(self, limit: int, message: Optional[str] = None):
+        super().__init__(message or f"Upload is too large (limit {limit // (1024 * 1024)} MB per file)")
+        self.limit = limit
+
+
+@dataclass
+class Upload:
+    """A received file, kept in a spooled temp file until `close()`."""
+    name: str
+    file_name: Optional[str]
+    content_type: Optional[str]
+    file: tempfile.SpooledTemporaryFile
+    size: int = 0
+    sha256: str = ""
+
+    @property
+    def on_disk(self) -> bool:
+        """Past SPOOL_MEMORY_BYTES the spooled file has rolled over to disk."""
+        return self.size > SPOOL_MEMORY_BYTES
+
+    async def _io(self, fn, *args):
+        # in-memory reads/writes are cheap, file I/O would block the event loop
+        return await asyncio.to_thread(fn, *args) if self.on_disk else fn(*args)
+
+    async def read(self) -> bytes:
+        """Whole file as bytes (for consumers that need them in memory anyway)"""
+        self.file.seek(0)
+        return await self._io(self.file.read)
+
+    async def chunks(self, size: int = READ_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        self.file.seek(0)
+        while chunk := await self._io(self.file.read, size):
+            yield chunk
+
+    async def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        # the write that crosses SPOOL_MEMORY_BYTES rolls the file over, so it goes to the thread too
+        await self._io(self.file.write, chunk)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+@dataclass
+class MultipartForm:
+    fields: dict[str, str] = field(default_factory=dict)
+    files: list[Upload] = field(default_factory=list)
+
+    def close(self) -> None:
+        for upload in self.files:
+            upload.close()
+
+    def __enter__(self) -> "MultipartForm":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+async def read_multipart(request: Request, max_file_bytes: int, max_files: int = 1) -> MultipartForm:
+    """
+    Parse a multipart/form-data request without buffering it. Raises UploadTooLarge
+    before reading anything when Content-Length is already over the limit, and as
+    soon as a file passes `max_file_bytes` otherwise. Files past `max_files` are
+    rejected the same way. Use the result as a context manager to drop the temp files.
+    """
+    limit = max_files * max_file_bytes + max_files * MAX_FIELD_BYTES
+    declared = request.get_first_header(b"Content-Length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise UploadTooLarge(max_file_bytes)
+
+    form = MultipartForm()
+    try:
+        async for part in request.multipart_stream():
+            if not part.file_name:
+                value = bytearray()
+                async for chunk in part.stream():
+                    value += chunk
+                    if len(value) > MAX_FIELD_BYTES:
+                        raise UploadTooLarge(MAX_FIELD_BYTES, f"Form field {part.name!r} is too large")
+                form.fields[part.name] = value.decode(part.charset or "utf-8")
+                continue
+
+            if len(form.files) >= max_files:
+                raise UploadTooLarge(max_file_bytes, f"At most {max_files} file(s) per request")
+            upload = Upload(
+                name=part.name,
+                file_name=part.file_name,
+                content_type=part.content_type,
+                file=tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES),
+            )
+            form.files.append(upload)
+            digest = hashlib.sha256()
+            async for chunk in part.stream():
+                if upload.size + len(chunk) > max_file_bytes:
+                    raise UploadTooLarge(max_file_bytes)
+                digest.update(chunk)
+                await upload.write(chunk)
+            upload.sha256 = digest.hexdigest()
+    except BaseException:
+        form.close()
+        raise
+    return form
@@ -0,0 +1,69 @@
+"""
+Standalone video job worker (video jobs and batch jobs). Run as many of these
+as needed, they share the Redis streams through consumer groups:
+
+    python worker.py
+
+Set JOB_WORKER_EMBEDDED=false on the web app once dedicated workers are deployed.
+"""
+import asyncio
+import logging
+import signal
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.storage_service import StorageService
+from services.vertex_service import VertexService
+from services.fal_service import FalService
+from services.image_service import ImageService
+from services.batch_job_service import BatchJobService
+from services.credit_service import CreditService
+from services.job_service import JobService
+from services.scene_context_service import SceneContextService
+from services.upload_store import UploadStore
+from services.video_merge_service import VideoMergeService
+from utils.http_client import create_http_client
+from utils.logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    setup_logging()
+    http_client = create_http_client()
+    storage_service = StorageService()
+    vertex_service = VertexService()
+    fal_service = FalService(storage_service, http_client)
+    scene_context_service = SceneContextService(vertex_service, storage_service, http_client)
+    image_service = ImageService()
+    upload_store = UploadStore(storage_service)
+    job_service = JobService(
+        fal_service, vertex_service, scene_context_service, upload_store, image_service, CreditService(http_client)
+    )
+    batch_job_service = BatchJobService(
+        job_service, vertex_service, image_service, upload_store, VideoMergeService(storage_service)
+    )
+
+    if not job_service.queue:
+        raise SystemExit("worker.py needs a reachable REDIS_URL")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await image_service.warm_up()
+    job_service.start_worker()
+    batch_job_service.start_worker()
+    await stop.wait()
+    logger.info("Shutting down, unfinished jobs will be redelivered")
+    await batch_job_service.stop_worker()
+    await job_service.stop_worker()
+    await http_client.aclose()
+    image_service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -13,11 +13,18 @@ export const VideoGenerationManager = () => {
   const editor = useEditor();
   const { updateSceneState, addClip, context } =
     useGlobalContext("global-context");
-  const intervalsRef = useRef<Map<string, number>>(new Map());
+  // Status handler per tracked job, fed by its event stream or the batched poll
+  const handlersRef = useRef<
+    Map<string, (response: Response) => Promise<void>>
+  >(new Map());
+  const versionsRef = useRef<Map<string, number>>(new Map());
+  const streamsRef = useRef<Map<string, EventSource>>(new Map());
   const completedJobsRef = useRef<Set<string>>(new Set());
 
   useEffect(() => {
-    // Monitor for new arrows with pending jobs and start polling for them
+    const backend_url = (import.meta.env.VITE_BACKEND_URL || "").replace(/\/+$/, "");
+
+    // Monitor for new arrows with pending jobs and start tracking them
     const checkInterval = window.setInterval(() => {
       const arrows = editor
         .getCurrentPageShapes()
@@ -32,27 +39,17 @@ export const VideoGenerationManager = () => {
       for (const arrow of arrows) {
         const jobId = arrow.meta.jobId as string;
 
-        // If we're already polling this job, skip it
-        if (intervalsRef.current.has(jobId)) {
+        // If we're already tracking this job, skip it
+        if (handlersRef.current.has(jobId)) {
           continue;
         }
 
-        // Start a new interval for this specific job
-        const backend_url = (import.meta.env.VITE_BACKEND_URL || "").replace(/\/+$/, "");
-
-        const pollInterval = window.setInterval(async () => {
+        // Handles a status response, either pushed over the event stream or polled
+        const handleStatus = async (response: Response) => {
           try {
-            const response = await apiFetch(
-              `${backend_url}/api/jobs/video/${jobId}`,
-            );
-
             // 404 means job not found - could be completed and cleaned up, or expired/failed
             if (response.status === 404) {
-              const intervalId = intervalsRef.current.get(jobId);
-              if (intervalId) {
-                window.clearInterval(intervalId);
-                intervalsRef.current.delete(jobId);
-              }
+              handlersRef.current.delete(jobId);
 
               // Check if job was already completed successfully
               if (completedJobsRef.current.has(jobId)) {
@@ -92,12 +89,8 @@ export const VideoGenerationManager = () => {
               // Show error toast for actual errors (5xx, etc)
               toast.error("Unexpected server error");
 
-              // Clear this job's interval
-              const intervalId = intervalsRef.current.get(jobId);
-              if (intervalId) {
-                window.clearInterval(intervalId);
-                intervalsRef.current.delete(jobId);
-              }
+              // Stop tracking this job
+              handlersRef.current.delete(jobId);
 
               // Find and delete the arrow
               const currentArrow = editor
@@ -126,6 +119,11 @@ export const VideoGenerationManager = () => {
 
             const data = await response.json();
 
+            // The stream and the poll can both deliver the final state
+            if (completedJobsRef.current.has(jobId)) {
+              return;
+            }
+
             // Get the current arrow (it may have been updated since we started)
             const currentArrow = editor
               .getCurrentPageShapes()
@@ -133,11 +131,7 @@ export const VideoGenerationManager = () => {
 
             if (!currentArrow) {
               // Arrow was deleted, stop polling
-              const intervalId = intervalsRef.current.get(jobId);
-              if (intervalId) {
-                window.clearInterval(intervalId);
-                intervalsRef.current.delete(jobId);
-              }
+              handlersRef.current.delete(jobId);
               return;
             }
 
@@ -146,11 +140,7 @@ export const VideoGenerationManager = () => {
               completedJobsRef.current.add(jobId);
 
               // Stop polling this job immediately
-              const intervalId = intervalsRef.current.get(jobId);
-              if (intervalId) {
-                window.clearInterval(intervalId);
-                intervalsRef.current.delete(jobId);
-              }
+              handlersRef.current.delete(jobId);
 
               const doneMeta = {
                 ...currentArrow.meta,
@@ -167,20 +157,16 @@ export const VideoGenerationManager = () => {
                 },
               ]);
 
-              // Extract context from video (runs async after interval cleared)
+              // Extract context from video (runs async after interval cleared).
+              // The backend reads the clip itself and has usually extracted it already.
               (async () => {
                 try {
-                  const blob = await fetch(data.video_url).then((r) =>
-                    r.blob(),
-                  );
-                  const fd = new FormData();
-                  fd.append("files", blob, "video.mp4");
-
                   const sceneResp = await apiFetch(
                     `${backend_url}/api/gemini/extract-context`,
                     {
                       method: "POST",
-                      body: fd,
+                      headers: { "Content-Type": "application/json" },
+                      body: JSON.stringify({ job_id: jobId }),
                     },
                   );
 
@@ -353,11 +339,7 @@ export const VideoGenerationManager = () => {
             } else if (data.status === "error") {
               // Stop polling and update to error status
               completedJobsRef.current.add(jobId);
-              const intervalId = intervalsRef.current.get(jobId);
-              if (intervalId) {
-                clearInterval(intervalId);
-                intervalsRef.current.delete(jobId);
-              }
+              handlersRef.current.delete(jobId);
 
               editor.updateShapes([
                 {
@@ -393,23 +375,128 @@ export const VideoGenerationManager = () => {
           } catch (e) {
             console.error("Error polling job", jobId, e);
           }
-        }, 5000); // Poll every 5s — video generation (Veo) often takes 3–8+ minutes
-
-        // Store this interval
-        intervalsRef.current.set(jobId, pollInterval);
+        };
+
+        handlersRef.current.set(jobId, handleStatus);
+
+        // Prefer server push: one open stream per job instead of a request every 5s
+        if (typeof EventSource !== "undefined") {
+          const source = new EventSource(
+            `${backend_url}/api/jobs/video/${jobId}/events`,
+          );
+          streamsRef.current.set(jobId, source);
+          // The server sends a keepalive every 15s: a stream silent for longer has
+          // stalled, so drop it and let the batched poll take the job back
+          let stallTimer = 0;
+          const closeStream = () => {
+            window.clearTimeout(stallTimer);
+            source.close();
+            streamsRef.current.delete(jobId);
+          };
+          const armStallTimer = () => {
+            window.clearTimeout(stallTimer);
+            stallTimer = window.setTimeout(closeStream, 45000);
+          };
+          armStallTimer();
+
+          source.onmessage = (event) => {
+            armStallTimer();
+            const { http_status, ...body } = JSON.parse(event.data);
+            if (http_status !== 202) {
+              closeStream();
+            }
+            void handleStatus(
+              new Response(JSON.stringify(body), { status: http_status }),
+            );
+          };
+          source.addEventListener("keepalive", () => {
+            armStallTimer();
+            // Still waiting, lets the handler update its timer
+            void handleStatus(
+              new Response(JSON.stringify({ status: "waiting" }), {
+                status: 202,
+              }),
+            );
+          });
+          source.addEventListener("not_found", () => {
+            closeStream();
+            void handleStatus(new Response(null, { status: 404 }));
+          });
+          // Fall back to polling if the stream drops
+          source.onerror = closeStream;
+        }
       }
     }, 3000); // Check for new arrows every 3s
 
+    // Poll every 5s as a fallback — video generation (Veo) often takes 3–8+ minutes.
+    // One batched request covers every tracked job without an open event stream
+    // (a job is polled again once its stream errors or stalls); jobs whose
+    // version hasn't changed come back as ids only.
+    const pollInterval = window.setInterval(async () => {
+      const jobIds = [...handlersRef.current.keys()].filter(
+        (jobId) => !streamsRef.current.has(jobId),
+      );
+      if (jobIds.length === 0) {
+        return;
+      }
+      const since = Object.fromEntries(
+        jobIds
+          .filter((jobId) => versionsRef.current.has(jobId))
+          .map((jobId) => [jobId, versionsRef.current.get(jobId)]),
+      );
+
+      try {
+        const response = await apiFetch(
+          `${backend_url}/api/jobs/video/status:batch`,
+          {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ job_ids: jobIds, since }),
+          },
+        );
+        if (!response.ok) {
+          console.error("Error polling jobs", response.status);
+          return;
+        }
+        const { jobs, unchanged, not_found } = await response.json();
+
+        for (const [jobId, status] of Object.entries<any>(jobs)) {
+          const { http_status, version, ...body } = status;
+          versionsRef.current.set(jobId, version);
+          void handlersRef.current
+            .get(jobId)
+            ?.(new Response(JSON.stringify(body), { status: http_status }));
+        }
+        for (const jobId of unchanged as string[]) {
+          // Still waiting, lets the handler update its timer
+          void handlersRef.current
+            .get(jobId)
+            ?.(
+              new Response(JSON.stringify({ status: "waiting" }), {
+                status: 202,
+              }),
+            );
+        }
+        for (const jobId of not_found as string[]) {
+          void handlersRef.current
+            .get(jobId)
+            ?.(new Response(null, { status: 404 }));
+        }
+      } catch (e) {
+        console.error("Error polling jobs", e);
+      }
+    }, 5000);
+
     return () => {
       // Clear the check interval
       if (checkInterval) {
         window.clearInterval(checkInterval);
       }
-      // Clear all job-specific intervals
-      intervalsRef.current.forEach((intervalId) => {
-        window.clearInterval(intervalId);
-      });
-      intervalsRef.current.clear();
+      window.clearInterval(pollInterval);
+      handlersRef.current.clear();
+      versionsRef.current.clear();
+      streamsRef.current.forEach((source) => source.close());
+      streamsRef.current.clear();
       completedJobsRef.current.clear();
     };
   }, [editor]);